@@ -1,9 +1,156 @@
-from django.contrib import admin
-from .models import Transaction
+import json
+
+from django.contrib import admin, messages
+from django.contrib.admin import actions as admin_actions
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from .bulk import BulkChangeRejected, bulk_delete_transactions, bulk_set_type
+from .models import Category, CategoryRule, Transaction, description_search_query, description_search_vector
+from .views import TEST_DAILY_EXPENSE_LIMIT
 
 # Register your models here.
 
-# We register the Transaction model with the Django admin site.
-# This makes the Transaction model visible and manageable in the admin interface.
-# Once registered, you can go to /admin/ and log in to see and manage your transactions.
-admin.site.register(Transaction)
+
+def estimated_row_count(queryset):
+    """
+    Returns the planner's row estimate for queryset (EXPLAIN, no rows are read),
+    or None when the database is not PostgreSQL.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that doesn't COUNT(*) large result sets.
+
+    An exact count has to visit every matching row, which on a multi-million-row
+    ledger costs more than rendering the page itself. Below EXACT_COUNT_LIMIT
+    (estimated) rows the count is exact; above it the planner's estimate is used,
+    so page numbers near the end are approximate.
+    """
+    EXACT_COUNT_LIMIT = 50000
+
+    @cached_property
+    def count(self):
+        estimate = estimated_row_count(self.object_list)
+        if estimate is None or estimate < self.EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+@admin.register(Transaction)
+class TransactionAdmin(admin.ModelAdmin):
+    list_display = ('display_code', 'created_at', 'type', 'amount', 'description', 'category', 'api_external_id')
+    list_display_links = ('display_code',)
+    list_select_related = ('category',)
+    # Served by the (type, created_at, id) and (category, created_at, id) indexes.
+    list_filter = ('type', 'category')
+    date_hierarchy = 'created_at'
+    # Searches by display code (TRN-0025), external id or description; see get_search_results.
+    search_fields = ('description', 'api_external_id')
+    search_help_text = 'Transaction code (TRN-0025), external ID or part of the description.'
+    ordering = ('-created_at', '-id')
+    list_per_page = 50
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) Django runs to show "N total".
+    show_full_result_count = False
+    # Searches matching up to this many rows are resolved to ids first.
+    search_id_limit = 5000
+    actions = ('delete_selected', 'mark_as_deposit', 'mark_as_expense')
+
+    @admin.display(description='Code', ordering='id')
+    def display_code(self, obj):
+        return f"TRN-{obj.id:04d}"
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        A display code is a primary-key lookup and an external ID an exact match on its
+        unique index; other terms are also a word-prefix search on the description,
+        served by the full-text GIN index instead of Django's unindexable icontains.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        matches = Q(api_external_id=search_term)
+        parsed_id = Transaction.parse_display_code(search_term)
+        if parsed_id is not None:
+            return queryset.filter(matches | Q(id=parsed_id)), False
+
+        query = description_search_query(search_term)
+        if query is not None:
+            # Collect the ids of a selective match first (bitmap scan of the GIN index,
+            # no ordering). Filtering the ordered changelist directly lets the planner
+            # walk the date index backwards evaluating every row when matches are rare.
+            matching = Transaction.objects.annotate(description_search=description_search_vector()).filter(description_search=query)
+            ids = list(matching.order_by().values_list('id', flat=True)[:self.search_id_limit + 1])
+            if len(ids) <= self.search_id_limit:
+                matches |= Q(id__in=ids)
+            else:
+                # Common words: a page of matches is found early in the ordered scan.
+                queryset = queryset.annotate(description_search=description_search_vector())
+                matches |= Q(description_search=query)
+        return queryset.filter(matches), False
+
+    def get_deleted_objects(self, objs, request):
+        # The default confirmation page lists every selected row; summarize instead.
+        count = len(objs) if isinstance(objs, list) else objs.count()
+        perms_needed = set() if self.has_delete_permission(request) else {Transaction._meta.verbose_name}
+        return [f'{count} {Transaction._meta.verbose_name_plural}'], {Transaction._meta.verbose_name_plural: count}, perms_needed, []
+
+    @admin.action(description='Delete selected transactions', permissions=['delete'])
+    def delete_selected(self, request, queryset):
+        # Replaces the built-in action of the same name: the confirmation page is
+        # unchanged, the confirmed delete is one DELETE instead of one per row.
+        if not request.POST.get('post'):
+            return admin_actions.delete_selected(self, request, queryset)
+        try:
+            deleted = bulk_delete_transactions(queryset)
+        except BulkChangeRejected as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return None
+        self.message_user(request, f'Successfully deleted {deleted} transaction(s).', messages.SUCCESS)
+        return None
+
+    def _set_type(self, request, queryset, transaction_type):
+        try:
+            changed = bulk_set_type(queryset, transaction_type, daily_expense_limit=TEST_DAILY_EXPENSE_LIMIT)
+        except BulkChangeRejected as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        self.message_user(request, f'{changed} transaction(s) marked as {transaction_type}.', messages.SUCCESS)
+
+    @admin.action(description='Mark selected transactions as deposit', permissions=['change'])
+    def mark_as_deposit(self, request, queryset):
+        self._set_type(request, queryset, 'deposit')
+
+    @admin.action(description='Mark selected transactions as expense', permissions=['change'])
+    def mark_as_expense(self, request, queryset):
+        self._set_type(request, queryset, 'expense')
+
+
+class CategoryRuleInline(admin.TabularInline):
+    model = CategoryRule
+    extra = 1
+    fields = ('priority', 'kind', 'pattern', 'type', 'min_amount', 'max_amount')
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+    # Saving a category or its rules recategorizes the transactions in the
+    # background once the change commits (see signals.py).
+    inlines = (CategoryRuleInline,)
@@ -0,0 +1,148 @@
+# MoneyTrail/analytics.py
+"""
+Rolling-window spending analytics for the dashboard (/api/transactions/analytics/).
+
+For every day of a range, and for each requested window size (7 and 30 days by
+default), the endpoint reports the expenses and deposits of the trailing window,
+the burn rate (average expenses per day), the net burn (average expenses minus
+deposits per day) and the runway: how many days the end-of-day balance lasts at
+that net burn (null while deposits keep up).
+
+Everything comes from one SQL statement. The rows of the range, and of the
+longest window before it, are grouped into daily totals (archived rows
+included), the days without transactions are filled in with generate_series,
+and each window is a RANGE frame ('6 days' PRECEDING for a 7-day window) over
+those daily totals. The balance is the balance before them (balance_before(),
+from the checkpoints) plus a running sum. Results are cached per ledger head and
+parameters, like facets.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .checkpoints import balance_before, day_start
+from .ledger import ledger_version
+from .models import ArchivedTransaction, Transaction
+
+# Window sizes (in days) used when the request doesn't name any.
+DEFAULT_WINDOWS = (7, 30)
+
+# Limits on the request: number of windows, window size and range length (days).
+MAX_WINDOWS = 4
+MAX_WINDOW_DAYS = 366
+MAX_RANGE_DAYS = 3660
+
+# Seconds results stay cached (see facets.FACETS_CACHE_TIMEOUT).
+ANALYTICS_CACHE_TIMEOUT = 300
+
+
+class AnalyticsError(ValueError):
+    """
+    Raised for analytics parameters outside the limits above.
+    """
+
+
+def parse_windows(value):
+    """
+    Parses "7,30" into (7, 30). Returns DEFAULT_WINDOWS for an empty value and
+    raises AnalyticsError for anything else that isn't a short list of sizes.
+    """
+    if not value:
+        return DEFAULT_WINDOWS
+    try:
+        windows = tuple(sorted({int(part) for part in value.split(',')}))
+    except ValueError:
+        raise AnalyticsError('windows must be a comma-separated list of day counts, e.g. 7,30.')
+    if len(windows) > MAX_WINDOWS or not all(1 <= window <= MAX_WINDOW_DAYS for window in windows):
+        raise AnalyticsError(f'Give at most {MAX_WINDOWS} windows of 1 to {MAX_WINDOW_DAYS} days.')
+    return windows
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _analytics_sql(windows):
+    window_columns = []
+    window_clauses = []
+    for window in windows:
+        name = f'w{window}'
+        window_clauses.append(f"{name} AS (ORDER BY day RANGE BETWEEN '{window - 1} days'::interval PRECEDING AND CURRENT ROW)")
+        window_columns.append(f'sum(expenses) OVER {name} AS expenses_{window}d, sum(deposits) OVER {name} AS deposits_{window}d')
+
+    rows = ', '.join(
+        f'expenses_{window}d, deposits_{window}d, '
+        f'round(expenses_{window}d / {window}, 2) AS burn_rate_{window}d, '
+        f'round((expenses_{window}d - deposits_{window}d) / {window}, 2) AS net_burn_{window}d, '
+        f'CASE WHEN expenses_{window}d > deposits_{window}d AND balance > 0 '
+        f'THEN round(balance * {window} / (expenses_{window}d - deposits_{window}d), 1) END AS runway_days_{window}d'
+        for window in windows
+    )
+    return f'''
+        WITH rows AS (
+            SELECT created_at, amount, type FROM {_table(Transaction)} WHERE created_at >= %(since)s AND created_at < %(until)s
+            UNION ALL
+            SELECT created_at, amount, type FROM {_table(ArchivedTransaction)} WHERE created_at >= %(since)s AND created_at < %(until)s
+        ), daily AS (
+            SELECT (created_at AT TIME ZONE %(time_zone)s)::date AS day,
+                   coalesce(sum(amount) FILTER (WHERE type = 'expense'), 0) AS expenses,
+                   coalesce(sum(amount) FILTER (WHERE type = 'deposit'), 0) AS deposits
+            FROM rows GROUP BY 1
+        ), days AS (
+            SELECT series.day::date AS day, coalesce(daily.expenses, 0) AS expenses, coalesce(daily.deposits, 0) AS deposits
+            FROM generate_series(%(first_day)s::date, %(end_day)s::date, '1 day'::interval) AS series(day)
+            LEFT JOIN daily ON daily.day = series.day::date
+        ), windowed AS (
+            SELECT day, expenses, deposits,
+                   %(opening)s + sum(deposits - expenses) OVER (ORDER BY day ROWS UNBOUNDED PRECEDING) AS balance,
+                   {', '.join(window_columns)}
+            FROM days
+            WINDOW {', '.join(window_clauses)}
+        )
+        SELECT day, expenses, deposits, balance, {rows}
+        FROM windowed WHERE day >= %(start_day)s ORDER BY day
+    '''
+
+
+def spending_analytics(start_day, end_day, windows=DEFAULT_WINDOWS):
+    """
+    Returns the rolling-window metrics of every day from start_day to end_day
+    (inclusive) as {'windows': [...], 'days': [{'date', 'expenses', 'deposits',
+    'balance', 'expenses_7d', 'deposits_7d', 'burn_rate_7d', 'net_burn_7d',
+    'runway_days_7d', ...}, ...], 'latest': <the last day>}.
+    """
+    if start_day > end_day:
+        raise AnalyticsError('start_date must not be after end_date.')
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        raise AnalyticsError(f'The range can span at most {MAX_RANGE_DAYS} days.')
+
+    # The longest window reaches back before the range.
+    first_day = start_day - timedelta(days=max(windows) - 1)
+    opening = balance_before(first_day)
+    with connection.cursor() as cursor:
+        cursor.execute(_analytics_sql(windows), {
+            'since': day_start(first_day),
+            'until': day_start(end_day + timedelta(days=1)),
+            'time_zone': timezone.get_current_timezone_name(),
+            'first_day': first_day,
+            'start_day': start_day,
+            'end_day': end_day,
+            'opening': opening,
+        })
+        columns = [column[0] for column in cursor.description[1:]]
+        days = [{'date': row[0].isoformat(), **dict(zip(columns, row[1:]))} for row in cursor.fetchall()]
+    return {'windows': list(windows), 'days': days, 'latest': days[-1] if days else None}
+
+
+def cached_spending_analytics(start_day, end_day, windows=DEFAULT_WINDOWS):
+    """
+    spending_analytics(), cached under the ledger head and the parameters.
+    """
+    version, updated_at = ledger_version()
+    generation = f'{version}:{updated_at.timestamp() if updated_at else 0}'
+    query = f'{start_day.isoformat()}:{end_day.isoformat()}:{",".join(map(str, windows))}:{timezone.get_current_timezone_name()}'
+    key = f'MoneyTrail:analytics:{generation}:{hashlib.md5(query.encode()).hexdigest()}'
+    return cache.get_or_set(key, lambda: spending_analytics(start_day, end_day, windows), ANALYTICS_CACHE_TIMEOUT)
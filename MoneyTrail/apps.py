@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MoneytrailConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'MoneyTrail'
+
+    def ready(self):
+        # Register signal handlers (ledger version bumps etc.)
+        from . import signals  # noqa: F401
@@ -0,0 +1,232 @@
+# MoneyTrail/archive.py
+"""
+Archival of old transactions with a carried-forward opening balance.
+
+archive_transactions() moves every transaction created before a cutoff day from
+the hot Transaction table into ArchivedTransaction (same ids and columns) and adds
+their net effect to the single OpeningBalance row. Running balances and totals of
+the hot ledger start from that balance (engine.py, index.py), so they stay exact
+while balance computations only pay for the rows after the cutoff. Balance
+checkpoints of archived days are kept, so point-in-time and range queries still
+cover them (checkpoints.py).
+
+The archive is only read when a query reaches past the cutoff: list requests with
+no start_date, or one before the cutoff, continue into archived rows after the
+last hot row (ArchiveAwareRows). Writes dated before the cutoff are rejected.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connections, transaction as db_transaction
+from django.db.models import Count, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .checkpoints import balance_before, day_start, local_day
+from .index import ledger_index
+from .ledger import OPENING_BALANCE_PK, bump_ledger_version, ledger_opening, lock_ledger, signed_amount
+from .models import ArchivedTransaction, OpeningBalance, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Rows moved per transaction. Each batch holds the ledger lock while it runs, so
+# writers wait for one batch at most instead of the whole archival.
+ARCHIVE_BATCH_SIZE = 50000
+
+# Columns copied from Transaction to ArchivedTransaction.
+ARCHIVED_FIELDS = ('id', 'api_external_id', 'description', 'amount', 'type', 'created_at', 'category_id')
+
+
+class ArchiveRejected(Exception):
+    """
+    Raised when an archival request can't be carried out; nothing is written.
+    """
+
+
+def archive_cutoff_message(cutoff_day):
+    return f'Transactions before the archive cutoff ({cutoff_day.isoformat()}) cannot be added or changed.'
+
+
+def archive_cutoff_violation(created_at):
+    """
+    Returns the error message for a write dated before the archive cutoff, or None.
+    """
+    opening = ledger_opening()
+    if opening is not None and local_day(created_at) < opening.cutoff_day:
+        return archive_cutoff_message(opening.cutoff_day)
+    return None
+
+
+def archive_reached(start_day=None):
+    """
+    Returns the OpeningBalance if a query starting at start_day (None: from the
+    beginning) reaches past the archive cutoff, otherwise None.
+    """
+    opening = ledger_opening()
+    if opening is not None and (start_day is None or start_day < opening.cutoff_day):
+        return opening
+    return None
+
+
+def _summary(queryset):
+    return queryset.aggregate(
+        count=Count('id'),
+        net=Coalesce(Sum(signed_amount()), Value(0, output_field=DecimalField())),
+    )
+
+
+def _next_boundary(cutoff_day, batch_size):
+    # The start of the day after the batch_size-th oldest row, so a batch never
+    # splits a day between the two tables.
+    nth = list(
+        Transaction.objects.filter(created_at__lt=day_start(cutoff_day))
+        .order_by('created_at', 'id')
+        .values_list('created_at', flat=True)[batch_size - 1:batch_size]
+    )
+    if not nth:
+        return cutoff_day
+    return min(cutoff_day, local_day(nth[0]) + timedelta(days=1))
+
+
+def _move_rows(queryset):
+    # INSERT ... SELECT keeps the copy inside the database; _raw_delete skips the
+    # per-row collector and signals (the caller refreshes derived state once).
+    connection = connections[queryset.db]
+    select_sql, params = queryset.order_by().values_list(*ARCHIVED_FIELDS).query.sql_with_params()
+    columns = ', '.join(connection.ops.quote_name(field) for field in ARCHIVED_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(ArchivedTransaction._meta.db_table)} ({columns}) {select_sql}',
+            params
+        )
+    return queryset._raw_delete(queryset.db)
+
+
+def archive_preview(cutoff_day):
+    """
+    Returns {'count', 'net'} of the hot transactions archive_transactions(cutoff_day) would move.
+    """
+    return _summary(Transaction.objects.filter(created_at__lt=day_start(cutoff_day)))
+
+
+def archive_transactions(cutoff_day, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Moves every transaction created before the start of cutoff_day into the archive,
+    in batches of about batch_size rows (whole days), and carries their balance
+    forward. Returns the number of transactions archived.
+    """
+    opening = ledger_opening()
+    if opening is not None and cutoff_day < opening.cutoff_day:
+        raise ArchiveRejected(
+            f'The archive already reaches {opening.cutoff_day.isoformat()}; the cutoff cannot be moved back.'
+        )
+
+    archived = 0
+    while True:
+        with db_transaction.atomic():
+            lock_ledger()
+            opening = ledger_opening()
+            boundary = _next_boundary(cutoff_day, batch_size)
+            if opening is not None:
+                boundary = max(boundary, opening.cutoff_day)
+
+            moving = Transaction.objects.filter(created_at__lt=day_start(boundary))
+            summary = _summary(moving)
+            if summary['count']:
+                _move_rows(moving)
+
+            if opening is None:
+                opening = OpeningBalance(pk=OPENING_BALANCE_PK, cutoff_day=boundary)
+            opening.cutoff_day = boundary
+            opening.balance += summary['net']
+            opening.transaction_count += summary['count']
+            opening.archived_at = timezone.now()
+            opening.save()
+            # Reloads the ledger index and invalidates cached responses. Checkpoints
+            # stay valid: archiving doesn't change any day's balance.
+            ledger_index.mark_changed(bump_ledger_version())
+
+        archived += summary['count']
+        logger.debug('Archived %d transactions before %s', summary['count'], boundary.isoformat())
+        if boundary >= cutoff_day:
+            return archived
+
+
+def set_archived_running_balances(instances):
+    """
+    Sets running_balance on archived transactions: the balance at the start of
+    the earliest one's day (from the checkpoints), plus a scan of the archived
+    rows from there to the latest one.
+    """
+    if not instances:
+        return
+    earliest = min(instance.created_at for instance in instances)
+    latest = max(instance.created_at for instance in instances)
+    day = local_day(earliest)
+
+    wanted = {instance.pk: instance for instance in instances}
+    balance = balance_before(day)
+    rows = (
+        ArchivedTransaction.objects
+        .filter(created_at__gte=day_start(day), created_at__lte=latest)
+        .order_by('created_at', 'id')
+        .values_list('id', 'amount', 'type')
+    )
+    for pk, amount, transaction_type in rows.iterator():
+        if transaction_type == 'deposit':
+            balance += amount
+        elif transaction_type == 'expense':
+            balance -= amount
+        if pk in wanted:
+            wanted[pk].running_balance = balance
+
+
+class ArchiveAwareRows:
+    """
+    The hot rows of a list query (see engine.LedgerRows) followed by the matching
+    archived rows, newest first. The archive is only queried for slices that reach
+    past the last hot row.
+    """
+
+    def __init__(self, hot_rows, archived_queryset, opening):
+        self.hot_rows = hot_rows
+        self.archived = archived_queryset.select_related('category').order_by('-created_at', '-id')
+        self.opening = opening
+        self._archived_count = None
+
+    def _count_archived(self):
+        if self._archived_count is None:
+            # The unfiltered count is kept on the opening balance row.
+            if self.archived.query.where:
+                self._archived_count = self.archived.count()
+            else:
+                self._archived_count = self.opening.transaction_count
+        return self._archived_count
+
+    def __len__(self):
+        return len(self.hot_rows) + self._count_archived()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += len(self)
+            page = self[index:index + 1]
+            if not page:
+                raise IndexError('transaction index out of range')
+            return page[0]
+        if (index.start or 0) < 0 or (index.stop or 0) < 0 or index.step not in (None, 1):
+            return self[:][index]
+
+        start = index.start or 0
+        hot_count = len(self.hot_rows)
+        rows = list(self.hot_rows[start:index.stop]) if start < hot_count else []
+        if index.stop is None or index.stop > hot_count:
+            archived_start = max(start - hot_count, 0)
+            archived_stop = None if index.stop is None else index.stop - hot_count
+            archived = list(self.archived[archived_start:archived_stop])
+            set_archived_running_balances(archived)
+            rows.extend(archived)
+        return rows
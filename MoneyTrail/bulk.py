@@ -0,0 +1,181 @@
+# MoneyTrail/bulk.py
+"""
+Set-based writes for many transactions at once (admin actions, bulk endpoints).
+
+Saving or deleting rows one by one sends a signal per row, and every signal bumps
+the ledger version and invalidates checkpoints. These helpers instead issue one
+UPDATE or DELETE for the whole selection, validate the balance once for the whole
+change, record it in the outbox with one INSERT ... SELECT (outbox.py), and
+refresh the derived state once from the earliest affected day.
+"""
+from django.db import connections, transaction as db_transaction
+from django.db.models import Count, Min, Q
+from django.db.models.functions import TruncDate
+
+from .categories import current_matcher
+from .checkpoints import invalidate_checkpoints, local_day
+from .engine import signed_cents
+from .fingerprints import fingerprint
+from .index import goes_negative, ledger_index
+from .ledger import bump_ledger_version, lock_ledger
+from .models import Transaction
+from .outbox import record_changes
+
+
+# Fields the bulk update endpoint may set.
+BULK_UPDATE_FIELDS = ('description', 'amount', 'type')
+
+# Rows per UPDATE ... FROM (VALUES ...) statement of a bulk update.
+UPDATE_BATCH_SIZE = 1000
+
+# Past this many changed rows, catching the ledger index up from the outbox once
+# is cheaper than applying the rows to it one by one.
+INDEX_APPLY_LIMIT = 1000
+
+
+class BulkChangeRejected(Exception):
+    """
+    Raised when a bulk change would break a ledger rule; nothing is written.
+    """
+
+
+def refresh_derived_state(since_day, removed=(), added=()):
+    """
+    Bumps the ledger version and invalidates checkpoints from since_day onwards.
+    removed and added describe the change for the ledger index (see LedgerIndex.apply);
+    past INDEX_APPLY_LIMIT rows it catches up from the outbox instead.
+    """
+    head = bump_ledger_version()
+    invalidate_checkpoints(since_day)
+    if len(removed) + len(added) <= INDEX_APPLY_LIMIT:
+        ledger_index.apply(head, removed, added)
+    else:
+        ledger_index.mark_changed(head)
+
+
+def _update_rows(changes, derived):
+    """
+    Sets the fields in changes, and each row's own fingerprint and category, on
+    the rows of derived ((pk, fingerprint, category id) tuples) with one
+    UPDATE ... FROM (VALUES ...) per UPDATE_BATCH_SIZE rows. Returns the number
+    of rows updated.
+    """
+    connection = connections[Transaction.objects.db]
+    quote = connection.ops.quote_name
+    table = quote(Transaction._meta.db_table)
+    fields = [Transaction._meta.get_field(name) for name in changes]
+    assignments = [f'{quote(field.column)} = %s' for field in fields] + [
+        f"{quote(Transaction._meta.get_field('fingerprint').column)} = v.fingerprint",
+        # ::bigint in case every category in the batch is NULL (typed as text).
+        f"{quote(Transaction._meta.get_field('category').column)} = v.category_id::bigint",
+    ]
+    params = [field.get_db_prep_save(changes[field.name], connection) for field in fields]
+    updated = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(derived), UPDATE_BATCH_SIZE):
+            batch = derived[start:start + UPDATE_BATCH_SIZE]
+            cursor.execute(
+                f"UPDATE {table} SET {', '.join(assignments)} "
+                f"FROM (VALUES {', '.join(['(%s, %s, %s)'] * len(batch))}) AS v (id, fingerprint, category_id) "
+                f"WHERE {table}.{quote('id')} = v.id",
+                params + [value for row in batch for value in row]
+            )
+            updated += cursor.rowcount
+    return updated
+
+
+def _selection_summary(queryset):
+    return Transaction.objects.filter(pk__in=queryset.values('pk')).aggregate(
+        count=Count('id'),
+        first=Min('created_at'),
+    )
+
+
+def bulk_delete_transactions(queryset):
+    """
+    Deletes every transaction in queryset with a single DELETE statement.
+    Returns the number of rows deleted.
+    """
+    with db_transaction.atomic():
+        lock_ledger()
+        summary = _selection_summary(queryset)
+        if not summary['count']:
+            return 0
+
+        # _raw_delete skips the per-row collector and signals; nothing references
+        # Transaction by foreign key, so there is nothing to cascade.
+        selected = Transaction.objects.filter(pk__in=queryset.values('pk'))
+        removed = [(created_at, pk) for pk, created_at in selected.values_list('pk', 'created_at')]
+        if goes_negative(removed=removed):
+            raise BulkChangeRejected('Deleting these transactions would result in a negative balance.')
+
+        record_changes('deleted', selected)
+        deleted = selected._raw_delete(selected.db)
+        refresh_derived_state(local_day(summary['first']), removed=removed)
+        return deleted
+
+
+def bulk_update_transactions(queryset, changes, daily_expense_limit=None):
+    """
+    Sets the fields in changes (a subset of BULK_UPDATE_FIELDS, already validated)
+    on every transaction in queryset, together with the fingerprint and category
+    they lead to, with one UPDATE ... FROM (VALUES ...) per UPDATE_BATCH_SIZE
+    rows. Rows that already have those values are left alone. When daily_expense_limit is given,
+    rows turned into expenses must not push any of their days over the limit.
+    Returns the number of rows changed.
+    """
+    with db_transaction.atomic():
+        lock_ledger()
+        changing = Transaction.objects.filter(pk__in=queryset.values('pk')).exclude(**changes)
+        summary = _selection_summary(changing)
+        if not summary['count']:
+            return 0
+
+        rows = list(changing.values_list('pk', 'created_at', 'amount', 'type', 'description'))
+        removed, added = [], []
+        if 'amount' in changes or 'type' in changes:
+            for pk, created_at, amount, transaction_type, _ in rows:
+                row = Transaction(amount=changes.get('amount', amount), type=changes.get('type', transaction_type))
+                removed.append((created_at, pk))
+                added.append((created_at, pk, signed_cents(row)))
+            if goes_negative(removed=removed, added=added):
+                raise BulkChangeRejected('Changing these transactions would result in a negative balance.')
+
+        if changes.get('type') == 'expense' and daily_expense_limit is not None:
+            changing_days = changing.annotate(day=TruncDate('created_at')).values('day')
+            over_limit = (
+                Transaction.objects
+                .annotate(day=TruncDate('created_at'))
+                .filter(Q(type='expense') | Q(pk__in=changing.values('pk')), day__in=changing_days)
+                .values('day')
+                .annotate(expenses=Count('id'))
+                .filter(expenses__gt=daily_expense_limit)
+            )
+            if over_limit.exists():
+                raise BulkChangeRejected(
+                    f'Daily expense limit reached ({daily_expense_limit} expenses per day) on at least one of the selected days.'
+                )
+
+        # Every updatable field is part of the fingerprint and can change the
+        # category, which are computed here (the rules are compiled in Python)
+        # and written by the same statement as the change.
+        matcher = current_matcher()
+        derived = []
+        for pk, created_at, amount, transaction_type, description in rows:
+            transaction_type = changes.get('type', transaction_type)
+            amount = changes.get('amount', amount)
+            description = changes.get('description', description)
+            category = matcher.categorize(transaction_type, amount, description)
+            derived.append((pk, fingerprint(transaction_type, amount, created_at, description), category.pk if category else None))
+        updated = _update_rows(changes, derived)
+        # changing no longer matches the updated rows; select them by id.
+        record_changes('updated', Transaction.objects.filter(pk__in=[row[0] for row in rows]))
+        refresh_derived_state(local_day(summary['first']), removed=removed, added=added)
+        return updated
+
+
+def bulk_set_type(queryset, transaction_type, daily_expense_limit=None):
+    """
+    Sets the type of every transaction in queryset (see bulk_update_transactions).
+    """
+    return bulk_update_transactions(queryset, {'type': transaction_type}, daily_expense_limit=daily_expense_limit)
@@ -0,0 +1,286 @@
+# MoneyTrail/categories.py
+"""
+Rule-based categorization of transactions.
+
+Categories are recognized by CategoryRules (keyword, regex, type, amount range).
+Instead of trying the rules one by one on every row, the rule set is compiled
+once into a CategoryMatcher. Keywords are matched on whole words of the
+normalized description (as in fingerprints.py), so they all go into one index
+from first word to the rules starting with it: finding every keyword in a
+description is one dictionary lookup per word, however many rules there are
+(Aho-Corasick with words as the alphabet). Regex rules are compiled once each.
+The rules whose pattern occurs (and those without one) are remembered per
+description, which leaves only the type and amount checks per row; imported
+rows share a handful of descriptions, so a batch mostly costs a dictionary
+lookup per row.
+
+Every process keeps its compiled matcher until the rule set version
+(RuleSetHead) changes. Writes categorize rows as they save them (signals.py,
+bulk.py, stored_writes.py). Checking the version costs no query of its own on
+the usual write paths: serialized writes read it with the ledger lock (see
+ledger.locked_rules_head), imports check it once per run (pinned_matcher) and
+the database create function compares it itself. A change to the rules schedules recategorize(),
+which walks the ledger in id order, a chunk per transaction, and only writes
+the rows whose category changed.
+"""
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .fingerprints import normalize_description
+from .index import ledger_index
+from .ledger import bump_ledger_version, locked_rules_head, serialized_write
+from .models import CategoryRule, RuleSetHead, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Primary key of the single RuleSetHead row.
+RULE_SET_HEAD_PK = 1
+
+# Rows read per recategorization transaction. Each chunk holds the ledger lock
+# while it runs, so writers wait for one chunk at most.
+RECATEGORIZE_CHUNK_SIZE = 5000
+
+# Rows per UPDATE when writing changed categories.
+CATEGORY_BATCH_SIZE = 1000
+
+# Distinct descriptions a matcher remembers before starting over.
+MATCH_CACHE_SIZE = 10000
+
+
+class RuleError(ValueError):
+    """
+    Raised for a rule pattern that can't be compiled into the matcher.
+    """
+
+
+def compile_pattern(kind, pattern):
+    """
+    Returns a rule's pattern compiled for the matcher: the tuple of its words for
+    a keyword, a case-insensitive regular expression for a regex, or None for a
+    rule without one. Raises RuleError when the pattern is invalid.
+    """
+    if not pattern:
+        return None
+    if kind == 'keyword':
+        words = tuple(normalize_description(pattern).split())
+        if not words:
+            raise RuleError('A keyword needs at least one letter or digit.')
+        return words
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        raise RuleError(f'Invalid regular expression: {e}')
+
+
+class CategoryMatcher:
+
+    def __init__(self, rules, version=None):
+        """
+        rules: CategoryRule instances (with their category) in priority order.
+        version is the rule set head (rules_version()) they were read at.
+        """
+        self.version = version
+        self.rules = []
+        self._keywords = {}  # First word -> [(following words, rule position)]
+        for position, rule in enumerate(rules):
+            pattern = compile_pattern(rule.kind, rule.pattern)
+            if isinstance(pattern, tuple):
+                self._keywords.setdefault(pattern[0], []).append((pattern[1:], position))
+                pattern = 'keyword'
+            self.rules.append((pattern, rule.type or None, rule.min_amount, rule.max_amount, rule.category))
+        self._candidates_by_description = {}
+
+    def _found_keywords(self, description):
+        """
+        Positions of the keyword rules occurring in description.
+        """
+        found = set()
+        words = normalize_description(description).split()
+        for start, word in enumerate(words):
+            for following, position in self._keywords.get(word, ()):
+                if not following or tuple(words[start + 1:start + 1 + len(following)]) == following:
+                    found.add(position)
+        return found
+
+    def _candidates(self, description):
+        """
+        The rules whose pattern occurs in description, or that have none, in order.
+        """
+        description = description or ''
+        candidates = self._candidates_by_description.get(description)
+        if candidates is None:
+            found = self._found_keywords(description) if self._keywords else ()
+            candidates = tuple(
+                rule for position, rule in enumerate(self.rules)
+                if rule[0] is None
+                or (position in found if rule[0] == 'keyword' else rule[0].search(description) is not None)
+            )
+            if len(self._candidates_by_description) >= MATCH_CACHE_SIZE:
+                self._candidates_by_description = {}
+            self._candidates_by_description[description] = candidates
+        return candidates
+
+    def categorize(self, transaction_type, amount, description):
+        """
+        Returns the Category of the first rule matching the transaction, or None.
+        """
+        if amount is not None and not isinstance(amount, Decimal):
+            amount = Decimal(str(amount))
+        for pattern, rule_type, min_amount, max_amount, category in self._candidates(description):
+            if rule_type is not None and rule_type != transaction_type:
+                continue
+            if min_amount is not None and (amount is None or amount < min_amount):
+                continue
+            if max_amount is not None and (amount is None or amount > max_amount):
+                continue
+            return category
+        return None
+
+
+_matcher = None
+_pinned = threading.local()
+
+
+def rules_version():
+    """
+    Returns (version, updated_at) of the rule set head in one primary-key lookup.
+    The time tells apart versions reused after a rolled-back change.
+    """
+    head = RuleSetHead.objects.filter(pk=RULE_SET_HEAD_PK).values_list('version', 'updated_at').first()
+    return head if head else (0, None)
+
+
+def bump_rules_version():
+    updated = RuleSetHead.objects.filter(pk=RULE_SET_HEAD_PK).update(version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        RuleSetHead.objects.get_or_create(pk=RULE_SET_HEAD_PK, defaults={'version': 1})
+
+
+def load_matcher(version=None):
+    """
+    Compiles the current rules; version is the rules_version() just read, if any.
+    """
+    if version is None:
+        version = rules_version()
+    return CategoryMatcher(CategoryRule.objects.select_related('category').order_by('priority', 'id'), version)
+
+
+def current_matcher():
+    """
+    Returns the process-wide matcher, recompiled when the rule set version has
+    changed. Inside pinned_matcher() the pinned one is returned without a query,
+    and inside a serialized_write the version read with the ledger lock is used.
+    """
+    global _matcher
+    pinned = getattr(_pinned, 'matcher', None)
+    if pinned is not None:
+        return pinned
+    matcher = _matcher
+    version = locked_rules_head() or rules_version()
+    if matcher is None or matcher.version != version:
+        matcher = _matcher = load_matcher(version)
+    return matcher
+
+
+def cached_matcher():
+    """
+    Returns the process-wide matcher as last compiled, without checking the rule
+    set version: for callers that check matcher.version themselves.
+    """
+    global _matcher
+    if _matcher is None:
+        _matcher = load_matcher()
+    return _matcher
+
+
+@contextmanager
+def pinned_matcher():
+    """
+    Categorizes every row saved by this thread inside the block with the same
+    matcher, checking the rule set version once instead of on every save.
+    """
+    previous = getattr(_pinned, 'matcher', None)
+    _pinned.matcher = matcher = previous or current_matcher()
+    try:
+        yield matcher
+    finally:
+        _pinned.matcher = previous
+
+
+@serialized_write
+def _recategorize_chunk(matcher, after_id, chunk_size):
+    rows = list(
+        Transaction.objects.filter(pk__gt=after_id).order_by('pk')
+        .values_list('pk', 'type', 'amount', 'description', 'category_id')[:chunk_size]
+    )
+    changed = []
+    for pk, transaction_type, amount, description, category_id in rows:
+        category = matcher.categorize(transaction_type, amount, description)
+        if (category.pk if category else None) != category_id:
+            changed.append(Transaction(pk=pk, category=category))
+    if changed:
+        Transaction.objects.bulk_update(changed, ['category'], batch_size=CATEGORY_BATCH_SIZE)
+        # Categories are part of the rows clients cache by ledger version.
+        ledger_index.apply(bump_ledger_version())
+    return len(rows), len(changed), rows[-1][0] if rows else after_id
+
+
+def recategorize(chunk_size=RECATEGORIZE_CHUNK_SIZE):
+    """
+    Recomputes the category of every transaction with the current rules,
+    chunk_size rows per transaction. Returns (checked, changed).
+    """
+    matcher = load_matcher()
+    checked = changed = 0
+    after_id = 0
+    while True:
+        chunk_checked, chunk_changed, after_id = _recategorize_chunk(matcher, after_id, chunk_size)
+        if not chunk_checked:
+            return checked, changed
+        checked += chunk_checked
+        changed += chunk_changed
+
+
+_job_lock = threading.Lock()
+_job_state = {'running': False, 'again': False}
+
+
+def _run_recategorization():
+    try:
+        while True:
+            checked, changed = recategorize()
+            logger.debug('Recategorized transactions: %d of %d changed', changed, checked)
+            with _job_lock:
+                if not _job_state['again']:
+                    _job_state['running'] = False
+                    return
+                _job_state['again'] = False
+    except Exception as e:
+        logger.debug('Recategorization failed: %s', e)
+        with _job_lock:
+            _job_state['running'] = False
+    finally:
+        connection.close()
+
+
+def schedule_recategorization():
+    """
+    Starts recategorize() in a background thread, once the rule change that
+    called it commits. A change arriving while a run is going on makes it run
+    once more afterwards instead of starting a second one.
+    """
+    def start():
+        with _job_lock:
+            if _job_state['running']:
+                _job_state['again'] = True
+                return
+            _job_state['running'] = True
+        threading.Thread(target=_run_recategorization, name='recategorize', daemon=True).start()
+    db_transaction.on_commit(start)
@@ -0,0 +1,264 @@
+# MoneyTrail/checkpoints.py
+"""
+Per-day balance checkpoints for point-in-time balance queries.
+
+A BalanceCheckpoint holds the cumulative balance at the end of every day that has
+transactions. "What was the balance at X" is answered from the nearest checkpoint
+before X's day (one index lookup) plus a tail scan over the rows of X's own day.
+
+Writes only invalidate: a change on day D deletes the checkpoints for D and later
+(earlier ones are unaffected), and schedules a rebuild in a background thread once
+it commits (a single GROUP BY over the rows after the last valid checkpoint, under
+the ledger lock). Reads never lock or write: until the rebuild catches up they add
+up the rows after the last valid checkpoint themselves.
+
+Each checkpoint also carries a digest of the day's imported rows, which
+reconcile.py compares with the external API's records; it is invalidated and
+rebuilt together with the balance.
+
+Checkpoints keep covering days whose transactions were archived (archive.py);
+the archive table is only read when checkpoints before the cutoff have to be
+rebuilt or a query's own day lies before the cutoff.
+"""
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction as db_transaction
+from django.db.models import Sum, Count, Max, Q, Value, DecimalField
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .engine import RowDigest, signed_digest
+from .ledger import ledger_opening, lock_ledger, signed_amount
+from .models import ArchivedTransaction, Transaction, BalanceCheckpoint
+
+logger = logging.getLogger(__name__)
+
+
+def local_day(value):
+    """
+    Returns the calendar day of a datetime in the current time zone
+    (the same day the chart and the daily-limit check use).
+    """
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localtime(value).date()
+
+
+def day_start(day):
+    """
+    Returns the aware datetime at which the given day starts.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def invalidate_checkpoints(since_day):
+    """
+    Deletes the checkpoints for since_day and every later day, and schedules
+    their rebuild for when the write commits.
+    """
+    BalanceCheckpoint.objects.filter(day__gte=since_day).delete()
+    schedule_checkpoint_rebuild()
+
+
+def _latest_checkpoint(before_day=None):
+    checkpoints = BalanceCheckpoint.objects.order_by('-day')
+    if before_day is not None:
+        checkpoints = checkpoints.filter(day__lt=before_day)
+    return checkpoints.first()
+
+
+def _ledger_models(latest):
+    """
+    The tables holding the days after checkpoint `latest`: the archive is only
+    included when those days start before the archive cutoff.
+    """
+    opening = ledger_opening()
+    if opening is not None and (latest is None or latest.day < opening.cutoff_day):
+        return [Transaction, ArchivedTransaction]
+    return [Transaction]
+
+
+def ensure_checkpoints():
+    """
+    Rebuilds checkpoints for every day after the last valid checkpoint.
+    Returns the number of checkpoints created. Takes the ledger lock, so it is
+    run in the background after writes (schedule_checkpoint_rebuild) and by
+    commands, never by a read.
+    """
+    latest = _latest_checkpoint()
+    latest_times = [model.objects.aggregate(latest=Max('created_at'))['latest'] for model in _ledger_models(latest)]
+    latest_times = [value for value in latest_times if value is not None]
+    if not latest_times or (latest and latest.day >= local_day(max(latest_times))):
+        return 0
+
+    # Lock the ledger so no writer can invalidate a day while we rebuild it.
+    with db_transaction.atomic():
+        lock_ledger()
+        latest = _latest_checkpoint()
+        balance = latest.balance if latest else Decimal('0.00')
+        count = latest.transaction_count if latest else 0
+
+        totals = {}
+        imported = Q(api_external_id__isnull=False)
+        for model in _ledger_models(latest):
+            daily = model.objects.all()
+            if latest:
+                daily = daily.filter(created_at__gte=day_start(latest.day + timedelta(days=1)))
+            daily = (
+                daily.annotate(day=TruncDate('created_at'))
+                .order_by()
+                .values('day')
+                .annotate(
+                    net=Sum(signed_amount()), rows=Count('id'),
+                    imported=Count('id', filter=imported), digest=Sum(RowDigest('api_external_id', 'type', 'amount', 'created_at'), filter=imported),
+                )
+            )
+            for row in daily:
+                net, rows, imported_rows, digest = totals.get(row['day'], (Decimal('0.00'), 0, 0, 0))
+                totals[row['day']] = (net + row['net'], rows + row['rows'], imported_rows + row['imported'], digest + int(row['digest'] or 0))
+
+        checkpoints = []
+        for day in sorted(totals):
+            net, rows, imported_rows, digest = totals[day]
+            balance += net
+            count += rows
+            checkpoints.append(BalanceCheckpoint(
+                day=day, balance=balance, transaction_count=count,
+                imported_count=imported_rows, imported_digest=signed_digest(digest),
+            ))
+        BalanceCheckpoint.objects.bulk_create(checkpoints)
+
+    logger.debug('Rebuilt %d balance checkpoints', len(checkpoints))
+    return len(checkpoints)
+
+
+_job_lock = threading.Lock()
+_job_state = {'running': False, 'again': False}
+
+
+def _run_checkpoint_rebuild():
+    try:
+        while True:
+            ensure_checkpoints()
+            with _job_lock:
+                if not _job_state['again']:
+                    _job_state['running'] = False
+                    return
+                _job_state['again'] = False
+    except Exception as e:
+        logger.debug('Checkpoint rebuild failed: %s', e)
+        with _job_lock:
+            _job_state['running'] = False
+    finally:
+        connection.close()
+
+
+def schedule_checkpoint_rebuild():
+    """
+    Starts ensure_checkpoints() in a background thread once the current write
+    commits. Writes arriving while a rebuild is going on make it run once more
+    afterwards instead of starting a second one.
+    """
+    def start():
+        with _job_lock:
+            if _job_state['running']:
+                _job_state['again'] = True
+                return
+            _job_state['running'] = True
+        threading.Thread(target=_run_checkpoint_rebuild, name='rebuild-checkpoints', daemon=True).start()
+    db_transaction.on_commit(start)
+
+
+def _net_between(since_day, until, inclusive=False):
+    """
+    Net amount of the transactions from the start of since_day (from the first
+    one if None) to until, archived ones included when the range reaches them.
+    """
+    opening = ledger_opening()
+    models = [Transaction]
+    if opening is not None and (since_day is None or since_day < opening.cutoff_day):
+        models.append(ArchivedTransaction)
+    net = Decimal('0.00')
+    for model in models:
+        rows = model.objects.filter(**{'created_at__lte' if inclusive else 'created_at__lt': until})
+        if since_day is not None:
+            rows = rows.filter(created_at__gte=day_start(since_day))
+        net += rows.aggregate(net=Coalesce(Sum(signed_amount()), Value(0, output_field=DecimalField())))['net']
+    return net
+
+
+def _daily_balances(since_day, end_day, balance):
+    """
+    End-of-day balances [(day, balance), ...] of the days from since_day to
+    end_day that have transactions, computed from the rows and starting from
+    the balance before since_day (for days without checkpoints yet).
+    """
+    opening = ledger_opening()
+    models = [Transaction]
+    if opening is not None and since_day < opening.cutoff_day:
+        models.append(ArchivedTransaction)
+    totals = {}
+    for model in models:
+        daily = (
+            model.objects.filter(created_at__gte=day_start(since_day), created_at__lt=day_start(end_day + timedelta(days=1)))
+            .annotate(day=TruncDate('created_at'))
+            .order_by()
+            .values('day')
+            .annotate(net=Sum(signed_amount()))
+        )
+        for row in daily:
+            totals[row['day']] = totals.get(row['day'], Decimal('0.00')) + row['net']
+    balances = []
+    for day in sorted(totals):
+        balance += totals[day]
+        balances.append((day, balance))
+    return balances
+
+
+def balance_at(moment):
+    """
+    Returns the balance including every transaction created at or before `moment`:
+    the nearest checkpoint before its day plus the rows after it, which is only
+    the day's own rows once the checkpoints are up to date.
+    """
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    checkpoint = _latest_checkpoint(before_day=local_day(moment))
+    if checkpoint is None:
+        return _net_between(None, moment, inclusive=True)
+    return checkpoint.balance + _net_between(checkpoint.day + timedelta(days=1), moment, inclusive=True)
+
+
+def balance_before(day):
+    """
+    Returns the balance at the start of the given day (the end of the previous one).
+    """
+    checkpoint = _latest_checkpoint(before_day=day)
+    if checkpoint is None:
+        return _net_between(None, day_start(day))
+    return checkpoint.balance + _net_between(checkpoint.day + timedelta(days=1), day_start(day))
+
+
+def balance_history_between(start_day, end_day):
+    """
+    Returns (opening_balance, closing_balance, history) for the inclusive day range:
+    the balance before start_day, the balance at the end of end_day, and a list of
+    end-of-day balances for each day in the range that has transactions.
+    """
+    opening_balance = balance_before(start_day)
+    balances = list(
+        BalanceCheckpoint.objects.filter(day__gte=start_day, day__lte=end_day)
+        .order_by('day').values_list('day', 'balance')
+    )
+    # Days after the last checkpoint aren't rebuilt yet: add them from the rows.
+    latest = _latest_checkpoint()
+    if latest is None or latest.day < end_day:
+        since_day = start_day if latest is None else max(start_day, latest.day + timedelta(days=1))
+        balances += _daily_balances(since_day, end_day, balances[-1][1] if balances else opening_balance)
+
+    closing_balance = balances[-1][1] if balances else opening_balance
+    history = [{'date': day.isoformat(), 'balance': float(balance)} for day, balance in balances]
+    return opening_balance, closing_balance, history
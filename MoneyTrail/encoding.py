@@ -0,0 +1,68 @@
+# MoneyTrail/encoding.py
+"""
+Compact wire formats for large API payloads.
+
+balance_history is normally a list of {"date": ..., "balance": ...} objects with one
+entry per transaction, so dates repeat for same-day rows and the key names repeat
+for every entry. Clients can opt into the compact encoding with ?history=compact.
+"""
+from datetime import date
+
+COMPACT_HISTORY_ENCODING = 'compact'
+
+
+def compact_balance_history(balance_history):
+    """
+    Encodes a chronological balance history as parallel arrays with one entry per day
+    (the last balance of that day, i.e. the end-of-day balance):
+
+        {
+            "encoding": "compact",
+            "start": "2025-01-01",        # date of the first entry
+            "day_deltas": [0, 1, 3],      # days since the previous entry (first is 0)
+            "balances": [1000.0, 950.0, 1150.0]
+        }
+    """
+    days = []
+    balances = []
+    for point in balance_history:
+        if days and days[-1] == point['date']:
+            balances[-1] = point['balance']
+        else:
+            days.append(point['date'])
+            balances.append(point['balance'])
+
+    day_deltas = []
+    previous = None
+    for day in days:
+        ordinal = date.fromisoformat(day).toordinal()
+        day_deltas.append(0 if previous is None else ordinal - previous)
+        previous = ordinal
+
+    return {
+        'encoding': COMPACT_HISTORY_ENCODING,
+        'start': days[0] if days else None,
+        'day_deltas': day_deltas,
+        'balances': balances,
+    }
+
+
+def expand_balance_history(compact):
+    """
+    Inverse of compact_balance_history (one entry per day).
+    """
+    history = []
+    ordinal = date.fromisoformat(compact['start']).toordinal() if compact['start'] else 0
+    for delta, balance in zip(compact['day_deltas'], compact['balances']):
+        ordinal += delta
+        history.append({'date': date.fromordinal(ordinal).isoformat(), 'balance': balance})
+    return history
+
+
+def encode_balance_history(balance_history, params):
+    """
+    Returns balance_history in the encoding requested with ?history=... in params.
+    """
+    if params.get('history') == COMPACT_HISTORY_ENCODING:
+        return compact_balance_history(balance_history)
+    return balance_history
@@ -0,0 +1,396 @@
+# MoneyTrail/engine.py
+"""
+Column-oriented computation of running balances and balance history.
+
+The whole ledger is fetched as three integer columns, (id, UTC day number, signed
+amount in cents), in one query, without building model instances. Running balances are a
+cumulative sum over the cents column and the balance history is derived from the
+same arrays, so amounts stay exact (no float or Decimal arithmetic per row).
+Running balances start from the opening balance carried forward by
+`archive_transactions` (zero until something is archived).
+
+NumPy is used when installed (pip install numpy); otherwise the same steps run in
+pure Python. Both produce exactly the output of the per-row loop the viewset used
+to run, kept below as recalculate_per_row() for tests and `benchmark_ledger engine`.
+"""
+import hashlib
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import accumulate
+
+from django.db import connections
+from django.db.models import BigIntegerField, F, Func, IntegerField, Value
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone
+
+from .encoding import COMPACT_HISTORY_ENCODING
+from .ledger import opening_balance, signed_amount
+from .models import Transaction
+
+try:
+    import numpy as np  # Optional: pip install numpy
+except ImportError:
+    np = None
+
+# Day numbers count days since 1970-01-01, like NumPy's datetime64[D].
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Timestamps are microseconds since 1970-01-01 UTC.
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECONDS_PER_DAY = 86400 * 1000000
+
+
+class EpochDay(Func):
+    """
+    Days between a date expression and 1970-01-01 (PostgreSQL date subtraction).
+    """
+    template = "(%(expressions)s - DATE '1970-01-01')"
+    output_field = IntegerField()
+
+
+class EpochMicroseconds(Func):
+    """
+    Microseconds since 1970-01-01 UTC of a timestamp expression.
+    """
+    template = '(EXTRACT(EPOCH FROM %(expressions)s) * 1000000)::bigint'
+    output_field = BigIntegerField()
+
+
+class RowDigest(Func):
+    """
+    64-bit digest of an imported row (reconcile.py): the first 8 bytes of the md5 of
+    'external id|type|cents|epoch microseconds', as a signed bigint. Expects the
+    api_external_id, type, amount and created_at field names, in that order.
+    """
+    template = "('x' || SUBSTR(MD5(CONCAT_WS('|', %(expressions)s)), 1, 16))::bit(64)::bigint"
+    output_field = BigIntegerField()
+
+    def __init__(self, external_id, transaction_type, amount, created_at, **extra):
+        super().__init__(
+            external_id, transaction_type,
+            Cast(F(amount) * Value(Decimal('100')), BigIntegerField()),
+            EpochMicroseconds(created_at),
+            **extra
+        )
+
+
+def to_cents(amount):
+    """
+    An amount in integer cents, rounded half up.
+    """
+    # str() first: amounts assigned as floats are stored rounded to 2 places.
+    return int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def row_digest(external_id, transaction_type, amount, created_at):
+    """
+    The RowDigest of a row with these values, computed in Python.
+    """
+    cents = to_cents(amount)
+    content = f'{external_id}|{transaction_type}|{cents}|{to_microseconds(created_at)}'
+    return signed_digest(int(hashlib.md5(content.encode()).hexdigest()[:16], 16))
+
+
+def signed_digest(value):
+    """
+    value modulo 2**64 as a signed 64-bit integer; sums of digests wrap around to this.
+    """
+    value %= 1 << 64
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def day_label(day_number):
+    return date.fromordinal(day_number + EPOCH_ORDINAL).isoformat()
+
+
+def to_microseconds(value):
+    """
+    Microseconds since the epoch of an aware datetime (naive ones are taken as local time).
+    """
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def signed_cents(transaction):
+    """
+    A transaction's effect on the balance in integer cents.
+    """
+    cents = to_cents(transaction.amount)
+    if transaction.type == 'deposit':
+        return cents
+    if transaction.type == 'expense':
+        return -cents
+    return 0
+
+
+def find_position(timestamps, ids, microseconds, pk):
+    """
+    Index of (microseconds, pk) in parallel arrays sorted by (timestamp, id):
+    where it is, or where it would be inserted.
+    """
+    position = bisect_left(timestamps, microseconds)
+    while position < len(timestamps) and timestamps[position] == microseconds and ids[position] < pk:
+        position += 1
+    return position
+
+
+def _cents_to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def opening_cents():
+    """
+    The opening balance of the hot ledger in integer cents.
+    """
+    return int(opening_balance() * 100)
+
+
+def fetch_ledger_columns():
+    """
+    Returns (ids, day_numbers, signed_cents) for every transaction in chronological
+    order. Day numbers are the UTC calendar days (the chart's dates) since 1970-01-01.
+    """
+    queryset = Transaction.objects.order_by('created_at', 'id').values_list(
+        'id',
+        EpochDay(TruncDate('created_at', tzinfo=dt_timezone.utc)),
+        Cast(signed_amount() * Value(Decimal('100')), BigIntegerField()),
+    )
+    # All three columns are plain integers, so the rows are fetched straight from
+    # the cursor instead of through Django's per-row result iterator.
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return [], [], []
+    ids, days, cents = zip(*rows)
+    return ids, days, cents
+
+
+class LedgerSnapshot:
+    """
+    Running balances for the whole ledger in chronological order: either computed
+    from fetch_ledger_columns() (load) or copied from the in-process LedgerIndex.
+
+    When timestamps are given, filtered row lists are paginated in the database and
+    their running balances looked up by position instead of scanning the filter.
+    """
+
+    def __init__(self, ids, day_numbers, running_cents, timestamps=None, use_numpy=None, opening_cents=0):
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self.ids = ids
+        self.opening_cents = opening_cents
+        self.timestamps = timestamps
+        if self.use_numpy:
+            self._day_numbers = np.asarray(day_numbers, dtype=np.int64)
+            self._running_cents = np.asarray(running_cents, dtype=np.int64)
+        else:
+            self._day_numbers = day_numbers
+            self._running_cents = running_cents
+
+    @classmethod
+    def from_columns(cls, ids, day_numbers, signed_cents, use_numpy=None, opening_cents=0):
+        use_numpy = np is not None if use_numpy is None else use_numpy
+        if use_numpy:
+            running_cents = np.cumsum(np.array(signed_cents, dtype=np.int64)) + opening_cents
+        else:
+            running_cents = list(accumulate(signed_cents, initial=opening_cents))[1:]
+        return cls(list(ids), list(day_numbers), running_cents, use_numpy=use_numpy, opening_cents=opening_cents)
+
+    @classmethod
+    def load(cls, use_numpy=None):
+        return cls.from_columns(*fetch_ledger_columns(), use_numpy=use_numpy, opening_cents=opening_cents())
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def total_balance(self):
+        return _cents_to_decimal(self._running_cents[-1] if self.ids else self.opening_cents)
+
+    def running_balance(self, position):
+        """
+        Balance after the transaction at the given chronological position.
+        """
+        return _cents_to_decimal(self._running_cents[position])
+
+    def running_balance_of(self, transaction):
+        """
+        Balance after the given transaction (needs timestamps).
+        """
+        position = find_position(self.timestamps, self.ids, to_microseconds(transaction.created_at), transaction.pk)
+        if position < len(self.ids) and self.ids[position] == transaction.pk:
+            return self.running_balance(position)
+        # Committed after the snapshot was taken: its amount on top of the balance before it.
+        before = self._running_cents[position - 1] if position else self.opening_cents
+        return _cents_to_decimal(before + signed_cents(transaction))
+
+    def _float_balances(self):
+        # int -> float division is correctly rounded, so this equals float(Decimal).
+        if self.use_numpy:
+            return (self._running_cents / 100).tolist()
+        return [cents / 100 for cents in self._running_cents]
+
+    def _day_strings(self):
+        # isoformat() once per distinct day rather than once per row.
+        if self.use_numpy:
+            distinct, inverse = np.unique(self._day_numbers, return_inverse=True)
+            labels = np.datetime_as_string(distinct.astype('datetime64[D]'))
+            return labels[inverse].tolist()
+        labels = {}
+        return [labels.get(day) or labels.setdefault(day, day_label(day)) for day in self._day_numbers]
+
+    def balance_history(self):
+        """
+        One {'date', 'balance'} point per transaction, as returned by the list API.
+        """
+        if not self.ids:
+            return [{'date': timezone.now().date().isoformat(), 'balance': self.opening_cents / 100}]
+        return [
+            {'date': day, 'balance': balance}
+            for day, balance in zip(self._day_strings(), self._float_balances())
+        ]
+
+    def compact_balance_history(self):
+        """
+        Same result as encoding.compact_balance_history(self.balance_history()),
+        computed on the columns: the last row of each day gives its end-of-day balance.
+        """
+        if not self.ids:
+            return {'encoding': COMPACT_HISTORY_ENCODING, 'start': timezone.now().date().isoformat(), 'day_deltas': [0], 'balances': [self.opening_cents / 100]}
+
+        if self.use_numpy:
+            last_of_day = np.flatnonzero(np.append(self._day_numbers[1:] != self._day_numbers[:-1], True))
+            day_numbers = self._day_numbers[last_of_day]
+            day_deltas = np.diff(day_numbers, prepend=day_numbers[0]).tolist()
+            balances = (self._running_cents[last_of_day] / 100).tolist()
+        else:
+            days = self._day_numbers
+            last_of_day = [i for i in range(len(days)) if i + 1 == len(days) or days[i + 1] != days[i]]
+            day_numbers = [days[i] for i in last_of_day]
+            day_deltas = [0] + [b - a for a, b in zip(day_numbers, day_numbers[1:])]
+            balances = [self._running_cents[i] / 100 for i in last_of_day]
+
+        return {
+            'encoding': COMPACT_HISTORY_ENCODING,
+            'start': day_label(int(day_numbers[0])),
+            'day_deltas': day_deltas,
+            'balances': balances,
+        }
+
+    def rows(self, filtered_queryset=None):
+        """
+        The transactions to display (newest first), restricted to filtered_queryset.
+        """
+        positions = range(len(self.ids) - 1, -1, -1)
+        if filtered_queryset is not None and filtered_queryset.query.where:
+            if self.timestamps is not None:
+                return FilteredLedgerRows(self, filtered_queryset)
+            filtered_ids = set(filtered_queryset.values_list('id', flat=True))
+            positions = [position for position in positions if self.ids[position] in filtered_ids]
+        return LedgerRows(self, positions)
+
+
+class LedgerRows:
+    """
+    Sequence of Transaction instances with running_balance set, newest first.
+    Instances are only loaded for the items actually accessed (e.g. one page).
+    """
+
+    def __init__(self, snapshot, positions):
+        self.snapshot = snapshot
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._load(self.positions[index])
+        return self._load([self.positions[index]])[0]
+
+    def _load(self, positions):
+        instances = Transaction.objects.select_related('category').in_bulk([self.snapshot.ids[position] for position in positions])
+        loaded = []
+        for position in positions:
+            instance = instances.get(self.snapshot.ids[position])
+            if instance is None:
+                continue  # Deleted after the snapshot was taken
+            instance.running_balance = self.snapshot.running_balance(position)
+            loaded.append(instance)
+        return loaded
+
+
+class FilteredLedgerRows:
+    """
+    Like LedgerRows for a filtered queryset: counted and paginated in the database
+    (newest first), with running balances looked up in the snapshot.
+    """
+
+    def __init__(self, snapshot, queryset):
+        self.snapshot = snapshot
+        self.queryset = queryset.select_related('category').order_by('-created_at', '-id')
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.queryset.count()
+        return self._count
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            if index < 0:
+                index += len(self)
+            page = self[index:index + 1]
+            if not page:
+                raise IndexError('transaction index out of range')
+            return page[0]
+        if (index.start or 0) < 0 or (index.stop or 0) < 0 or index.step not in (None, 1):
+            return self[:][index]
+        instances = list(self.queryset[index])
+        for instance in instances:
+            instance.running_balance = self.snapshot.running_balance_of(instance)
+        return instances
+
+
+def recalculate_per_row(filtered_queryset=None):
+    """
+    Reference implementation: the per-row loop over model instances that
+    TransactionViewSet._recalculate_balances used before this engine.
+    Returns (total_balance, display_transactions, balance_history).
+    """
+    all_transactions = Transaction.objects.all().order_by('created_at', 'id')
+
+    running_balance = opening_balance()
+    transactions_with_balance = []
+    balance_history = []
+
+    if not all_transactions.exists():
+        balance_history.append({'date': timezone.now().date().isoformat(), 'balance': float(running_balance)})
+
+    for trans in all_transactions:
+        if trans.type == 'deposit':
+            running_balance += trans.amount
+        elif trans.type == 'expense':
+            running_balance -= trans.amount
+        trans.running_balance = running_balance
+        transactions_with_balance.append(trans)
+        balance_history.append({'date': trans.created_at.date().isoformat(), 'balance': float(running_balance)})
+
+    if filtered_queryset is not None:
+        filtered_ids = set(filtered_queryset.values_list('id', flat=True))
+        display_transactions = [t for t in transactions_with_balance if t.id in filtered_ids]
+    else:
+        display_transactions = list(transactions_with_balance)
+    display_transactions.reverse()
+
+    total_balance = running_balance
+    return total_balance, display_transactions, balance_history
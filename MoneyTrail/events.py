@@ -0,0 +1,124 @@
+# MoneyTrail/events.py
+"""
+Live push of ledger changes to open browsers over Server-Sent Events.
+
+Writers (the viewset, fetch_transactions) call publish_ledger_change() and the
+event is broadcast once their transaction commits. The in-process broker fans it
+out to every connected /api/events/ stream served by ledger_events_app, which
+transaction_tracker/asgi.py mounts in front of Django.
+
+The broker is process-local: it reaches clients connected to the same ASGI worker.
+Writes made by another process (e.g. `manage.py fetch_transactions` run from a shell)
+are not pushed; clients still pick them up on their next refresh.
+"""
+import asyncio
+import json
+import threading
+
+from django.db import transaction as db_transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+# Seconds between keep-alive comments on an idle stream (stops proxies timing it out).
+KEEPALIVE_SECONDS = 15
+
+# Events buffered per client before it is considered too slow and told to resync.
+CLIENT_QUEUE_SIZE = 256
+
+
+class LedgerEventBroker:
+    """
+    Thread-safe fan-out of encoded events to subscriber callbacks.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.add(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.discard(callback)
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(message)
+
+
+broker = LedgerEventBroker()
+
+
+def publish_ledger_change(op, rows, total_balance):
+    """
+    Broadcasts a change event after the current transaction commits.
+
+    op is 'added', 'updated' or 'deleted'; rows is a list of serialized transactions
+    (just {'id': ...} for deletions); total_balance is the balance after the change.
+    Bulk changes send op 'resync' with no rows: clients refetch.
+    """
+    message = json.dumps({'op': op, 'rows': rows, 'total_balance': total_balance}, cls=JSONEncoder, separators=(',', ':'))
+    db_transaction.on_commit(lambda: broker.publish(message))
+
+
+async def ledger_events_app(scope, receive, send):
+    """
+    ASGI app streaming broker events as text/event-stream until the client disconnects.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+
+    def enqueue(message):
+        # Called from whichever thread committed the write.
+        loop.call_soon_threadsafe(_put_or_resync, queue, message)
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # Disable proxy buffering (nginx)
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+
+    broker.subscribe(enqueue)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        while not disconnected.done():
+            next_message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({next_message, disconnected}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            if next_message in done:
+                body = f'data: {next_message.result()}\n\n'.encode()
+            else:
+                next_message.cancel()
+                if disconnected in done:
+                    break
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broker.unsubscribe(enqueue)
+        disconnected.cancel()
+
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def _put_or_resync(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # The client fell behind: drop its backlog and ask it to refetch instead.
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(json.dumps({'op': 'resync'}))
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
@@ -0,0 +1,94 @@
+# MoneyTrail/facets.py
+"""
+Facet counts and sums for filtered transaction lists (?facets=1 on the list endpoint).
+
+For the rows matching the current filters, facets give the number and sum of
+deposits and expenses, overall and per month. They come from one GROUP BY month
+query with conditional aggregates (COUNT/SUM ... FILTER (WHERE type = ...)), which
+reads the same rows as the filter itself (transaction_type_created_idx,
+transaction_created_id_idx); the per-type totals are the sums of the months.
+
+Results are cached per ledger head and filter, so the pages of one filtered list
+share a single computation and any write starts a new cache generation.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.http import urlencode
+
+from .ledger import ledger_version
+
+# Query parameter enabling facets on the list endpoint, and the values turning it on.
+FACETS_PARAM = 'facets'
+FACETS_ENABLED_VALUES = ('1', 'true')
+
+# Seconds facets stay cached. Entries of older ledger versions are never read
+# again, so this only bounds how long they take up space.
+FACETS_CACHE_TIMEOUT = 300
+
+TYPES = ('deposit', 'expense')
+
+
+def facets_requested(params):
+    return params.get(FACETS_PARAM, '').lower() in FACETS_ENABLED_VALUES
+
+
+def _monthly_rows(queryset):
+    aggregates = {}
+    for transaction_type in TYPES:
+        matches = Q(type=transaction_type)
+        aggregates[f'{transaction_type}_count'] = Count('id', filter=matches)
+        aggregates[f'{transaction_type}_total'] = Sum('amount', filter=matches)
+    return (
+        queryset.order_by()
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(**aggregates)
+        .order_by('month')
+    )
+
+
+def compute_facets(querysets):
+    """
+    Returns the facets of the rows of all querysets together (the hot rows and,
+    when the filter reaches past the archive cutoff, the archived ones):
+
+        {
+            "type": {"deposit": {"count": 2, "total": 1200.0}, "expense": {...}},
+            "month": [{"month": "2025-01", "deposit": {"count": 2, "total": 1200.0}, "expense": {...}}, ...]
+        }
+    """
+    months = {}
+    for queryset in querysets:
+        for row in _monthly_rows(queryset):
+            label = row['month'].strftime('%Y-%m')
+            entry = months.setdefault(label, {transaction_type: {'count': 0, 'total': Decimal('0.00')} for transaction_type in TYPES})
+            for transaction_type in TYPES:
+                entry[transaction_type]['count'] += row[f'{transaction_type}_count']
+                entry[transaction_type]['total'] += row[f'{transaction_type}_total'] or Decimal('0.00')
+
+    by_type = {transaction_type: {'count': 0, 'total': Decimal('0.00')} for transaction_type in TYPES}
+    for entry in months.values():
+        for transaction_type in TYPES:
+            by_type[transaction_type]['count'] += entry[transaction_type]['count']
+            by_type[transaction_type]['total'] += entry[transaction_type]['total']
+
+    return {
+        'type': by_type,
+        'month': [{'month': label, **months[label]} for label in sorted(months)],
+    }
+
+
+def cached_facets(filter_params, querysets):
+    """
+    compute_facets(querysets), cached under the ledger head and filter_params
+    (the filter query parameters only, so every page shares the entry).
+    """
+    version, updated_at = ledger_version()
+    query = urlencode(sorted(filter_params.items()))
+    generation = f'{version}:{updated_at.timestamp() if updated_at else 0}'
+    key = f'MoneyTrail:facets:{generation}:{hashlib.md5(query.encode()).hexdigest()}'
+    return cache.get_or_set(key, lambda: compute_facets(querysets), FACETS_CACHE_TIMEOUT)
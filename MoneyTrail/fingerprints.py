@@ -0,0 +1,111 @@
+# MoneyTrail/fingerprints.py
+"""
+Content fingerprints of transactions, for duplicate detection on import.
+
+External ids only catch records the API sends twice under the same id. Manual
+entries and statement files have no ids, or re-issue them, so every transaction
+also stores a fingerprint of its content: type, amount in cents, the UTC day it
+was created on and its normalized description (lowercased, punctuation and
+repeated spaces collapsed), hashed into the indexed Transaction.fingerprint column.
+
+An incoming record is
+  - a duplicate when an existing transaction (or an earlier record of the same
+    import) has its fingerprint, unless both have external ids and they differ,
+  - a lookalike when the only transactions with its fingerprint have other
+    external ids: API records share generic descriptions ("Deposit from API"),
+    so two real payments of the same amount on the same day look identical, and
+  - a near-duplicate when one has the fingerprint it would have a day earlier or
+    later (the same payment booked on a neighbouring day, or across midnight in
+    another time zone).
+Only duplicates are skipped by the import; the others are reported.
+find_duplicates() checks a whole chunk of records with one indexed IN query.
+"""
+import hashlib
+import re
+from datetime import timezone as dt_timezone
+
+from .engine import to_cents
+from .models import Transaction
+
+# Records checked per query.
+DUPLICATE_CHECK_CHUNK_SIZE = 1000
+
+# Days either side of a record's own day that still count as a near-duplicate.
+NEAR_DUPLICATE_DAYS = 1
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_description(description):
+    return _NON_WORD.sub(' ', (description or '').lower()).strip()
+
+
+def day_bucket(created_at):
+    return created_at.astimezone(dt_timezone.utc).date().toordinal()
+
+
+def fingerprint(transaction_type, amount, created_at, description, day_offset=0):
+    """
+    Fingerprint of a transaction with these fields; day_offset shifts its day bucket.
+    """
+    content = f'{transaction_type}|{to_cents(amount)}|{day_bucket(created_at) + day_offset}|{normalize_description(description)}'
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def _existing_fingerprints(fingerprints):
+    # fingerprint -> [(id, external id)] of the transactions that have it, lowest id first.
+    matches = {}
+    rows = Transaction.objects.filter(fingerprint__in=fingerprints).order_by('id').values_list('fingerprint', 'id', 'api_external_id')
+    for value, pk, external_id in rows:
+        matches.setdefault(value, []).append((pk, external_id))
+    return matches
+
+
+def _same_record(external_id, other):
+    # Different external ids mean two records, whatever their content.
+    return external_id is None or other is None or external_id == other
+
+
+def find_duplicates(records):
+    """
+    records: (transaction_type, amount, created_at, description, external_id)
+    tuples; external_id may be None. Returns one (kind, match) pair per record,
+    in order: kind is None, 'duplicate', 'lookalike' or 'near-duplicate', and
+    match is the id of the matching transaction (None when it is an earlier
+    record of the same batch). Issues one query per DUPLICATE_CHECK_CHUNK_SIZE records.
+    """
+    results = []
+    seen = {}  # Fingerprint -> external ids of the earlier records of this batch
+    offsets = range(-NEAR_DUPLICATE_DAYS, NEAR_DUPLICATE_DAYS + 1)
+    for start in range(0, len(records), DUPLICATE_CHECK_CHUNK_SIZE):
+        chunk = records[start:start + DUPLICATE_CHECK_CHUNK_SIZE]
+        candidates_by_record = [
+            {offset: fingerprint(*record[:4], day_offset=offset) for offset in offsets}
+            for record in chunk
+        ]
+        existing = _existing_fingerprints({value for candidates in candidates_by_record for value in candidates.values()})
+        for record, candidates in zip(chunk, candidates_by_record):
+            external_id = record[4]
+            own = candidates[0]
+            matches = existing.get(own, [])
+            batch = seen.get(own, [])
+            same = next((pk for pk, other in matches if _same_record(external_id, other)), None)
+            if same is not None:
+                results.append(('duplicate', same))
+            elif any(_same_record(external_id, other) for other in batch):
+                results.append(('duplicate', None))
+            elif matches:
+                results.append(('lookalike', matches[0][0]))
+            elif batch:
+                results.append(('lookalike', None))
+            else:
+                near = [candidates[offset] for offset in offsets if offset]
+                match = next((existing[value][0][0] for value in near if value in existing), None)
+                if match is not None:
+                    results.append(('near-duplicate', match))
+                elif any(value in seen for value in near):
+                    results.append(('near-duplicate', None))
+                else:
+                    results.append((None, None))
+            seen.setdefault(own, []).append(external_id)
+    return results
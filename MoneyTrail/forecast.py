@@ -0,0 +1,348 @@
+# MoneyTrail/forecast.py
+"""
+Balance forecast for the next days (/api/transactions/forecast/).
+
+The last FORECAST_LOOKBACK_DAYS days of history are read in one query, grouped
+by type and description with the days and amounts of each group. A group that
+comes back at a steady interval (weekly to quarterly, monthly ones on the same
+day of the month) is a recurring item and is scheduled forward from its last
+occurrence. Everything else is day-to-day spending: the net amount of each past
+day, pooled by weekday.
+
+The expected projection adds the recurring items and the weekday average to the
+current balance. With ?simulations=N, N paths are drawn by resampling past days
+of the same weekday (a bootstrap, so no distribution is assumed) on top of the
+recurring items; the balances of all paths are one cumulative sum over a
+(paths x days) matrix and the bands are its percentiles per day. NumPy is used
+when installed; otherwise the same steps run in pure Python, much slower for
+many paths. Amounts are integer cents throughout.
+
+Warnings point out where writes would start being rejected: the first day the
+expected balance goes below zero (expenses fail the balance check), the share of
+simulated paths that do, and the days expected to reach the daily expense limit.
+Results are cached per ledger head, day and parameters, like facets.
+"""
+import calendar
+import hashlib
+import random
+from datetime import timedelta
+from decimal import Decimal
+from statistics import median
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
+from django.db.models import Max
+from django.db.models.functions import Lower, TruncDate
+from django.utils import timezone
+
+from .archive import archive_reached
+from .checkpoints import day_start
+from .index import ledger_snapshot
+from .ledger import ledger_version
+from .models import ArchivedTransaction, Transaction
+
+try:
+    import numpy as np  # Optional: pip install numpy
+except ImportError:
+    np = None
+
+# Days of history the model is fitted on.
+FORECAST_LOOKBACK_DAYS = 365
+
+# Limits on the request: days forecast and simulated paths.
+DEFAULT_FORECAST_DAYS = 90
+MAX_FORECAST_DAYS = 730
+MAX_SIMULATIONS = 10000
+
+# Percentiles reported for the simulated balances.
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# A group is recurring when it occurred on at least MIN_OCCURRENCES days, its
+# median interval is MIN_PERIOD_DAYS to MAX_PERIOD_DAYS, and at least
+# REGULAR_SHARE of its intervals are within PERIOD_TOLERANCE of it (2 days at least).
+MIN_OCCURRENCES = 3
+MIN_PERIOD_DAYS = 7
+MAX_PERIOD_DAYS = 95
+PERIOD_TOLERANCE = 0.15
+REGULAR_SHARE = 0.8
+
+# Seconds results stay cached (see facets.FACETS_CACHE_TIMEOUT).
+FORECAST_CACHE_TIMEOUT = 300
+
+
+class ForecastError(ValueError):
+    """
+    Raised for forecast parameters outside the limits above.
+    """
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+class RecurringItem:
+
+    def __init__(self, transaction_type, description, cents, period, last_day):
+        self.type = transaction_type
+        self.description = description
+        self.cents = cents
+        self.period = period
+        self.last_day = last_day
+
+    @property
+    def monthly(self):
+        return 28 <= self.period <= 31
+
+    def dates(self, first_day, last_day):
+        """
+        The days from first_day to last_day (inclusive) the item is expected on.
+        """
+        step = 1
+        day = self.last_day
+        while day <= last_day:
+            if day >= first_day:
+                yield day
+            day = _add_months(self.last_day, step) if self.monthly else self.last_day + timedelta(days=self.period * step)
+            step += 1
+
+    def as_dict(self, today):
+        return {
+            'description': self.description,
+            'type': self.type,
+            'amount': abs(self.cents) / 100,
+            'every_days': self.period,
+            'monthly': self.monthly,
+            'next_date': next(self.dates(today + timedelta(days=1), today + timedelta(days=3 * self.period))).isoformat(),
+        }
+
+
+def _recurring_item(transaction_type, description, cents_by_day, today):
+    """
+    Returns a RecurringItem if the occurrences ({day: cents}) of a group are
+    regular enough, and recent enough to still be going on; otherwise None.
+    """
+    days = sorted(cents_by_day)
+    if len(days) < MIN_OCCURRENCES:
+        return None
+    gaps = [(later - earlier).days for earlier, later in zip(days, days[1:])]
+    period = round(median(gaps))
+    if not MIN_PERIOD_DAYS <= period <= MAX_PERIOD_DAYS:
+        return None
+    tolerance = max(2, period * PERIOD_TOLERANCE)
+    if sum(abs(gap - period) <= tolerance for gap in gaps) < REGULAR_SHARE * len(gaps):
+        return None
+    if (today - days[-1]).days > 2 * period:
+        return None  # Stopped
+    return RecurringItem(transaction_type, description, round(median(cents_by_day.values())), period, days[-1])
+
+
+def _history_groups(first_day, today):
+    """
+    Returns [(type, description, [(day, cents), ...]), ...], one entry per type and
+    description (case-insensitive) between first_day and today, archived rows included.
+    """
+    models = [Transaction]
+    if archive_reached(first_day):
+        models.append(ArchivedTransaction)
+    groups = {}
+    for model in models:
+        rows = (
+            model.objects.filter(created_at__gte=day_start(first_day), created_at__lt=day_start(today + timedelta(days=1)))
+            .values('type', key=Lower('description'))
+            .annotate(description=Max('description'), days=ArrayAgg(TruncDate('created_at')), amounts=ArrayAgg('amount'))
+            .values_list('type', 'key', 'description', 'days', 'amounts')
+        )
+        for transaction_type, key, description, days, amounts in rows:
+            _, _, occurrences = groups.setdefault((transaction_type, key), (transaction_type, description, []))
+            occurrences.extend((day, int(amount * 100)) for day, amount in zip(days, amounts))
+    return list(groups.values())
+
+
+class ForecastModel:
+
+    def __init__(self, today, lookback_days=FORECAST_LOOKBACK_DAYS):
+        """
+        Fits the model on the history up to today (inclusive).
+        """
+        self.today = today
+        first_day = today - timedelta(days=lookback_days - 1)
+        self.recurring = []
+        residual = []  # (day, cents, is_expense) of the rows not in a recurring item
+        start = today
+        for transaction_type, description, occurrences in _history_groups(first_day, today):
+            start = min(start, min(day for day, _ in occurrences))
+            sign = -1 if transaction_type == 'expense' else 1
+            cents_by_day = {}
+            for day, cents in occurrences:
+                cents_by_day[day] = cents_by_day.get(day, 0) + sign * cents
+            item = _recurring_item(transaction_type, description, cents_by_day, today)
+            if item is not None:
+                self.recurring.append(item)
+            else:
+                residual.extend((day, sign * cents, sign < 0) for day, cents in occurrences)
+
+        # Pools hold the complete days, from the first one with history so a young
+        # ledger isn't diluted with empty days from before it existed.
+        length = (today - start).days
+        net = [0] * length
+        expenses = [0] * length
+        for day, cents, is_expense in residual:
+            if day < today:
+                net[(day - start).days] += cents
+                expenses[(day - start).days] += is_expense
+        # Pools of (net cents, expense count) per weekday, with every day as fallback.
+        self.pools = [[] for _ in range(7)]
+        for offset in range(length):
+            self.pools[(start + timedelta(days=offset)).weekday()].append((net[offset], expenses[offset]))
+        everyday = [value for pool in self.pools for value in pool] or [(0, 0)]
+        self.pools = [pool or everyday for pool in self.pools]
+
+    def schedule(self, days):
+        """
+        Returns (cents, expense counts) of the recurring items for each of the
+        next `days` days.
+        """
+        first_day = self.today + timedelta(days=1)
+        cents = [0] * days
+        counts = [0] * days
+        for item in self.recurring:
+            for day in item.dates(first_day, self.today + timedelta(days=days)):
+                cents[(day - first_day).days] += item.cents
+                counts[(day - first_day).days] += item.type == 'expense'
+        return cents, counts
+
+    def weekdays(self, days):
+        return [(self.today + timedelta(days=offset)).weekday() for offset in range(1, days + 1)]
+
+    def expected(self, days):
+        """
+        Returns (net cents, expense counts) expected on each of the next `days` days.
+        """
+        cents, counts = self.schedule(days)
+        means = [
+            (sum(net for net, _ in pool) / len(pool), sum(count for _, count in pool) / len(pool))
+            for pool in self.pools
+        ]
+        weekdays = self.weekdays(days)
+        return (
+            [scheduled + means[weekday][0] for scheduled, weekday in zip(cents, weekdays)],
+            [scheduled + means[weekday][1] for scheduled, weekday in zip(counts, weekdays)],
+        )
+
+    def simulate(self, opening_cents, days, simulations, seed):
+        """
+        Draws `simulations` paths. Returns ({percentile: [cents per day]}, share
+        of paths whose balance goes below zero).
+        """
+        scheduled, _ = self.schedule(days)
+        weekdays = self.weekdays(days)
+        if np is not None:
+            rng = np.random.default_rng(seed)
+            steps = np.empty((simulations, days), dtype=np.int64)
+            for weekday in set(weekdays):
+                columns = np.flatnonzero(np.array(weekdays) == weekday)
+                pool = np.array([net for net, _ in self.pools[weekday]], dtype=np.int64)
+                steps[:, columns] = pool[rng.integers(len(pool), size=(simulations, len(columns)))]
+            balances = np.cumsum(steps + np.array(scheduled, dtype=np.int64), axis=1) + opening_cents
+            bands = np.percentile(balances, PERCENTILES, axis=0)
+            below_zero = float((balances.min(axis=1) < 0).mean())
+            return {percentile: band.tolist() for percentile, band in zip(PERCENTILES, bands)}, below_zero
+
+        rng = random.Random(seed)
+        pools = [[net for net, _ in pool] for pool in self.pools]
+        columns = [[] for _ in range(days)]
+        below_zero = 0
+        for _ in range(simulations):
+            balance = opening_cents
+            lowest = balance
+            for offset, weekday in enumerate(weekdays):
+                balance += scheduled[offset] + rng.choice(pools[weekday])
+                columns[offset].append(balance)
+                lowest = min(lowest, balance)
+            below_zero += lowest < 0
+        bands = {percentile: [] for percentile in PERCENTILES}
+        for column in columns:
+            column.sort()
+            for percentile in PERCENTILES:
+                # Linear interpolation between ranks, as numpy.percentile does.
+                position = percentile / 100 * (len(column) - 1)
+                lower = int(position)
+                upper = min(lower + 1, len(column) - 1)
+                bands[percentile].append(column[lower] + (column[upper] - column[lower]) * (position - lower))
+        return bands, below_zero / simulations
+
+
+def forecast(days=DEFAULT_FORECAST_DAYS, simulations=0, seed=0, daily_limit=None, today=None):
+    """
+    Returns the forecast of the next `days` days after today:
+    {'start_date', 'days', 'balance', 'recurring': [...], 'expected': [{'date',
+    'balance', 'expenses'}, ...], 'simulations', 'bands': {'p5': [...], ...} or
+    None, 'warnings': [{'type', 'date', 'detail', ...}, ...]}.
+    daily_limit is the daily expense limit writes are checked against, if any.
+    """
+    if not 1 <= days <= MAX_FORECAST_DAYS:
+        raise ForecastError(f'days must be between 1 and {MAX_FORECAST_DAYS}.')
+    if not 0 <= simulations <= MAX_SIMULATIONS:
+        raise ForecastError(f'simulations must be between 0 and {MAX_SIMULATIONS}.')
+
+    today = today or timezone.localdate()
+    opening_cents = int(ledger_snapshot().total_balance * 100)
+    model = ForecastModel(today)
+    net, counts = model.expected(days)
+
+    dates = [(today + timedelta(days=offset)).isoformat() for offset in range(1, days + 1)]
+    expected = []
+    balance = opening_cents
+    for day, cents, count in zip(dates, net, counts):
+        balance += cents
+        expected.append({'date': day, 'balance': round(balance) / 100, 'expenses': round(count, 2)})
+
+    warnings = []
+    below_zero_on = next((point['date'] for point in expected if point['balance'] < 0), None)
+    if below_zero_on:
+        warnings.append({
+            'type': 'balance', 'date': below_zero_on,
+            'detail': f'The balance is expected to go below zero on {below_zero_on}; expenses will be rejected from then on.',
+        })
+
+    bands = None
+    if simulations:
+        cents_bands, below_zero = model.simulate(opening_cents, days, simulations, seed)
+        bands = {f'p{percentile}': [round(cents) / 100 for cents in band] for percentile, band in cents_bands.items()}
+        if below_zero:
+            warnings.append({
+                'type': 'balance_risk', 'date': None, 'probability': round(below_zero, 4),
+                'detail': f'{below_zero:.0%} of simulated paths go below zero within {days} days.',
+            })
+
+    if daily_limit is not None:
+        limited = [point for point in expected if point['expenses'] >= daily_limit]
+        if limited:
+            warnings.append({
+                'type': 'daily_limit', 'date': limited[0]['date'], 'days': len(limited),
+                'detail': f'{len(limited)} of the next {days} days are expected to reach the daily expense limit ({daily_limit} expenses per day).',
+            })
+
+    return {
+        'start_date': dates[0],
+        'days': days,
+        'balance': Decimal(opening_cents) / 100,
+        'recurring': [item.as_dict(today) for item in sorted(model.recurring, key=lambda item: (item.type, -abs(item.cents)))],
+        'expected': expected,
+        'simulations': simulations,
+        'bands': bands,
+        'warnings': warnings,
+    }
+
+
+def cached_forecast(days=DEFAULT_FORECAST_DAYS, simulations=0, seed=0, daily_limit=None):
+    """
+    forecast(), cached under the ledger head, the current day and the parameters.
+    """
+    version, updated_at = ledger_version()
+    generation = f'{version}:{updated_at.timestamp() if updated_at else 0}'
+    query = f'{timezone.localdate().isoformat()}:{timezone.get_current_timezone_name()}:{days}:{simulations}:{seed}:{daily_limit}'
+    key = f'MoneyTrail:forecast:{generation}:{hashlib.md5(query.encode()).hexdigest()}'
+    return cache.get_or_set(key, lambda: forecast(days, simulations, seed, daily_limit), FORECAST_CACHE_TIMEOUT)
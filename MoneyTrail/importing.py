@@ -0,0 +1,103 @@
+# MoneyTrail/importing.py
+"""
+Parsing and validation of external API transaction records (fetch_transactions).
+
+Kept free of model and settings access so validate_chunk() can run in worker
+processes: large payloads are split into chunks and validated in a process pool.
+Timestamps without an offset are returned naive; the caller makes them aware.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import dateutil.parser # pip install python-dateutil for robust date parsing
+
+# The external API serving the transactions to import (fetch_transactions, reconcile_transactions).
+API_URL = "https://685efce5c55df675589d49df.mockapi.io/api/v1/transactions"
+
+# Mirrors Transaction.TRANSACTION_TYPES (checked in the tests).
+TRANSACTION_TYPE_VALUES = frozenset({'deposit', 'expense'})
+
+# Payloads with at least this many records are validated in a process pool...
+PARALLEL_MIN_RECORDS = 50000
+
+# ...when at least this many CPUs are available. With the fast path a record takes
+# about 5us to validate and about as long to pickle back from a worker, so a pool
+# only pays off with several cores.
+PARALLEL_MIN_WORKERS = 4
+
+# Records per task sent to a worker process.
+CHUNK_SIZE = 10000
+
+
+def parse_created_at(value):
+    """
+    Parses an API timestamp. The common ISO 8601 shape ("2025-06-27T12:52:58.669Z")
+    goes through datetime.fromisoformat; anything else falls back to dateutil.
+    Raises ValueError if neither can parse it.
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return dateutil.parser.parse(value)
+
+
+def validate_record(data):
+    """
+    Validates one API record. Returns (fields, None) for a valid record, where fields
+    is (external_id, description, amount, type, created_at), or (None, warning) with
+    the message to report for a skipped one.
+    """
+    external_id = data.get('id') # This is the ID from the external API
+    amount_str = data.get('amount')
+    transaction_type = data.get('type')
+    created_at_str = data.get('createdAt')
+
+    # Basic validation of API data
+    if not all([external_id, amount_str, transaction_type, created_at_str]):
+        return None, f'Skipping transaction due to missing data: {data}'
+
+    try:
+        amount = Decimal(str(amount_str)) # Ensure amount is Decimal
+        if amount <= 0:
+            return None, f'Skipping transaction {external_id} due to non-positive amount: {amount_str}'
+    except InvalidOperation:
+        return None, f'Skipping transaction {external_id} due to invalid amount format: {amount_str}'
+
+    if not isinstance(transaction_type, str) or transaction_type not in TRANSACTION_TYPE_VALUES:
+        return None, f'Skipping transaction {external_id} due to invalid type: {transaction_type}'
+
+    try:
+        created_at = parse_created_at(created_at_str)
+    except (ValueError, OverflowError):
+        return None, f'Skipping transaction {external_id} due to invalid date format: {created_at_str}'
+
+    # Generate a default description for API transactions
+    description = f"{transaction_type.capitalize()} from API"
+    return (external_id, description, amount, transaction_type, created_at), None
+
+
+def validate_chunk(records):
+    return [validate_record(data) for data in records]
+
+
+def validate_records(records, workers=None):
+    """
+    Validates records in order, returning one validate_record() result per record.
+    Large payloads are split into CHUNK_SIZE chunks validated by a process pool of
+    `workers` processes (default: one per CPU, if there are PARALLEL_MIN_WORKERS).
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+        if workers < PARALLEL_MIN_WORKERS:
+            workers = 1
+    if len(records) < PARALLEL_MIN_RECORDS or workers < 2:
+        return validate_chunk(records)
+
+    chunks = [records[start:start + CHUNK_SIZE] for start in range(0, len(records), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = []
+        for chunk_results in executor.map(validate_chunk, chunks):
+            results.extend(chunk_results)
+        return results
@@ -0,0 +1,783 @@
+# MoneyTrail/index.py
+"""
+Process-resident index of the ledger for O(log n) balance lookups.
+
+LedgerIndex keeps three parallel arrays sorted by (created_at, id): timestamps in
+microseconds, ids, and the signed amounts in cents. They are compact `array('q')`
+buffers, 24 bytes per transaction, with no model instances. A segment tree over
+the amounts (LedgerTree) stores the sum and the lowest running sum of every
+subtree, so a running balance, the total or the sum of any time range is a
+bisect plus an O(log n) sum, and "what is the lowest balance between two rows"
+is O(log n) too, which lets writes be validated against every past balance, not
+just the total (see lowest_cents). A write is an O(log n) update of the tree
+instead of shifting every later balance. With the tree, the index takes roughly
+75 to 160 bytes per transaction. Balances start from the opening balance of
+archived transactions, so lookups cover moments at or after the archive cutoff
+(see archive.py).
+
+The index is loaded on first use. Every use first compares the index's ledger
+head, the version and its timestamp, with the one its database connection sees.
+When the ledger has moved on, e.g. after a write by another process, the index
+catches up with the transactions changed since, read from the outbox (see
+outbox.py and ledger_file.changes_since), instead of reading the whole ledger
+again. It only reloads when that isn't possible: an archive run, a version that
+went back (a flushed database) or too many changes at once.
+
+Writers hand each change to apply(), which applies it when its transaction
+commits (transaction.on_commit), so the index only ever holds committed rows
+and readers on other connections never reload around a write in progress. The
+writer's own reads before the commit get the index with its changes laid over
+it, under the index lock, and taken back out afterwards (see at_database_head),
+so the writing request reads its own change without a reload. Requests share
+one immutable LedgerSnapshot per change (see snapshot).
+"""
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connections, transaction as db_transaction
+from django.conf import settings
+from django.db.models import BigIntegerField, Value
+from django.db.models.functions import Cast
+
+from .engine import MICROSECONDS_PER_DAY, EpochMicroseconds, LedgerSnapshot, find_position, np, opening_cents, to_microseconds
+from .ledger_file import LedgerFile, LedgerFileError, changes_since, last_change_seq
+from .ledger import ledger_version, signed_amount
+from .models import Transaction
+
+logger = logging.getLogger(__name__)
+
+# Attempts at reading a consistent copy of the ledger before giving up.
+MAX_LOAD_ATTEMPTS = 3
+
+# Past this many rows changed by other processes, catching up merges them into
+# the arrays in one pass and rebuilds the tree instead of moving rows one by one.
+MAX_ROWS_APPLIED_IN_PLACE = 64
+
+# Stands in for the id of a row not saved yet: ids are assigned in increasing
+# order, so it sorts after every saved row with the same timestamp.
+UNSAVED_PK = 2 ** 63 - 1
+
+# The lowest running sum of a LedgerTree node with no rows below it.
+NO_BALANCE = 2 ** 63 - 1
+
+
+def _fetch_rows():
+    # Read from the cursor directly, so the SQL column order is what matters:
+    # Django selects model fields before expressions.
+    queryset = Transaction.objects.order_by('created_at', 'id').values_list(
+        'id',
+        EpochMicroseconds('created_at'),
+        Cast(signed_amount() * Value(Decimal('100')), BigIntegerField()),
+    )
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _to_array(column):
+    if isinstance(column, (tuple, list)):
+        return array('q', column)
+    result = array('q')
+    result.frombytes(memoryview(column).cast('B'))
+    return result
+
+
+def _prefix_sums(cents, opening):
+    # Running balances after each row, starting from the opening balance.
+    if np is not None and len(cents):
+        return _to_array(np.cumsum(np.frombuffer(cents, dtype=np.int64)) + opening)
+    prefix = array('q', accumulate(cents, initial=opening))
+    del prefix[0]
+    return prefix
+
+
+def _without_ids(columns, changed_ids):
+    # The (timestamps, ids, cents) columns without the rows of changed_ids.
+    if not changed_ids:
+        return columns
+    if np is not None:
+        keep = ~np.isin(np.frombuffer(columns[1], dtype=np.int64), np.fromiter(changed_ids, dtype=np.int64, count=len(changed_ids)))
+        return [np.frombuffer(column, dtype=np.int64)[keep] for column in columns]
+    return list(zip(*[row for row in zip(*columns) if row[1] not in changed_ids])) or [(), (), ()]
+
+
+def _insert_rows(timestamps, ids, cents, rows):
+    """
+    Inserts (id, microseconds, cents, ...) rows, sorted by (microseconds, id), into
+    the sorted columns: one pass with numpy, an insert per row otherwise.
+    """
+    if not rows:
+        return
+    positions = [find_position(timestamps, ids, row[1], row[0]) for row in rows]
+    if np is None:
+        for offset, (position, row) in enumerate(zip(positions, rows)):
+            timestamps.insert(position + offset, row[1])
+            ids.insert(position + offset, row[0])
+            cents.insert(position + offset, row[2])
+        return
+    for column, values in ((timestamps, [row[1] for row in rows]), (ids, [row[0] for row in rows]), (cents, [row[2] for row in rows])):
+        merged = np.insert(np.frombuffer(column, dtype=np.int64), positions, values)
+        del column[:]
+        column.frombytes(merged.tobytes())
+
+
+class LedgerTree:
+    """
+    Segment tree over the signed amounts (in cents) in ledger order. Each node
+    stores the sum of the amounts below it and the lowest running sum within
+    them, so the balance before a row and the lowest balance between two rows
+    are O(log n) queries, and inserting or removing a row is an O(log n) point
+    update instead of shifting every later balance.
+
+    Rows sit on leaves ("slots") with gaps between them: a new row takes the
+    free slot halfway between its neighbours. When they are adjacent, the
+    smallest enclosing subtree that is sparse enough is spread out again, and
+    when the whole tree is too full it's rebuilt at twice the size, as in a
+    packed-memory array; those respreads add O(log² n) amortized per write.
+    Built in O(n), one vectorized pass per level with numpy.
+    """
+
+    # Highest share of used slots in the whole tree; subtrees below it may fill
+    # up more, down to single slots.
+    ROOT_DENSITY = 0.75
+
+    def __init__(self, cents):
+        self._build(cents)
+
+    def _build(self, cents):
+        cents = list(cents) if np is None else np.frombuffer(_to_array(cents), dtype=np.int64)
+        count = len(cents)
+        self.size = 2
+        while self.size < 2 * count:
+            self.size *= 2
+        self.height = self.size.bit_length() - 1
+        # Spread evenly over every leaf: at most half of them are used.
+        if np is not None:
+            slots = np.arange(count, dtype=np.int64) * self.size // max(count, 1)
+            self.slots = _to_array(slots)
+            sums = np.zeros(2 * self.size, dtype=np.int64)
+            lows = np.full(2 * self.size, NO_BALANCE, dtype=np.int64)
+            leaves = self.size + slots
+            sums[leaves] = cents
+            lows[leaves] = cents
+            level = self.size
+            while level > 1:
+                left_sums, right_sums = sums[level:2 * level:2], sums[level + 1:2 * level:2]
+                left_lows, right_lows = lows[level:2 * level:2], lows[level + 1:2 * level:2]
+                sums[level // 2:level] = left_sums + right_sums
+                # Empty subtrees keep NO_BALANCE (the sum next to it wraps and is discarded).
+                through_right = np.where(right_lows == NO_BALANCE, NO_BALANCE, left_sums + right_lows)
+                lows[level // 2:level] = np.minimum(left_lows, through_right)
+                level //= 2
+            self.sums, self.lows = _to_array(sums), _to_array(lows)
+        else:
+            slots = [position * self.size // count for position in range(count)]
+            self.slots = array('q', slots)
+            self.sums = array('q', [0]) * (2 * self.size)
+            self.lows = array('q', [NO_BALANCE]) * (2 * self.size)
+            for slot, amount in zip(slots, cents):
+                self.sums[self.size + slot] = amount
+                self.lows[self.size + slot] = amount
+            for node in range(self.size - 1, 0, -1):
+                self._pull(node)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _pull(self, node):
+        left_sum = self.sums[2 * node]
+        low, right_low = self.lows[2 * node], self.lows[2 * node + 1]
+        if right_low != NO_BALANCE:
+            low = min(low, left_sum + right_low)
+        self.sums[node] = left_sum + self.sums[2 * node + 1]
+        self.lows[node] = low
+
+    def _set(self, slot, cents):
+        node = self.size + slot
+        self.sums[node] = 0 if cents is None else cents
+        self.lows[node] = NO_BALANCE if cents is None else cents
+        node //= 2
+        while node:
+            self._pull(node)
+            node //= 2
+
+    def _nodes(self, start, end):
+        # The nodes covering the slots start <= slot < end, left to right.
+        left, right = [], []
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                left.append(start)
+                start += 1
+            if end & 1:
+                end -= 1
+                right.append(end)
+            start //= 2
+            end //= 2
+        return left + right[::-1]
+
+    def _slot(self, position):
+        return self.slots[position] if position < len(self.slots) else self.size
+
+    def sum_before(self, position):
+        """
+        Sum of the amounts of the rows before position.
+        """
+        if position >= len(self.slots):
+            return self.sums[1]
+        return sum(self.sums[node] for node in self._nodes(0, self.slots[position]))
+
+    def lowest(self, start, end):
+        """
+        Lowest running sum after the rows at positions start <= position < end
+        (NO_BALANCE if there are none).
+        """
+        running, lowest = self.sum_before(start), NO_BALANCE
+        for node in self._nodes(self._slot(start), self._slot(end)):
+            if self.lows[node] != NO_BALANCE:
+                lowest = min(lowest, running + self.lows[node])
+            running += self.sums[node]
+        return lowest
+
+    def insert(self, position, cents):
+        before = self.slots[position - 1] if position else -1
+        after = self._slot(position)
+        if after - before > 1:
+            slot = (before + after) // 2
+            self.slots.insert(position, slot)
+            self._set(slot, cents)
+            return
+        # No free slot between the neighbours: spread out the smallest subtree
+        # around them with room for one more row.
+        anchor = before if position else after
+        for height in range(1, self.height + 1):
+            width = 1 << height
+            start = (anchor >> height) << height
+            first = bisect_left(self.slots, start)
+            last = bisect_left(self.slots, start + width)
+            if last - first + 1 <= width * (1 - (1 - self.ROOT_DENSITY) * height / self.height):
+                break
+        else:
+            amounts = [self.sums[self.size + slot] for slot in self.slots]
+            amounts.insert(position, cents)
+            self._build(amounts)  # Too full: twice the size
+            return
+        count = last - first + 1
+        if np is not None:
+            leaves = self.size + np.frombuffer(self.slots, dtype=np.int64)[first:last]
+            amounts = np.insert(np.frombuffer(self.sums, dtype=np.int64)[leaves], position - first, cents)
+            slots = start + np.arange(count, dtype=np.int64) * width // count
+            self.slots[first:last] = _to_array(slots)
+        else:
+            amounts = [self.sums[self.size + slot] for slot in self.slots[first:last]]
+            amounts.insert(position - first, cents)
+            slots = [start + offset * width // count for offset in range(count)]
+            self.slots[first:last] = array('q', slots)
+        self._refill(start, width, slots, amounts)
+
+    def _refill(self, start, width, slots, amounts):
+        # Rewrites the leaves start <= slot < start + width and every node above them.
+        low, high = self.size + start, self.size + start + width
+        if np is not None:
+            sums, lows = np.frombuffer(self.sums, dtype=np.int64), np.frombuffer(self.lows, dtype=np.int64)
+            sums[low:high] = 0
+            lows[low:high] = NO_BALANCE
+            sums[self.size + slots] = amounts
+            lows[self.size + slots] = amounts
+            while high - low > 1:
+                left_sums, right_sums = sums[low:high:2], sums[low + 1:high:2]
+                left_lows, right_lows = lows[low:high:2], lows[low + 1:high:2]
+                low, high = low // 2, high // 2
+                sums[low:high] = left_sums + right_sums
+                lows[low:high] = np.minimum(left_lows, np.where(right_lows == NO_BALANCE, NO_BALANCE, left_sums + right_lows))
+            del sums, lows  # Release the buffers
+        else:
+            self.sums[low:high] = array('q', [0]) * width
+            self.lows[low:high] = array('q', [NO_BALANCE]) * width
+            for slot, amount in zip(slots, amounts):
+                self.sums[self.size + slot] = amount
+                self.lows[self.size + slot] = amount
+            while high - low > 1:
+                low, high = low // 2, high // 2
+                for node in range(low, high):
+                    self._pull(node)
+        node = low // 2
+        while node:
+            self._pull(node)
+            node //= 2
+
+    def remove(self, position):
+        slot = self.slots.pop(position)
+        self._set(slot, None)
+
+
+class LedgerIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.head = None  # (version, updated_at) it was built at; None until loaded or once stale
+        self.change_seq = 0  # Last outbox change (LedgerChange id) the arrays are known to include
+        self.timestamps = array('q')
+        self.ids = array('q')
+        self.cents = array('q')
+        self.opening_cents = 0
+        self.tree = LedgerTree(self.cents)
+        self._snapshot = None  # LedgerSnapshot at head, built on first use after each change
+        self._local = threading.local()  # This thread's changes waiting for their commit (see apply)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self):
+        """
+        Reads the whole ledger into the arrays: from the snapshot file when there is
+        a usable one (see ledger_file.py), otherwise from the database. The version
+        is read before and after; if a write committed in between, the read is repeated.
+        """
+        loaded = self._read_file()
+        source = 'snapshot file'
+        if loaded is None:
+            loaded = self._read_database()
+            source = 'database'
+        timestamps, ids, cents, opening, head, change_seq = loaded
+        tree = LedgerTree(cents)
+        with self._lock:
+            self.timestamps = timestamps
+            self.ids = ids
+            self.cents = cents
+            self.opening_cents = opening
+            self.tree = tree
+            self._snapshot = None
+            self.head = head
+            self.change_seq = change_seq
+        logger.debug('Loaded ledger index with %d transactions at version %d from the %s', len(ids), head[0], source)
+
+    def invalidate(self):
+        """
+        Drops the loaded ledger: the next use loads it again.
+        """
+        with self._lock:
+            self.head, self._snapshot = None, None
+
+    def _read_database(self):
+        for _ in range(MAX_LOAD_ATTEMPTS):
+            head = ledger_version()
+            opening = opening_cents()
+            change_seq = last_change_seq()
+            rows = _fetch_rows()
+            if ledger_version() == head:
+                break
+        else:
+            raise RuntimeError('The ledger kept changing while the index was loading.')
+
+        ids, timestamps, cents = zip(*rows) if rows else ((), (), ())
+        return array('q', timestamps), array('q', ids), array('q', cents), opening, head, change_seq
+
+    def _read_file(self):
+        """
+        Returns the columns of the snapshot file brought up to date with the changes
+        recorded since it was written, or None when there is no usable file.
+        """
+        path = settings.LEDGER_SNAPSHOT_PATH
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            ledger_file = LedgerFile(path)
+        except LedgerFileError as e:
+            logger.debug('Ignoring ledger snapshot: %s', e)
+            return None
+
+        with ledger_file:
+            for _ in range(MAX_LOAD_ATTEMPTS):
+                head = ledger_version()
+                # Written at a later version: the file belongs to another database.
+                if head[0] < ledger_file.header.ledger_version or not ledger_file.matches_archive():
+                    return None
+                opening = opening_cents()
+                delta = ledger_file.delta()
+                if ledger_version() == head:
+                    break
+            else:
+                return None
+            if delta is None:
+                return None  # Too far behind: a full read is cheaper
+            change_seq, changed_ids, rows = delta
+            columns = _without_ids((ledger_file.timestamps, ledger_file.ids, ledger_file.cents), changed_ids)
+            timestamps, ids, cents = (_to_array(column) for column in columns)
+
+        _insert_rows(timestamps, ids, cents, rows)
+        return timestamps, ids, cents, opening, head, change_seq
+
+    def _catch_up(self, head):
+        """
+        Brings the index from its head to the given one (read by the caller) with
+        the transactions changed since its last outbox change, as _read_file does
+        for the snapshot file. Returns False when a full load is needed instead:
+        nothing loaded yet, a version that went back (a flushed database), an
+        archive run (the opening balance moved) or too many changes.
+
+        Changes this process already applied when they committed are read again;
+        that's harmless, since every changed row is taken out and put back in its
+        current state.
+        """
+        for _ in range(MAX_LOAD_ATTEMPTS):
+            if self.head is None or head[0] <= self.head[0]:
+                return False
+            opening = opening_cents()
+            delta = changes_since(self.change_seq)
+            latest = ledger_version()
+            if latest == head:
+                break
+            head = latest
+        else:
+            return False
+        if delta is None or opening != self.opening_cents:
+            return False
+        change_seq, changed_ids, rows = delta
+        if changed_ids:
+            self._replace_rows(changed_ids, rows)
+        self.head, self.change_seq, self._snapshot = head, change_seq, None
+        logger.debug('Caught up the ledger index with %d changed transactions at version %d', len(changed_ids), head[0])
+        return True
+
+    def _replace_rows(self, changed_ids, rows):
+        # Takes out every row of changed_ids and adds rows, (id, microseconds, cents, ...)
+        # in (microseconds, id) order: one at a time, or in one pass and a new tree.
+        if np is not None:
+            changed = np.fromiter(changed_ids, dtype=np.int64, count=len(changed_ids))
+            positions = np.flatnonzero(np.isin(np.frombuffer(self.ids, dtype=np.int64), changed)).tolist()
+        else:
+            positions = [position for position, pk in enumerate(self.ids) if pk in changed_ids]
+        if len(positions) + len(rows) <= MAX_ROWS_APPLIED_IN_PLACE:
+            for position in reversed(positions):
+                self._remove_at(position)
+            for row in rows:
+                self._insert(row[1], row[0], row[2])
+            return
+        columns = _without_ids((self.timestamps, self.ids, self.cents), changed_ids)
+        self.timestamps, self.ids, self.cents = (_to_array(column) for column in columns)
+        _insert_rows(self.timestamps, self.ids, self.cents, rows)
+        self.tree = LedgerTree(self.cents)
+
+    @contextmanager
+    def at_database_head(self):
+        """
+        Holds the index lock for the block, with the index at the ledger head the
+        current connection sees: caught up or reloaded first if the ledger moved
+        on. Inside a transaction with writes of its own, which aren't in the index
+        until they commit, the block gets the index with them applied, taken back
+        out after it (see _with_own_changes). Lookups made after a separate
+        current() call could see the index at another head; checking and reading
+        under one lock can't.
+        """
+        head = ledger_version()
+        with self._lock:
+            if self.head != head:
+                own = self._own_changes(head)
+                if own:
+                    with self._with_own_changes(head, own) as index:
+                        yield index
+                    return
+                if not self._catch_up(head):
+                    self.load()
+            yield self
+
+    def current(self):
+        """
+        Returns the index, caught up first if the ledger changed since it was built.
+        """
+        with self.at_database_head():
+            return self
+
+    # --- Lookups (all O(log n)) ---
+
+    def _cents_before(self, position):
+        return self.opening_cents + self.tree.sum_before(position)
+
+    def _lowest(self, start, end):
+        lowest = self.tree.lowest(start, end)
+        return lowest if lowest == NO_BALANCE else self.opening_cents + lowest
+
+    def total_cents(self):
+        with self._lock:
+            return self._cents_before(len(self.ids))
+
+    def running_cents(self, created_at, pk):
+        """
+        Balance (in cents) right after the given transaction.
+        """
+        with self._lock:
+            position = find_position(self.timestamps, self.ids, to_microseconds(created_at), pk)
+            return self._cents_before(position + 1)
+
+    def cents_at(self, moment):
+        """
+        Balance (in cents) including every transaction up to and including moment.
+        """
+        with self._lock:
+            return self._cents_before(bisect_left(self.timestamps, to_microseconds(moment) + 1))
+
+    def range_cents(self, start, end):
+        """
+        Net change (in cents) of the transactions with start <= created_at < end.
+        """
+        with self._lock:
+            first = bisect_left(self.timestamps, to_microseconds(start))
+            last = bisect_left(self.timestamps, to_microseconds(end))
+            return self._cents_before(last) - self._cents_before(first) if last > first else 0
+
+    def lowest_cents(self, removed=(), added=()):
+        """
+        Checks a change before it's written: removed is a list of (created_at, pk),
+        added a list of (created_at, pk, signed cents), as for apply(); use
+        UNSAVED_PK for rows not saved yet. Returns (before, after): the lowest
+        running balance (in cents) from the earliest changed row onwards, without
+        and with the change, or None for an empty range. Rows before the change
+        keep their balances, so they aren't compared.
+
+        Each changed row costs a few O(log n) tree lookups; no history is replayed.
+        """
+        with self._lock:
+            removals = {}
+            for created_at, pk in removed:
+                position = find_position(self.timestamps, self.ids, to_microseconds(created_at), pk)
+                if position >= len(self.ids) or self.ids[position] != pk:
+                    raise LookupError(pk)
+                removals[position] = self.cents[position]
+            additions = sorted(
+                (find_position(self.timestamps, self.ids, to_microseconds(created_at), pk), to_microseconds(created_at), pk, cents)
+                for created_at, pk, cents in added
+            )
+            breaks = sorted(set(removals) | {position for position, _, _, _ in additions})
+            if not breaks:
+                return None, None
+
+            lowest = NO_BALANCE
+            start, shift, next_addition = breaks[0], 0, 0
+            for position in breaks:
+                if start < position:
+                    lowest = min(lowest, self._lowest(start, position) + shift)
+                # New rows go before the saved row at the same position.
+                while next_addition < len(additions) and additions[next_addition][0] == position:
+                    cents = additions[next_addition][3]
+                    shift += cents
+                    lowest = min(lowest, self._cents_before(position) + shift)
+                    next_addition += 1
+                if position in removals:
+                    shift -= removals[position]
+                    start = position + 1
+                else:
+                    start = position
+            if start < len(self.ids):
+                lowest = min(lowest, self._lowest(start, len(self.ids)) + shift)
+
+            before = self._lowest(breaks[0], len(self.ids))
+            return (
+                None if before == NO_BALANCE else before,
+                None if lowest == NO_BALANCE else lowest,
+            )
+
+    def snapshot(self):
+        """
+        Returns a LedgerSnapshot of the ledger head the current connection sees,
+        so a request can keep using consistent balances while later writes update
+        the index. Snapshots are never modified: one is built per change (copying
+        the arrays and summing the running balances) and shared by every request
+        until the next change.
+        """
+        with self.at_database_head() as index:
+            if index._snapshot is None:
+                index._snapshot = index._build_snapshot()
+            return index._snapshot
+
+    def _build_snapshot(self):
+        timestamps, ids = array('q', self.timestamps), array('q', self.ids)
+        prefix = _prefix_sums(self.cents, self.opening_cents)
+        if np is not None:
+            day_numbers = np.frombuffer(timestamps, dtype=np.int64) // MICROSECONDS_PER_DAY
+        else:
+            day_numbers = [timestamp // MICROSECONDS_PER_DAY for timestamp in timestamps]
+        return LedgerSnapshot(ids, day_numbers, prefix, timestamps=timestamps, opening_cents=self.opening_cents)
+
+    # --- Incremental updates ---
+
+    def _insert(self, microseconds, pk, cents):
+        position = find_position(self.timestamps, self.ids, microseconds, pk)
+        self.timestamps.insert(position, microseconds)
+        self.ids.insert(position, pk)
+        self.cents.insert(position, cents)
+        self.tree.insert(position, cents)
+
+    def _remove(self, microseconds, pk):
+        position = find_position(self.timestamps, self.ids, microseconds, pk)
+        if position >= len(self.ids) or self.ids[position] != pk:
+            raise LookupError(pk)
+        return self._remove_at(position)
+
+    def _remove_at(self, position):
+        row = self.timestamps.pop(position), self.ids.pop(position), self.cents.pop(position)
+        self.tree.remove(position)
+        return row
+
+    def _change(self, removed, added):
+        """
+        Applies removed and added (as for apply()) to the arrays and the tree, or
+        nothing if a removed row isn't there (LookupError). Returns the removed
+        rows, (microseconds, pk, cents), for _take_back().
+        """
+        gone = []
+        try:
+            for created_at, pk in removed:
+                gone.append(self._remove(to_microseconds(created_at), pk))
+        except LookupError:
+            for row in reversed(gone):
+                self._insert(*row)
+            raise
+        for created_at, pk, cents in added:
+            self._insert(to_microseconds(created_at), pk, cents)
+        return gone
+
+    def _take_back(self, added, gone):
+        for created_at, pk, _ in reversed(added):
+            self._remove(to_microseconds(created_at), pk)
+        for row in reversed(gone):
+            self._insert(*row)
+
+    def apply(self, head, removed=(), added=()):
+        """
+        Hands the index one ledger change made by the current transaction: removed
+        is a list of (created_at, pk), added a list of (created_at, pk, signed
+        cents). head is the ledger head the change produced (bump_ledger_version()).
+        The change is applied when the transaction commits (transaction.on_commit),
+        if the index is at the version right before it; otherwise the next use
+        catches up from the outbox. A rolled-back change never reaches the index.
+
+        Until the commit only this thread's reads see the change (see at_database_head).
+        """
+        changes = self._pending()
+        # Changes at this version or later were rolled back (to a savepoint or
+        # with their transaction); anything not leading up to this one too.
+        changes[:] = [change for change in changes if change[0][0] < head[0]]
+        if changes and changes[-1][0][0] != head[0] - 1:
+            changes.clear()
+        change = (head, removed, added)
+        changes.append(change)
+        db_transaction.on_commit(lambda: self._commit(change))
+
+    def mark_changed(self, head):
+        """
+        Like apply(), for a change made by the current transaction without a list
+        of its rows (a large bulk statement, an archive run): once it commits,
+        the next use catches up from the outbox or reloads. Until then this
+        thread's reads use a copy of the ledger loaded from its connection.
+        """
+        self.apply(head, removed=None)
+
+    def _pending(self):
+        if not hasattr(self._local, 'changes'):
+            self._local.changes = []
+        return self._local.changes
+
+    def _commit(self, change):
+        changes = self._pending()
+        for position, pending in enumerate(changes):
+            if pending is change:
+                del changes[position]
+                break
+        head, removed, added = change
+        with self._lock:
+            if self.head is None or self.head[0] != head[0] - 1 or removed is None:
+                return  # Not loaded, already past it, or behind: caught up on next use
+            try:
+                self._change(removed, added)
+            except LookupError:
+                self.invalidate()
+                return
+            self.head, self._snapshot = head, None
+
+    def _own_changes(self, head):
+        """
+        This thread's changes not committed yet, oldest first, if the connection's
+        head is the last of them; otherwise none, and any left over from
+        rolled-back transactions are dropped.
+        """
+        changes = self._pending()
+        for end, change in enumerate(changes):
+            if change[0] == head:
+                return changes[:end + 1]
+        changes.clear()
+        return []
+
+    @contextmanager
+    def _with_own_changes(self, head, own):
+        """
+        Yields the index with this transaction's own changes applied, and takes
+        them back out afterwards: O(log n) per changed row, under the lock held by
+        at_database_head, so no other thread sees them. A copy of the ledger is
+        loaded from the connection instead when that isn't possible: the index is
+        at another version than the one the changes start from, or a change came
+        without its rows (see mark_changed).
+        """
+        applied = self._apply_own(head, own)
+        if applied is None:
+            private = LedgerIndex()
+            private.load()
+            yield private
+            return
+        saved = self.head, self._snapshot
+        self.head, self._snapshot = head, None
+        try:
+            yield self
+        finally:
+            for added, gone in reversed(applied):
+                self._take_back(added, gone)
+            self.head, self._snapshot = saved
+
+    def _apply_own(self, head, own):
+        # Returns [(added, removed rows)] per change applied, or None with nothing applied.
+        # The index only holds committed changes, so the first of them has to be
+        # the one right after the index's head.
+        if (
+            self.head is None
+            or [change[0][0] for change in own] != list(range(self.head[0] + 1, head[0] + 1))
+            or any(removed is None for _, removed, _ in own)
+        ):
+            return None
+        applied = []
+        try:
+            for _, removed, added in own:
+                applied.append((added, self._change(removed, added)))
+        except LookupError:
+            for added, gone in reversed(applied):
+                self._take_back(added, gone)
+            return None
+        return applied
+
+
+ledger_index = LedgerIndex()
+
+
+def ledger_snapshot():
+    """
+    Running balances for the current ledger, served from the process-wide index.
+    """
+    return ledger_index.snapshot()
+
+
+def goes_negative(removed=(), added=()):
+    """
+    Returns True if the change (see LedgerIndex.lowest_cents) would take the
+    balance below zero at any point in time, or lower it further where it is
+    already negative. Writers call this while holding the ledger lock.
+    """
+    with ledger_index.at_database_head() as index:
+        before, after = index.lowest_cents(removed, added)
+    return after is not None and after < 0 and (before is None or after < before)
@@ -0,0 +1,168 @@
+# MoneyTrail/ledger.py
+"""
+Helpers for serializing balance-affecting writes on the ledger.
+
+The balance and daily-limit checks in TransactionViewSet are plain reads, so at
+READ COMMITTED two concurrent expenses can both pass them and drive the balance
+negative. Instead of locking the whole Transaction table we lock a single
+LedgerHead row with SELECT ... FOR UPDATE at the start of every write; the
+second writer waits for the first to commit and then sees its effect.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal
+from functools import wraps
+
+from django.db import transaction as db_transaction, OperationalError
+from django.db.models import F, Sum, Case, When, Value, DecimalField, ExpressionWrapper, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import LedgerHead, OpeningBalance, RuleSetHead, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Primary key of the single LedgerHead row.
+LEDGER_HEAD_PK = 1
+
+# Primary key of the single OpeningBalance row.
+OPENING_BALANCE_PK = 1
+
+# SQLSTATE codes PostgreSQL uses for errors that are safe to retry:
+# 40001 = serialization_failure, 40P01 = deadlock_detected.
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+# How many times a write is attempted before the error is surfaced.
+MAX_WRITE_ATTEMPTS = 5
+
+# Base delay (seconds) between retries; grows linearly with each attempt.
+RETRY_BACKOFF_SECONDS = 0.01
+
+
+def signed_amount():
+    """
+    Expression for a transaction's effect on the balance: +amount for deposits,
+    -amount for expenses. Use inside Sum(...) for balance aggregates.
+    """
+    return Case(
+        When(type='deposit', then=F('amount')),
+        When(type='expense', then=ExpressionWrapper(F('amount') * Decimal('-1'), output_field=DecimalField())),
+        default=Value(0),
+        output_field=DecimalField()
+    )
+
+
+def ledger_opening():
+    """
+    Returns the OpeningBalance carried forward from archived transactions,
+    or None if nothing has been archived.
+    """
+    return OpeningBalance.objects.filter(pk=OPENING_BALANCE_PK).first()
+
+
+def opening_balance():
+    """
+    Returns the balance before the first transaction of the hot ledger.
+    """
+    opening = ledger_opening()
+    return opening.balance if opening else Decimal('0.00')
+
+
+def current_total_balance():
+    """
+    Returns the total balance of the ledger: the opening balance plus one
+    aggregate query over the hot Transaction table.
+    """
+    return opening_balance() + Transaction.objects.aggregate(
+        total=Coalesce(Sum(signed_amount()), Value(0, output_field=DecimalField()))
+    )['total']
+
+
+def lock_ledger():
+    """
+    Locks the ledger head row for the rest of the current transaction and returns it.
+    Must be called inside an atomic block. The row comes with rules_head, the
+    rule set's (version, updated_at) read by the same query (see categories.py).
+    """
+    rule_set = RuleSetHead.objects.order_by('pk')
+    head, _ = LedgerHead.objects.select_for_update().annotate(
+        rule_set_version=Subquery(rule_set.values('version')[:1]),
+        rule_set_updated_at=Subquery(rule_set.values('updated_at')[:1]),
+    ).get_or_create(pk=LEDGER_HEAD_PK)
+    head.rules_head = (getattr(head, 'rule_set_version', None) or 0, getattr(head, 'rule_set_updated_at', None))
+    return head
+
+
+_held = threading.local()
+
+
+def locked_rules_head():
+    """
+    The rule set's (version, updated_at) read with the ledger lock of the
+    serialized_write running in this thread, or None outside one.
+    """
+    return getattr(_held, 'rules_head', None)
+
+
+def bump_ledger_version():
+    """
+    Increments the ledger version and returns the new (version, updated_at), like
+    ledger_version(). The UPDATE also takes the head row lock, so any write to the
+    Transaction table is serialized with the viewset's checks.
+    """
+    updated = LedgerHead.objects.filter(pk=LEDGER_HEAD_PK).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        LedgerHead.objects.get_or_create(pk=LEDGER_HEAD_PK, defaults={'version': 1})
+    return LedgerHead.objects.values_list('version', 'updated_at').get(pk=LEDGER_HEAD_PK)
+
+
+def ledger_version():
+    """
+    Returns (version, updated_at) of the ledger head in one primary-key lookup.
+    This is the cheap "has anything changed?" check used for HTTP validators.
+    """
+    head = LedgerHead.objects.filter(pk=LEDGER_HEAD_PK).values_list('version', 'updated_at').first()
+    return head if head else (0, None)
+
+
+def is_retryable_error(exc):
+    """
+    Returns True if the database error is a serialization failure or deadlock.
+    """
+    cause = getattr(exc, '__cause__', None)
+    return getattr(cause, 'pgcode', None) in RETRYABLE_SQLSTATES
+
+
+def serialized_write(func):
+    """
+    Decorator for balance-affecting writes (replaces @db_transaction.atomic).
+
+    Runs the wrapped function in its own transaction with the ledger head locked,
+    and retries it on serialization failures and deadlocks. Retries only happen
+    when we own the outermost transaction; inside an outer atomic block (e.g. in
+    tests) the error is re-raised for the caller to handle.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        can_retry = not db_transaction.get_connection().in_atomic_block
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                with db_transaction.atomic():
+                    previous = locked_rules_head()
+                    _held.rules_head = lock_ledger().rules_head
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        _held.rules_head = previous
+            except OperationalError as exc:
+                if not can_retry or attempt >= MAX_WRITE_ATTEMPTS or not is_retryable_error(exc):
+                    raise
+                logger.debug('Retrying serialized write after %s (attempt %d)', exc.__cause__.pgcode, attempt)
+                time.sleep(RETRY_BACKOFF_SECONDS * attempt)
+    return wrapper
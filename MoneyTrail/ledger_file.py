@@ -0,0 +1,287 @@
+# MoneyTrail/ledger_file.py
+"""
+Memory-mapped binary snapshot of the ledger for analytics and fast cold starts.
+
+`manage.py write_ledger_snapshot` writes every hot transaction to one file in
+chronological (created_at, id) order, as fixed-width columns after a 64-byte
+header, all little-endian:
+
+    header     magic b'MTLEDGER', format version (u32), reserved (u32), then i64:
+               ledger version, ledger updated_at (epoch microseconds), last change
+               sequence (LedgerChange id), row count, opening balance in cents,
+               archive cutoff (date ordinal, 0 without an archive)
+    timestamps i64 x n   created_at in epoch microseconds
+    cents      i64 x n   signed amount in cents (deposits positive)
+    ids        i64 x n
+    types      u8 x n    TYPE_CODES
+
+LedgerFile maps it read-only; its columns are zero-copy views (numpy arrays when
+numpy is installed, memoryviews otherwise, which assume a little-endian machine),
+so opening even a very large file costs a few page-table entries, and only the
+pages actually read are loaded.
+
+The file goes stale as soon as the ledger changes; readers bring it up to date
+with delta(): every transaction with a change recorded in the outbox after the
+file's change sequence (see outbox.py), in its current state. LedgerIndex uses
+this to start without reading the whole Transaction table, and changes_since()
+to catch up with writes from other processes (see index.py).
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BigIntegerField, Case, IntegerField, Max, Value, When
+from django.db.models.functions import Cast
+
+from .engine import EpochMicroseconds, np, to_microseconds
+from .ledger import ledger_opening, ledger_version, signed_amount
+from .models import LedgerChange, Transaction
+
+MAGIC = b'MTLEDGER'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIqqqqqq')
+
+# Byte stored in the types column.
+TYPE_CODES = {'deposit': 1, 'expense': 2}
+
+# Rows fetched per round trip while writing.
+WRITE_CHUNK_SIZE = 50000
+
+# Attempts at reading a consistent copy of the ledger before giving up.
+MAX_WRITE_ATTEMPTS = 3
+
+# Past this many changes, changes_since() gives up (returns None) and readers
+# should load from the database instead.
+MAX_DELTA_ROWS = 10000
+
+
+class LedgerFileError(Exception):
+    """
+    Raised for a missing, truncated or foreign snapshot file.
+    """
+
+
+LedgerFileHeader = namedtuple(
+    'LedgerFileHeader',
+    ['ledger_version', 'updated_at_us', 'change_seq', 'row_count', 'opening_cents', 'cutoff_ordinal'],
+)
+
+
+def snapshot_path():
+    return settings.LEDGER_SNAPSHOT_PATH
+
+
+def _opening_state():
+    # (opening balance in cents, cutoff ordinal) of the archive, as stored in the header.
+    opening = ledger_opening()
+    if opening is None:
+        return 0, 0
+    return int(opening.balance * 100), opening.cutoff_day.toordinal()
+
+
+def _current_rows(queryset):
+    # (id, epoch microseconds, signed cents, type code) per row, in (created_at, id) order.
+    type_code = Case(
+        *[When(type=name, then=Value(code)) for name, code in TYPE_CODES.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+    return queryset.order_by('created_at', 'id').values_list(
+        'id',
+        EpochMicroseconds('created_at'),
+        Cast(signed_amount() * Value(Decimal('100')), BigIntegerField()),
+        type_code,
+    )
+
+
+def _fetch_columns():
+    timestamps, cents, ids, types = array('q'), array('q'), array('q'), array('B')
+    # Read from the cursor directly, so the SQL column order is what matters:
+    # Django selects model fields before expressions.
+    queryset = _current_rows(Transaction.objects.all())
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(WRITE_CHUNK_SIZE)
+            if not rows:
+                break
+            chunk_ids, chunk_timestamps, chunk_cents, chunk_types = zip(*rows)
+            ids.extend(chunk_ids)
+            timestamps.extend(chunk_timestamps)
+            cents.extend(chunk_cents)
+            types.extend(chunk_types)
+    return timestamps, cents, ids, types
+
+
+def write_ledger_file(path=None):
+    """
+    Writes the snapshot to path (default settings.LEDGER_SNAPSHOT_PATH), replacing
+    any previous file atomically. Returns its LedgerFileHeader.
+    """
+    path = path or snapshot_path()
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        head = ledger_version()
+        opening_cents, cutoff_ordinal = _opening_state()
+        change_seq = last_change_seq()
+        columns = _fetch_columns()
+        if ledger_version() == head:
+            break
+    else:
+        raise RuntimeError('The ledger kept changing while the snapshot was being written.')
+
+    version, updated_at = head
+    header = LedgerFileHeader(
+        version, to_microseconds(updated_at) if updated_at else 0, change_seq, len(columns[0]), opening_cents, cutoff_ordinal,
+    )
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix='.ledger-snapshot-')
+    try:
+        with os.fdopen(handle, 'wb') as output:
+            output.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, *header))
+            for column in columns:
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                column.tofile(output)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return header
+
+
+class LedgerFile:
+    """
+    A snapshot file mapped read-only. Use as a context manager, or call close();
+    column views must not be used after closing.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or snapshot_path()
+        try:
+            with open(self.path, 'rb') as source:
+                self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:  # ValueError: empty file
+            raise LedgerFileError(f'Cannot map {self.path}: {e}')
+        try:
+            self._read_header()
+        except LedgerFileError:
+            self._map.close()
+            raise
+
+    def _read_header(self):
+        if len(self._map) < HEADER.size:
+            raise LedgerFileError(f'{self.path} is not a ledger snapshot.')
+        magic, format_version, _, *fields = HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise LedgerFileError(f'{self.path} is not a ledger snapshot (format {FORMAT_VERSION}).')
+        self.header = LedgerFileHeader(*fields)
+        count = self.header.row_count
+        if len(self._map) != HEADER.size + count * 25:
+            raise LedgerFileError(f'{self.path} is truncated.')
+        offset = HEADER.size
+        self._views = {}
+        self._columns = {}
+        for name, typecode, itemsize in (('timestamps', 'q', 8), ('cents', 'q', 8), ('ids', 'q', 8), ('types', 'B', 1)):
+            if np is not None:
+                self._columns[name] = np.frombuffer(self._map, dtype='<i8' if typecode == 'q' else 'u1', count=count, offset=offset)
+            else:
+                view = memoryview(self._map)[offset:offset + count * itemsize]
+                self._views[name] = view
+                self._columns[name] = view.cast(typecode)
+            offset += count * itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.header.row_count
+
+    def close(self):
+        for column in self._columns.values():
+            if isinstance(column, memoryview):
+                column.release()
+        self._columns.clear()
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # A caller still holds a numpy view; the map closes once it's collected
+
+    @property
+    def timestamps(self):
+        return self._columns['timestamps']
+
+    @property
+    def cents(self):
+        return self._columns['cents']
+
+    @property
+    def ids(self):
+        return self._columns['ids']
+
+    @property
+    def types(self):
+        return self._columns['types']
+
+    def matches_archive(self):
+        """
+        False if transactions were archived since the file was written: archiving
+        moves rows without recording changes, so delta() can't cover it.
+        """
+        return _opening_state() == (self.header.opening_cents, self.header.cutoff_ordinal)
+
+    def delta(self):
+        """
+        changes_since() the file was written.
+        """
+        return changes_since(self.header.change_seq)
+
+
+def last_change_seq():
+    """
+    The sequence number (LedgerChange id) of the last change recorded in the outbox.
+    """
+    return LedgerChange.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def changes_since(change_seq):
+    """
+    Returns (last_seq, changed_ids, rows) for the transactions changed after the
+    outbox sequence number change_seq: the sequence number of the last change,
+    the ids to drop from sorted columns, and the current (id, epoch microseconds,
+    signed cents, type code) of those still in the ledger, in (created_at, id)
+    order. Returns None past MAX_DELTA_ROWS, or when the change at change_seq is
+    gone: the copy being brought up to date then has rows of a transaction that
+    rolled back, or of another database.
+    """
+    changes = list(
+        LedgerChange.objects.filter(id__gte=change_seq).order_by('id')
+        .values_list('id', 'transaction_id')[:MAX_DELTA_ROWS + 2]
+    )
+    if change_seq:
+        if not changes or changes[0][0] != change_seq:
+            return None
+        del changes[0]
+    if len(changes) > MAX_DELTA_ROWS:
+        return None
+    if not changes:
+        return change_seq, set(), []
+    changed_ids = {pk for _, pk in changes}
+    queryset = _current_rows(Transaction.objects.filter(pk__in=changed_ids))
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return changes[-1][0], changed_ids, cursor.fetchall()
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from MoneyTrail.archive import ARCHIVE_BATCH_SIZE, ArchiveRejected, archive_preview, archive_transactions
+from MoneyTrail.checkpoints import local_day
+
+
+class Command(BaseCommand):
+    help = 'Moves transactions older than a cutoff into the archive table and carries their balance forward.'
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument('--before', help='Archive transactions created before this day (YYYY-MM-DD).')
+        cutoff.add_argument('--older-than-days', type=int, help='Archive transactions created more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Transactions moved per database transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff_day = timezone.datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid --before format. Use YYYY-MM-DD.')
+        else:
+            cutoff_day = local_day(timezone.now()) - timedelta(days=options['older_than_days'])
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        preview = archive_preview(cutoff_day)
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Would archive {preview['count']} transactions before {cutoff_day.isoformat()} (net {preview['net']:.2f})."
+            ))
+            return
+
+        try:
+            archived = archive_transactions(cutoff_day, batch_size=options['batch_size'])
+        except ArchiveRejected as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} transactions before {cutoff_day.isoformat()}.'))
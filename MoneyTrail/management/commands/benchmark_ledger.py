@@ -0,0 +1,303 @@
+import gc
+import os
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import dateutil.parser
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction as db_transaction
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from MoneyTrail import engine
+from MoneyTrail.checkpoints import ensure_checkpoints
+from MoneyTrail.engine import LedgerSnapshot, recalculate_per_row
+from MoneyTrail.importing import validate_chunk, validate_records
+from MoneyTrail.index import ledger_index
+from MoneyTrail.ledger import bump_ledger_version
+from MoneyTrail.models import Transaction
+from MoneyTrail.outbox import record_changes
+
+
+def seed_ledger(rows, days, seed=42):
+    """
+    Bulk-inserts `rows` synthetic transactions spread over the last `days` days.
+    Roughly 30% deposits and 70% expenses, deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(days=days)
+    last_id = Transaction.objects.aggregate(last=Max('id'))['last'] or 0
+    batch = []
+    for i in range(rows):
+        is_deposit = rng.random() < 0.3
+        batch.append(Transaction(
+            description='Seeded deposit' if is_deposit else 'Seeded expense',
+            amount=Decimal(rng.randint(10000, 300000) if is_deposit else rng.randint(100, 20000)) / 100,
+            type='deposit' if is_deposit else 'expense',
+            created_at=start + timedelta(seconds=rng.randint(0, days * 86400))
+        ))
+        if len(batch) == 5000:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+    Transaction.objects.bulk_create(batch)
+    # bulk_create doesn't send post_save, so record the changes and bump the
+    # ledger version once ourselves.
+    record_changes('added', Transaction.objects.filter(pk__gt=last_id))
+    ledger_index.mark_changed(bump_ledger_version())
+    with connection.cursor() as cursor:
+        # Fresh planner statistics, as autovacuum would have after a real load.
+        cursor.execute(f'ANALYZE {connection.ops.quote_name(Transaction._meta.db_table)}')
+
+
+# Creates timed per case and write path by the 'write' suite.
+WRITE_REPEATS = 50
+
+# Suites that don't read the ledger, so nothing is seeded for them.
+SUITES_WITHOUT_LEDGER = {'import'}
+
+
+def synthetic_api_records(count, seed=42):
+    """
+    Records shaped like the external API's, mostly valid: about 1% have an odd but
+    parseable date, 1% an invalid amount and 1% an unknown type.
+    """
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(days=1095)
+    records = []
+    for i in range(count):
+        created_at = start + timedelta(seconds=rng.randint(0, 1095 * 86400), milliseconds=rng.randint(0, 999))
+        record = {
+            'createdAt': created_at.strftime('%Y-%m-%dT%H:%M:%S.') + f'{created_at.microsecond // 1000:03d}Z',
+            'amount': round(rng.uniform(1, 3000), 2),
+            'type': 'deposit' if rng.random() < 0.3 else 'expense',
+            'id': str(i + 1),
+        }
+        roll = rng.random()
+        if roll < 0.01:
+            record['createdAt'] = created_at.strftime('%d %b %Y %H:%M:%S')
+        elif roll < 0.02:
+            record['amount'] = 'n/a'
+        elif roll < 0.03:
+            record['type'] = 'transfer'
+        records.append(record)
+    return records
+
+
+def validate_record_dateutil(data):
+    """
+    The per-record validation fetch_transactions used before importing.py, for comparison.
+    """
+    external_id = data.get('id')
+    amount_str = data.get('amount')
+    transaction_type = data.get('type')
+    created_at_str = data.get('createdAt')
+    description = f"{transaction_type.capitalize()} from API"
+    if not all([external_id, amount_str, transaction_type, created_at_str]):
+        return None, 'missing data'
+    try:
+        amount = Decimal(str(amount_str))
+        if amount <= 0:
+            return None, 'non-positive amount'
+    except InvalidOperation:
+        return None, 'invalid amount format'
+    if transaction_type not in [choice[0] for choice in Transaction.TRANSACTION_TYPES]:
+        return None, 'invalid type'
+    try:
+        created_at = dateutil.parser.parse(created_at_str)
+    except ValueError:
+        return None, 'invalid date format'
+    return (external_id, description, amount, transaction_type, created_at), None
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a performance benchmark. By default a synthetic ledger is seeded inside a '
+        'transaction that is rolled back afterwards, so the database is left untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=['payload', 'admin', 'engine', 'import', 'write'], help='Which benchmark to run.')
+        parser.add_argument('--rows', type=int, default=100000, help='Number of transactions to seed.')
+        parser.add_argument('--days', type=int, default=1095, help='Spread the seeded rows over this many days.')
+        parser.add_argument(
+            '--use-existing', action='store_true',
+            help='Benchmark the data already in the database instead of seeding (nothing is rolled back).'
+        )
+
+    def handle(self, *args, **options):
+        suite = getattr(self, f"benchmark_{options['suite']}")
+
+        if options['use_existing'] or options['suite'] in SUITES_WITHOUT_LEDGER:
+            suite(options)
+            return
+
+        with db_transaction.atomic():
+            started = time.perf_counter()
+            seed_ledger(options['rows'], options['days'])
+            self.stdout.write(f"Seeded {options['rows']} transactions over {options['days']} days in {time.perf_counter() - started:.1f}s")
+            try:
+                suite(options)
+            finally:
+                db_transaction.set_rollback(True)
+
+    def benchmark_payload(self, options):
+        """
+        Size of GET /api/transactions/ with the default and the compact balance_history,
+        uncompressed and with each content encoding the server supports.
+        """
+        client = Client(HTTP_HOST='localhost')
+        self.stdout.write(f"{'history':<10} {'encoding':<10} {'bytes':>12} {'seconds':>9}")
+        for history in ('default', 'compact'):
+            params = {'history': 'compact'} if history == 'compact' else {}
+            for accept_encoding in ('identity', 'gzip', 'br'):
+                started = time.perf_counter()
+                response = client.get('/api/transactions/', params, HTTP_ACCEPT_ENCODING=accept_encoding)
+                elapsed = time.perf_counter() - started
+                encoding = response.get('Content-Encoding', 'identity')
+                self.stdout.write(f"{history:<10} {encoding:<10} {len(response.content):>12,} {elapsed:>9.2f}")
+
+    def benchmark_admin(self, options):
+        """
+        Time to render the Transaction changelist in the admin: plain, filtered,
+        drilled into the date hierarchy and searched.
+        """
+        newest = Transaction.objects.order_by('-created_at').values_list('created_at', flat=True).first()
+
+        with db_transaction.atomic():
+            user = User.objects.create_superuser('benchmark-admin', 'benchmark@example.com', None)
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            url = '/admin/MoneyTrail/transaction/'
+            cases = [
+                ('changelist', {}),
+                ('type filter', {'type__exact': 'expense'}),
+                ('search', {'q': 'deposit'}),
+                ('search rare', {'q': 'nowhere'}),
+                ('search code', {'q': 'TRN-0042'}),
+            ]
+            if newest is not None:
+                cases.append(('year', {'created_at__year': newest.year}))
+                cases.append(('month', {'created_at__year': newest.year, 'created_at__month': newest.month}))
+
+            self.stdout.write(f"{'page':<14} {'status':>6} {'seconds':>9}")
+            for name, params in cases:
+                started = time.perf_counter()
+                response = client.get(url, params)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{name:<14} {response.status_code:>6} {elapsed:>9.3f}")
+            db_transaction.set_rollback(True)
+
+    def benchmark_engine(self, options):
+        """
+        Running balances and balance history: the per-row model loop against the
+        column engine in pure Python and with NumPy. Fails if the outputs differ.
+        """
+        def per_row():
+            total, rows, history = recalculate_per_row()
+            return total, history, rows[:10]
+
+        def columns(use_numpy):
+            ledger = LedgerSnapshot.load(use_numpy=use_numpy)
+            return ledger.total_balance, ledger.balance_history(), ledger.rows()[:10]
+
+        def from_index():
+            ledger = ledger_index.current().snapshot()
+            return ledger.total_balance, ledger.balance_history(), ledger.rows()[:10]
+
+        implementations = [('per-row', per_row), ('columns/python', lambda: columns(False))]
+        if engine.np is not None:
+            implementations.append(('columns/numpy', lambda: columns(True)))
+        else:
+            self.stdout.write('numpy is not installed; skipping columns/numpy')
+        implementations.append(('index (warm)', from_index))
+
+        self.stdout.write(f"{'implementation':<16} {'seconds':>9}")
+        started = time.perf_counter()
+        ledger_index.load()
+        self.stdout.write(f"{'index load':<16} {time.perf_counter() - started:>9.2f}")
+        digests = set()
+        for name, implementation in implementations:
+            gc.collect()
+            started = time.perf_counter()
+            total, history, page = implementation()
+            elapsed = time.perf_counter() - started
+            # Compare digests so one implementation's output isn't kept alive
+            # (and scanned by the garbage collector) while the next one runs.
+            digests.add(hash((
+                total,
+                tuple((point['date'], point['balance']) for point in history),
+                tuple((t.id, t.running_balance) for t in page),
+            )))
+            del total, history, page
+            self.stdout.write(f"{name:<16} {elapsed:>9.2f}")
+        if len(digests) != 1:
+            raise CommandError('The implementations returned different results.')
+
+        tree = ledger_index.tree
+        buffers = (ledger_index.timestamps, ledger_index.ids, ledger_index.cents, tree.slots, tree.sums, tree.lows)
+        size = sum(len(buffer) * buffer.itemsize for buffer in buffers)
+        self.stdout.write(f"index memory: {size:,} bytes ({size / max(len(ledger_index), 1):.0f} per transaction)")
+
+        newest = Transaction.objects.order_by('-created_at', '-id').first()
+        if newest is not None:
+            lookups = 10000
+            started = time.perf_counter()
+            for _ in range(lookups):
+                ledger_index.running_cents(newest.created_at, newest.pk)
+            self.stdout.write(f"running balance lookup: {(time.perf_counter() - started) / lookups * 1e6:.1f} us")
+
+    def benchmark_import(self, options):
+        """
+        Records per second parsed and validated by fetch_transactions: the old
+        dateutil-based loop, the fast path in one process and in a process pool.
+        """
+        records = synthetic_api_records(options['rows'])
+        workers = max(2, os.cpu_count() or 1)
+        self.stdout.write(f"{len(records):,} records, {os.cpu_count()} CPU(s)")
+        self.stdout.write(f"{'implementation':<22} {'seconds':>9} {'records/s':>12}")
+        for name, validate in (
+            ('dateutil (before)', lambda: [validate_record_dateutil(data) for data in records]),
+            ('fast path', lambda: validate_chunk(records)),
+            (f'fast path, {workers} workers', lambda: validate_records(records, workers=workers)),
+        ):
+            started = time.perf_counter()
+            results = validate()
+            elapsed = time.perf_counter() - started
+            valid = sum(1 for fields, _ in results if fields)
+            self.stdout.write(f"{name:<22} {elapsed:>9.2f} {len(records) / elapsed:>12,.0f}  ({valid:,} valid)")
+
+    def benchmark_write(self, options):
+        """
+        Latency of POST /api/transactions/ with the checks in Python (the regular
+        path) and in the database function (LEDGER_DATABASE_WRITES), for deposits
+        dated now and 30 days back. The queries are counted on the first request.
+        """
+        client = Client(HTTP_HOST='localhost')
+        ledger_index.load()
+        # The database function starts its balance check from the last checkpoint.
+        ensure_checkpoints()
+        cases = [('now', lambda run: None), ('30 days back', lambda run: (timezone.now() - timedelta(days=30, seconds=run)).isoformat())]
+        self.stdout.write(f"{'path':<18} {'date':<14} {'queries':>7} {'median ms':>10} {'p95 ms':>8}")
+        for path, enabled in (('checks in Python', False), ('database function', True)):
+            with override_settings(LEDGER_DATABASE_WRITES=enabled):
+                for case, created_at in cases:
+                    timings = []
+                    for run in range(WRITE_REPEATS):
+                        data = {'description': 'Benchmark deposit', 'amount': '1.00', 'type': 'deposit'}
+                        if created_at(run):
+                            data['created_at'] = created_at(run)
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            response = client.post('/api/transactions/?history=compact', data, content_type='application/json')
+                            timings.append(time.perf_counter() - started)
+                        if response.status_code != 201:
+                            raise CommandError(f'{path}, {case}: {response.status_code} {response.content[:200]!r}')
+                        if run == 0:
+                            query_count = len(queries.captured_queries)
+                    timings.sort()
+                    median, p95 = timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+                    self.stdout.write(f"{path:<18} {case:<14} {query_count:>7} {median * 1000:>10.2f} {p95 * 1000:>8.2f}")
@@ -1,21 +1,38 @@
 # MoneyTrail/management/commands/fetch_transactions.py
 import requests
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
 from django.utils import timezone
-from decimal import Decimal, InvalidOperation
 from MoneyTrail.models import Transaction # Import your Transaction model
-import dateutil.parser # pip install python-dateutil for robust date parsing
+from MoneyTrail.categories import pinned_matcher
+from MoneyTrail.checkpoints import local_day
+from MoneyTrail.events import publish_ledger_change
+from MoneyTrail.fingerprints import DUPLICATE_CHECK_CHUNK_SIZE, find_duplicates
+from MoneyTrail.importing import API_URL, validate_records
+from MoneyTrail.ledger import current_total_balance, ledger_opening, lock_ledger
+from MoneyTrail.profiling import profiled, should_profile
+from MoneyTrail.serializers import TransactionSerializer
 
 class Command(BaseCommand):
     help = 'Fetches dummy transaction data from an external API and saves it to the database.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='store_true', help='Save a profile of this run (see MoneyTrail/profiling.py).')
+        parser.add_argument(
+            '--keep-duplicates', action='store_true',
+            help='Add records that look like duplicates of existing transactions instead of skipping them (they are still reported).'
+        )
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Starting to fetch dummy transactions...'))
+        # Every record is categorized by the same compiled rules, checked once (see MoneyTrail/categories.py).
+        with profiled('fetch_transactions', enabled=options['profile'] or should_profile()), pinned_matcher():
+            self.fetch(keep_duplicates=options['keep_duplicates'])
 
-        api_url = "https://685efce5c55df675589d49df.mockapi.io/api/v1/transactions"
+    def fetch(self, keep_duplicates=False):
+        self.stdout.write(self.style.SUCCESS('Starting to fetch dummy transactions...'))
 
         try:
-            response = requests.get(api_url)
+            response = requests.get(API_URL)
             response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
             transactions_data = response.json()
         except requests.exceptions.RequestException as e:
@@ -35,68 +52,81 @@ class Command(BaseCommand):
 
         added_count = 0
         skipped_count = 0
-
-        for data in transactions_data:
-            external_id = data.get('id') # This is the ID from the external API
-            amount_str = data.get('amount')
-            transaction_type = data.get('type')
-            created_at_str = data.get('createdAt')
-
-            # Generate a default description for API transactions
-            description = f"{transaction_type.capitalize()} from API"
-
-            # Basic validation of API data
-            if not all([external_id, amount_str, transaction_type, created_at_str]):
-                self.stdout.write(self.style.WARNING(f'Skipping transaction due to missing data: {data}'))
-                skipped_count += 1
-                continue
-
-            try:
-                amount = Decimal(str(amount_str)) # Ensure amount is Decimal
-                if amount <= 0:
-                    self.stdout.write(self.style.WARNING(f'Skipping transaction {external_id} due to non-positive amount: {amount_str}'))
-                    skipped_count += 1
-                    continue
-            except InvalidOperation:
-                self.stdout.write(self.style.WARNING(f'Skipping transaction {external_id} due to invalid amount format: {amount_str}'))
+        added_transactions = [] # Broadcast to open browsers once the import is done
+        opening = ledger_opening() # Records before the archive cutoff can't be added
+
+        # Parsing and validation run first, in worker processes for large payloads.
+        records = []
+        for fields, warning in validate_records(transactions_data):
+            if warning:
+                self.stdout.write(self.style.WARNING(warning))
                 skipped_count += 1
                 continue
 
-            # Ensure type is valid
-            if transaction_type not in [choice[0] for choice in Transaction.TRANSACTION_TYPES]:
-                self.stdout.write(self.style.WARNING(f'Skipping transaction {external_id} due to invalid type: {transaction_type}'))
-                skipped_count += 1
-                continue
+            external_id, description, amount, transaction_type, created_at = fields
+            # Ensure timezone-aware datetime
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
 
-            try:
-                # Use dateutil.parser for robust date parsing
-                created_at = dateutil.parser.parse(created_at_str)
-                # Ensure timezone-aware datetime
-                if timezone.is_naive(created_at):
-                    created_at = timezone.make_aware(created_at)
-            except ValueError:
-                self.stdout.write(self.style.WARNING(f'Skipping transaction {external_id} due to invalid date format: {created_at_str}'))
+            if opening is not None and local_day(created_at) < opening.cutoff_day:
+                self.stdout.write(self.style.WARNING(f'Skipping archived API transaction: API-{external_id} (before {opening.cutoff_day.isoformat()})'))
                 skipped_count += 1
                 continue
-
-            try:
-                # Check for duplicate api_external_id to avoid IntegrityError
-                if not Transaction.objects.filter(api_external_id=external_id).exists():
-                    Transaction.objects.create(
-                        api_external_id=external_id, # Store the external ID here
-                        description=description, # Save the generated description
-                        amount=amount,
-                        type=transaction_type,
-                        created_at=created_at
-                    )
-                    self.stdout.write(self.style.SUCCESS(f'Successfully added API transaction: API-{external_id} - {amount:.2f} on {created_at.strftime("%Y-%m-%d")}'))
-                    added_count += 1
-                else:
-                    self.stdout.write(self.style.WARNING(f'Skipping duplicate API transaction: API-{external_id}'))
-                    skipped_count += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error saving API transaction {external_id}: {e}'))
-                skipped_count += 1
-
+            records.append((external_id, description, amount, transaction_type, created_at))
+
+        # Duplicates are looked up a chunk at a time: one query for known external
+        # ids and one for content fingerprints (see MoneyTrail/fingerprints.py).
+        # Each chunk is checked and written in one transaction holding the ledger
+        # lock, like every other write (see MoneyTrail/ledger.py), so the change
+        # feed rows commit with the transactions and ids follow commit order.
+        seen_ids = set()
+        suspected = []
+        for start in range(0, len(records), DUPLICATE_CHECK_CHUNK_SIZE):
+            chunk = records[start:start + DUPLICATE_CHECK_CHUNK_SIZE]
+            with db_transaction.atomic():
+                lock_ledger()
+                seen_ids.update(Transaction.objects.filter(api_external_id__in=[record[0] for record in chunk]).values_list('api_external_id', flat=True))
+                new_records = []
+                for record in chunk:
+                    # Check for duplicate api_external_id to avoid IntegrityError
+                    if record[0] in seen_ids:
+                        self.stdout.write(self.style.WARNING(f'Skipping duplicate API transaction: API-{record[0]}'))
+                        skipped_count += 1
+                    else:
+                        seen_ids.add(record[0])
+                        new_records.append(record)
+
+                matches = find_duplicates([(record[3], record[2], record[4], record[1], record[0]) for record in new_records])
+                for (external_id, description, amount, transaction_type, created_at), (kind, match) in zip(new_records, matches):
+                    if kind is not None:
+                        same_as = f'TRN-{match:04d}' if match is not None else 'an earlier record of this import'
+                        suspected.append(external_id)
+                        if kind == 'duplicate' and not keep_duplicates:
+                            self.stdout.write(self.style.WARNING(f'Skipping suspected duplicate API transaction: API-{external_id} (same as {same_as})'))
+                            skipped_count += 1
+                            continue
+                        self.stdout.write(self.style.WARNING(f'Possible {kind} API transaction: API-{external_id} (compare with {same_as})'))
+
+                    try:
+                        # A savepoint, so a record that fails doesn't roll back the rest of the chunk.
+                        with db_transaction.atomic():
+                            added_transactions.append(Transaction.objects.create(
+                                api_external_id=external_id, # Store the external ID here
+                                description=description, # Save the generated description
+                                amount=amount,
+                                type=transaction_type,
+                                created_at=created_at
+                            ))
+                        self.stdout.write(self.style.SUCCESS(f'Successfully added API transaction: API-{external_id} - {amount:.2f} on {created_at.strftime("%Y-%m-%d")}'))
+                        added_count += 1
+                    except Exception as e:
+                        self.stdout.write(self.style.ERROR(f'Error saving API transaction {external_id}: {e}'))
+                        skipped_count += 1
+
+        if added_transactions:
+            publish_ledger_change('added', TransactionSerializer(added_transactions, many=True).data, current_total_balance())
+
+        if suspected:
+            self.stdout.write(self.style.WARNING(f'Suspected duplicates ({len(suspected)}): ' + ', '.join(f'API-{external_id}' for external_id in suspected)))
         self.stdout.write(self.style.SUCCESS(f'Finished fetching and saving dummy transactions. Added: {added_count}, Skipped: {skipped_count}'))
 
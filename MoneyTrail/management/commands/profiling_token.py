@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from MoneyTrail.profiling import profiling_token
+
+
+class Command(BaseCommand):
+    help = 'Prints a token for the X-MoneyTrail-Profile header, which profiles any API request that carries it.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(profiling_token())
+        self.stderr.write(f'Valid for {settings.PROFILING_TOKEN_MAX_AGE} seconds. Profiles are listed at /api/profiles/?token=<token>.')
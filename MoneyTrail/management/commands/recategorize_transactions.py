@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from MoneyTrail.categories import RECATEGORIZE_CHUNK_SIZE, recategorize
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the category of every transaction with the current category rules.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=RECATEGORIZE_CHUNK_SIZE, help='Transactions checked per database transaction.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1.')
+
+        started = time.perf_counter()
+        checked, changed = recategorize(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recategorized {changed} of {checked} transactions in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,53 @@
+# MoneyTrail/management/commands/reconcile_transactions.py
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from MoneyTrail.importing import API_URL, validate_records
+from MoneyTrail.reconcile import LEVELS, reconcile
+
+
+def describe(row):
+    return f'{row.amount:.2f} {row.type} on {row.created_at.isoformat()}'
+
+
+class Command(BaseCommand):
+    help = 'Compares the imported transactions with the external API and reports missing, extra and altered records.'
+
+    def handle(self, *args, **options):
+        try:
+            response = requests.get(API_URL)
+            response.raise_for_status()
+            transactions_data = response.json()
+        except requests.exceptions.RequestException as e:
+            raise CommandError(f'Error fetching data from API: {e}')
+        except ValueError as e:
+            raise CommandError(f'Error decoding JSON response from API: {e}')
+
+        records = []
+        for fields, warning in validate_records(transactions_data or []):
+            if warning:
+                self.stdout.write(self.style.WARNING(warning))
+                continue
+            external_id, description, amount, transaction_type, created_at = fields
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
+            records.append((external_id, description, amount, transaction_type, created_at))
+
+        report = reconcile(records)
+        compared = ', '.join(f'{level}s: {report.compared[level]}' for level in LEVELS if level in report.compared)
+        self.stdout.write(f'Compared {len(records)} API records by range ({compared}).')
+
+        for row in report.missing:
+            self.stdout.write(self.style.WARNING(f'Missing API transaction: API-{row.external_id} - {describe(row)}'))
+        for row in report.extra:
+            self.stdout.write(self.style.WARNING(f'Extra transaction: TRN-{row.pk:04d} (API-{row.external_id}) - {describe(row)}'))
+        for local, remote in report.altered:
+            self.stdout.write(self.style.WARNING(
+                f'Altered transaction: TRN-{local.pk:04d} (API-{local.external_id}) - {describe(local)}, API has {describe(remote)}'
+            ))
+
+        summary = f'Missing: {len(report.missing)}, Extra: {len(report.extra)}, Altered: {len(report.altered)}'
+        if report.missing or report.extra or report.altered:
+            self.stdout.write(self.style.WARNING(f'Reconciliation found differences. {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Imported transactions match the API. {summary}'))
@@ -0,0 +1,82 @@
+# MoneyTrail/middleware.py
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .profiling import PROFILE_HEADER, profiled, should_profile
+from .views import TransactionViewSet
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compresses responses above settings.RESPONSE_COMPRESSION_MIN_BYTES.
+    Uses Brotli when the `brotli` package is installed and the client accepts it,
+    otherwise falls back to Django's gzip handling. Streaming responses are left
+    untouched so event streams are flushed as they are produced.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024):
+            return response
+
+        ae = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is None or not re_accepts_brotli.search(ae):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(response.content, quality=5)
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        # The body changed, so a strong ETag must become weak (same as GZipMiddleware).
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles TransactionViewSet actions on demand (see profiling.py). A profiled
+    request is run and rendered inside the profile here, and its response names
+    the saved profile in an X-MoneyTrail-Profile header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The cheap checks come first: with profiling off and no header this is all that runs.
+        if not settings.PROFILING_ENABLED and PROFILE_HEADER not in request.META:
+            return None
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None or not issubclass(view_class, TransactionViewSet) or not should_profile(request.META):
+            return None
+
+        method = request.method.lower()
+        action = getattr(view_func, 'actions', {}).get(method, method)
+        with profiled(f'{view_class.__name__}.{action}') as profile:
+            response = view_func(request, *view_args, **view_kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()  # Include serialization in the profile
+            if profile is not None:
+                profile.info.update(method=request.method, path=request.get_full_path(), status=response.status_code)
+        if profile is not None:
+            response['X-MoneyTrail-Profile'] = profile.name
+        return response
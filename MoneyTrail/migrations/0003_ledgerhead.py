@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-19 02:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_ledger_head(apps, schema_editor):
+    # Seed the single ledger head row that balance-affecting writes lock.
+    LedgerHead = apps.get_model('MoneyTrail', 'LedgerHead')
+    LedgerHead.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MoneyTrail', '0002_rename_transaction_code_transaction_api_external_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_ledger_head, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def record_existing_transactions(apps, schema_editor):
+    # Start the change feed with an 'added' change per existing transaction
+    # (archived ones first, oldest first), so since=0 is a full sync.
+    quote = schema_editor.connection.ops.quote_name
+    columns = 'api_external_id, description, amount, type, created_at'
+    outbox = quote(apps.get_model('MoneyTrail', 'LedgerChange')._meta.db_table)
+    for model_name in ('ArchivedTransaction', 'Transaction'):
+        table = quote(apps.get_model('MoneyTrail', model_name)._meta.db_table)
+        schema_editor.execute(
+            f"INSERT INTO {outbox} (op, transaction_id, {columns}, recorded_at) "
+            f"SELECT 'added', id, {columns}, NOW() FROM {table} ORDER BY created_at, id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MoneyTrail', '0006_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('op', models.CharField(choices=[('added', 'Added'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7)),
+                ('transaction_id', models.BigIntegerField()),
+                ('api_external_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('description', models.CharField(blank=True, max_length=255, null=True)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('type', models.CharField(blank=True, choices=[('deposit', 'Deposit'), ('expense', 'Expense')], max_length=10, null=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(record_existing_transactions, migrations.RunPython.noop),
+    ]
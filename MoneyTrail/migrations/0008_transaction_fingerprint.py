@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:54
+
+from django.db import migrations, models
+
+from MoneyTrail.fingerprints import fingerprint
+
+# Rows fingerprinted per UPDATE.
+BATCH_SIZE = 2000
+
+
+def fingerprint_existing_transactions(apps, schema_editor):
+    Transaction = apps.get_model('MoneyTrail', 'Transaction')
+    batch = []
+    for transaction in Transaction.objects.order_by('id').only('type', 'amount', 'created_at', 'description').iterator(chunk_size=BATCH_SIZE):
+        transaction.fingerprint = fingerprint(transaction.type, transaction.amount, transaction.created_at, transaction.description)
+        batch.append(transaction)
+        if len(batch) == BATCH_SIZE:
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    Transaction.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MoneyTrail', '0007_ledgerchange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(fingerprint_existing_transactions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+def drop_checkpoints(apps, schema_editor):
+    # Existing checkpoints have no digests; they are rebuilt on the next balance query.
+    apps.get_model('MoneyTrail', 'BalanceCheckpoint').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MoneyTrail', '0008_transaction_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='imported_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='imported_digest',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(drop_checkpoints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,164 @@
+from django.db import migrations
+
+# Single-round-trip create (MoneyTrail/stored_writes.py): the viewset's checks,
+# the insert and everything the post_save handler does for it, in one call.
+# The category is computed by the caller with its cached rules; the function
+# returns 'stale_rules' instead of writing when the rule set changed since.
+CREATE_FUNCTION = r'''
+CREATE OR REPLACE FUNCTION moneytrail_create_transaction(
+    p_description text,
+    p_amount numeric,
+    p_type text,
+    p_created_at timestamptz,
+    p_fingerprint text,
+    p_expense_day date,
+    p_daily_limit integer,
+    p_time_zone text,
+    p_category_id bigint,
+    p_rules_version bigint,
+    p_rules_updated_at timestamptz
+) RETURNS TABLE (
+    outcome text,
+    transaction_id bigint,
+    running_cents bigint,
+    total_cents bigint,
+    ledger_version bigint,
+    ledger_updated_at timestamptz,
+    archive_cutoff date
+) LANGUAGE plpgsql AS $$
+DECLARE
+    c_max_later_rows CONSTANT integer := 1000;
+    v_day date := (p_created_at AT TIME ZONE p_time_zone)::date;
+    v_cents bigint := round(p_amount * 100)::bigint;
+    v_cutoff date;
+    v_opening numeric;
+    v_checkpoint_day date;
+    v_from timestamptz := '-infinity';
+    v_before bigint;
+    v_later integer;
+    v_tail_min bigint;
+    v_tail_total bigint;
+    v_lowest_before bigint;
+    v_lowest_after bigint;
+    v_id bigint;
+    v_version bigint;
+    v_updated_at timestamptz;
+BEGIN
+    -- The ledger head lock every writer takes (lock_ledger()).
+    PERFORM 1 FROM "MoneyTrail_ledgerhead" WHERE id = 1 FOR UPDATE;
+    IF NOT FOUND THEN
+        INSERT INTO "MoneyTrail_ledgerhead" (id, version, updated_at) VALUES (1, 0, now()) ON CONFLICT (id) DO NOTHING;
+        PERFORM 1 FROM "MoneyTrail_ledgerhead" WHERE id = 1 FOR UPDATE;
+    END IF;
+
+    -- The category was computed with the caller's cached rules: check they are current.
+    IF (coalesce((SELECT r.version FROM "MoneyTrail_rulesethead" r WHERE r.id = 1), 0), (SELECT r.updated_at FROM "MoneyTrail_rulesethead" r WHERE r.id = 1))
+            IS DISTINCT FROM (p_rules_version, p_rules_updated_at) THEN
+        RETURN QUERY SELECT 'stale_rules', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, NULL::date;
+        RETURN;
+    END IF;
+
+    IF p_amount IS NULL OR p_amount <= 0 THEN
+        RETURN QUERY SELECT 'non_positive_amount', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, NULL::date;
+        RETURN;
+    END IF;
+
+    SELECT o.cutoff_day, o.balance INTO v_cutoff, v_opening FROM "MoneyTrail_openingbalance" o WHERE o.id = 1;
+    IF v_cutoff IS NOT NULL AND v_day < v_cutoff THEN
+        RETURN QUERY SELECT 'archived', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, v_cutoff;
+        RETURN;
+    END IF;
+
+    IF p_type = 'expense' THEN
+        -- A created_at range, so the count is a scan of transaction_type_created_idx.
+        IF (
+            SELECT count(*) FROM "MoneyTrail_transaction" t
+            WHERE t.type = 'expense'
+              AND t.created_at >= p_expense_day::timestamp AT TIME ZONE p_time_zone
+              AND t.created_at < (p_expense_day + 1)::timestamp AT TIME ZONE p_time_zone
+        ) >= p_daily_limit THEN
+            RETURN QUERY SELECT 'daily_limit', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, NULL::date;
+            RETURN;
+        END IF;
+        v_cents := -v_cents;
+    END IF;
+
+    -- Balance up to the new row (it sorts after every row at the same instant):
+    -- the last checkpoint before its day plus the rows since. Without one after
+    -- the archive cutoff, start from the opening balance instead, but only when
+    -- no row comes before the new row's day: otherwise that means summing the
+    -- whole table, and the caller takes the regular path while the checkpoints
+    -- are rebuilt (stored_writes.py).
+    SELECT c.day, round(c.balance * 100)::bigint INTO v_checkpoint_day, v_before
+    FROM "MoneyTrail_balancecheckpoint" c WHERE c.day < v_day ORDER BY c.day DESC LIMIT 1;
+    IF v_checkpoint_day IS NULL OR (v_cutoff IS NOT NULL AND v_checkpoint_day < v_cutoff - 1) THEN
+        IF EXISTS (
+            SELECT 1 FROM "MoneyTrail_transaction" t WHERE t.created_at < v_day::timestamp AT TIME ZONE p_time_zone
+        ) THEN
+            RETURN QUERY SELECT 'no_checkpoint', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, NULL::date;
+            RETURN;
+        END IF;
+        v_before := coalesce(round(v_opening * 100)::bigint, 0);
+    ELSE
+        v_from := (v_checkpoint_day + 1)::timestamp AT TIME ZONE p_time_zone;
+    END IF;
+    SELECT v_before + coalesce(sum(CASE WHEN t.type = 'deposit' THEN t.amount ELSE -t.amount END) * 100, 0)::bigint
+    INTO v_before
+    FROM "MoneyTrail_transaction" t WHERE t.created_at >= v_from AND t.created_at <= p_created_at;
+
+    -- Running balances of the later rows, relative to the new row's. That's a
+    -- scan as long as the backdating, so past c_max_later_rows rows the function
+    -- writes nothing and returns 'backdated': the caller takes the regular path,
+    -- which checks them in O(log n) with the in-process ledger index.
+    SELECT count(*), min(r.running), coalesce(sum(r.cents), 0) INTO v_later, v_tail_min, v_tail_total
+    FROM (
+        SELECT s.cents, sum(s.cents) OVER (ORDER BY s.created_at, s.id) AS running
+        FROM (
+            SELECT t.created_at, t.id, (CASE WHEN t.type = 'deposit' THEN t.amount ELSE -t.amount END * 100)::bigint AS cents
+            FROM "MoneyTrail_transaction" t WHERE t.created_at > p_created_at
+            ORDER BY t.created_at, t.id LIMIT c_max_later_rows + 1
+        ) s
+    ) r;
+    IF v_later > c_max_later_rows THEN
+        RETURN QUERY SELECT 'backdated', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, NULL::date;
+        RETURN;
+    END IF;
+
+    -- Expenses are checked like goes_negative() (index.py) does: rejected if the
+    -- lowest balance from the new row on ends up below zero and lower than it
+    -- was without the row.
+    v_lowest_before := v_before + v_tail_min;
+    v_lowest_after := least(v_before + v_cents, v_before + v_cents + v_tail_min);
+    IF v_cents < 0 AND v_lowest_after < 0 AND (v_lowest_before IS NULL OR v_lowest_after < v_lowest_before) THEN
+        RETURN QUERY SELECT 'insufficient_balance', NULL::bigint, NULL::bigint, NULL::bigint, NULL::bigint, NULL::timestamptz, NULL::date;
+        RETURN;
+    END IF;
+
+    INSERT INTO "MoneyTrail_transaction" (description, amount, type, created_at, fingerprint, category_id)
+    VALUES (p_description, p_amount, p_type, p_created_at, p_fingerprint, p_category_id)
+    RETURNING id INTO v_id;
+
+    -- What the post_save handler does (signals.py), minus the in-process index.
+    UPDATE "MoneyTrail_ledgerhead" SET version = version + 1, updated_at = now() WHERE id = 1
+    RETURNING version, updated_at INTO v_version, v_updated_at;
+    INSERT INTO "MoneyTrail_ledgerchange" (op, transaction_id, description, amount, type, created_at, recorded_at)
+    VALUES ('added', v_id, p_description, p_amount, p_type, p_created_at, now());
+    DELETE FROM "MoneyTrail_balancecheckpoint" WHERE day >= v_day;
+
+    RETURN QUERY SELECT 'ok', v_id, v_before + v_cents, v_before + v_cents + v_tail_total, v_version, v_updated_at, NULL::date;
+END;
+$$;
+'''
+
+DROP_FUNCTION = 'DROP FUNCTION IF EXISTS moneytrail_create_transaction(text, numeric, text, timestamptz, text, date, integer, text, bigint, bigint, timestamptz);'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MoneyTrail', '0011_categories'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_FUNCTION, DROP_FUNCTION),
+    ]
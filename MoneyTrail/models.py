@@ -1,9 +1,156 @@
 # MoneyTrail/models.py
+import re
+from datetime import timedelta
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from decimal import Decimal
 import uuid # For generating unique transaction codes (though we'll use Django's ID now)
 
+
+class TransactionQuerySet(models.QuerySet):
+
+    # Above this many candidate periods, fall back to Django's DISTINCT query.
+    MAX_PROBED_PERIODS = 400
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        """
+        Same result as QuerySet.datetimes() for created_at, but computed with index
+        probes instead of SELECT DISTINCT DATE_TRUNC(...) over every matching row:
+        MIN/MAX give the range, then one EXISTS per year/month/day in that range.
+        The admin's date hierarchy calls this on every changelist page.
+        """
+        if field_name != 'created_at' or kind not in ('year', 'month', 'day') or tzinfo is not None:
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        bounds = self.aggregate(first=models.Min('created_at'), last=models.Max('created_at'))
+        if bounds['first'] is None:
+            return []
+        first, last = timezone.localtime(bounds['first']), timezone.localtime(bounds['last'])
+
+        periods = []
+        start = _truncate(first, kind)
+        while start <= last:
+            periods.append(start)
+            start = _next_period(start, kind)
+        if len(periods) > self.MAX_PROBED_PERIODS:
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        found = [
+            start for start in periods
+            if self.filter(created_at__gte=start, created_at__lt=_next_period(start, kind)).exists()
+        ]
+        return found if order == 'ASC' else found[::-1]
+
+
+def _truncate(value, kind):
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ('year', 'month'):
+        value = value.replace(day=1)
+    if kind == 'year':
+        value = value.replace(month=1)
+    return timezone.make_aware(value.replace(tzinfo=None))
+
+
+def _next_period(value, kind):
+    naive = value.replace(tzinfo=None)
+    if kind == 'year':
+        naive = naive.replace(year=naive.year + 1)
+    elif kind == 'month':
+        naive = naive.replace(year=naive.year + naive.month // 12, month=naive.month % 12 + 1)
+    else:
+        naive = naive + timedelta(days=1)
+    return timezone.make_aware(naive)
+
+
+def description_search_vector():
+    """
+    Full-text vector of the description. The 'simple' configuration lowercases words
+    without stemming, so it behaves like a plain word search in any language.
+    Matches the expression of transaction_desc_search_idx, so filters on it use the index.
+    """
+    return SearchVector('description', config='simple')
+
+
+def description_search_query(text):
+    """
+    Query matching descriptions with a word starting with each word of text
+    ('groc' finds 'Groceries'), or None when text has no words.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), config='simple', search_type='raw')
+
+
+class Category(models.Model):
+    # Spending category assigned to transactions by the CategoryRules (see categories.py).
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryRule(models.Model):
+    # One way of recognizing a category. A rule matches a transaction when its
+    # pattern (if any) is found in the description and the type and amount range
+    # (if set) fit; the first matching rule by priority, then id, wins.
+    KINDS = (
+        ('keyword', 'Keyword'),
+        ('regex', 'Regular expression'),
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='rules')
+    kind = models.CharField(max_length=7, choices=KINDS, default='keyword')
+    # A keyword matches whole words, ignoring case and punctuation ('uber eats'
+    # matches 'UBER-Eats', 'uber' doesn't match 'Tuberculosis'); a regex is searched
+    # case-insensitively. Leave it empty for a rule on the amount and type alone.
+    pattern = models.CharField(max_length=255, blank=True)
+    type = models.CharField(max_length=10, choices=(('deposit', 'Deposit'), ('expense', 'Expense')), blank=True)
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Lower numbers are tried first.
+    priority = models.IntegerField(default=100)
+
+    class Meta:
+        ordering = ['priority', 'id']
+
+    def clean(self):
+        from .categories import RuleError, compile_pattern
+        try:
+            compile_pattern(self.kind, self.pattern)
+        except RuleError as e:
+            raise ValidationError({'pattern': str(e)})
+        if self.min_amount is not None and self.max_amount is not None and self.min_amount > self.max_amount:
+            raise ValidationError({'max_amount': 'The maximum amount must not be below the minimum amount.'})
+
+    def __str__(self):
+        conditions = [f'{self.kind} "{self.pattern}"'] if self.pattern else []
+        if self.type:
+            conditions.append(self.type)
+        if self.min_amount is not None:
+            conditions.append(f'>= {self.min_amount}')
+        if self.max_amount is not None:
+            conditions.append(f'<= {self.max_amount}')
+        return f"{self.category}: {', '.join(conditions) or 'any transaction'}"
+
+
+class RuleSetHead(models.Model):
+    # A single-row table (pk=1) like LedgerHead: its version is bumped on every
+    # change to the categories or their rules, so each process knows when to
+    # recompile its rule matcher with one primary-key lookup.
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Rule set v{self.version} (updated {self.updated_at.isoformat()})"
+
+
 class Transaction(models.Model):
     # Choices for transaction type
     TRANSACTION_TYPES = (
@@ -33,12 +180,154 @@ class Transaction(models.Model):
     # For manual, it defaults to now.
     created_at = models.DateTimeField(default=timezone.now)
 
+    # Hash of the type, amount, day and normalized description, set on every save.
+    # Imports look incoming records up by it to catch duplicates without an
+    # external id (see MoneyTrail/fingerprints.py).
+    fingerprint = models.CharField(max_length=32, db_index=True, null=True, blank=True, editable=False)
+
+    # Set from the category rules on every save, and by recategorize_transactions
+    # when the rules change (see MoneyTrail/categories.py). Indexed together with
+    # the date below.
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, editable=False, db_index=False, related_name='+')
+
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         # Order transactions by creation date, newest first.
         # This is crucial for running balance calculation and display.
         ordering = ['-created_at']
+        indexes = [
+            # Range scans by date (balance checkpoints, point-in-time queries).
+            models.Index(fields=['created_at', 'id'], name='transaction_created_id_idx'),
+            # Type filter combined with the default date ordering (admin list_filter, API type filter).
+            models.Index(fields=['type', 'created_at', 'id'], name='transaction_type_created_idx'),
+            # Category filter combined with the default date ordering (API category filter).
+            models.Index(fields=['category', 'created_at', 'id'], name='transaction_category_idx'),
+            # Word search on the description (admin search box).
+            GinIndex(description_search_vector(), name='transaction_desc_search_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored date so signal handlers know which balance
+        # checkpoints a backdated edit invalidates without re-querying.
+        if 'created_at' in field_names:
+            instance._loaded_created_at = instance.created_at
+        return instance
+
+    @staticmethod
+    def parse_display_code(code):
+        """
+        Returns the id encoded in a display code ('TRN-0025' or '25'), or None.
+        """
+        if code.startswith('TRN-'):
+            code = code[4:]
+        try:
+            return int(code)
+        except ValueError:
+            return None
 
     def __str__(self):
         # Use Django's auto-generated 'id' for the display code
         display_code = f"TRN-{self.id:04d}" if self.id else "N/A"
         return f"{display_code} - {self.type.capitalize()}: {self.amount} on {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class LedgerHead(models.Model):
+    # A single-row table (pk=1) that acts as the "head" of the ledger.
+    # Every balance-affecting write locks this row with SELECT ... FOR UPDATE
+    # before running its balance and daily-limit checks, so concurrent writers
+    # are serialized on one cheap row lock instead of the whole table.
+    # The version counter is bumped on every change to the Transaction table.
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Ledger v{self.version} (updated {self.updated_at.isoformat()})"
+
+
+class BalanceCheckpoint(models.Model):
+    # Cumulative balance at the end of a day that has transactions.
+    # Lets "balance at date X" start from the nearest checkpoint instead of
+    # replaying the whole ledger. Checkpoints on and after a changed day are
+    # deleted on write and rebuilt lazily on the next balance query.
+    day = models.DateField(unique=True)
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+    # Number of transactions up to and including this day.
+    transaction_count = models.PositiveIntegerField()
+    # Number of imported transactions (with an api_external_id) on this day, and the
+    # sum of their RowDigests modulo 2**64 (see MoneyTrail/reconcile.py).
+    imported_count = models.PositiveIntegerField(default=0)
+    imported_digest = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f"{self.day.isoformat()}: {self.balance}"
+
+
+class ArchivedTransaction(models.Model):
+    # Transactions moved out of the hot Transaction table by `manage.py
+    # archive_transactions`. Same columns and ids (so display codes don't change);
+    # the rows are read-only and only queried when a request reaches past the cutoff.
+    id = models.BigIntegerField(primary_key=True)
+    api_external_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    description = models.CharField(max_length=255, blank=True, null=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    created_at = models.DateTimeField()
+    # The category when the row was archived; archived rows aren't recategorized.
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='archived_created_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"TRN-{self.id:04d} (archived) - {self.type.capitalize()}: {self.amount} on {self.created_at.strftime('%Y-%m-%d')}"
+
+
+class OpeningBalance(models.Model):
+    # A single-row table (pk=1): the balance carried forward from the archived
+    # transactions. Every transaction created before the start of cutoff_day
+    # lives in ArchivedTransaction; running balances and totals of the hot
+    # ledger start from this balance instead of zero.
+    cutoff_day = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    # Number of archived transactions.
+    transaction_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Opening balance {self.balance} before {self.cutoff_day.isoformat()}"
+
+
+class LedgerChange(models.Model):
+    # Outbox of changes to the Transaction table, written in the same database
+    # transaction as the change itself (see outbox.py). The id is the sequence
+    # number of the change feed: every writer holds the ledger head lock while
+    # inserting here, so ids become visible in increasing order.
+    OPS = [
+        ('added', 'Added'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    op = models.CharField(max_length=7, choices=OPS)
+    transaction_id = models.BigIntegerField()
+    # The row after the change; left empty for deletions.
+    api_external_id = models.CharField(max_length=255, null=True, blank=True)
+    description = models.CharField(max_length=255, null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES, null=True, blank=True)
+    created_at = models.DateTimeField(null=True, blank=True)
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.op} TRN-{self.transaction_id:04d}"
@@ -0,0 +1,85 @@
+# MoneyTrail/outbox.py
+"""
+Transactional outbox of ledger changes and the change feed built on it.
+
+Every insert, update and delete of a Transaction writes a LedgerChange row in
+the same database transaction: single-row writes (viewset, admin, import
+command) through the signal handlers in signals.py, set-based writes (bulk.py)
+with one INSERT ... SELECT per statement. A change is therefore recorded if and
+only if it commits.
+
+LedgerChange ids are the feed's sequence numbers. Writers hold the ledger head
+lock while recording (bump_ledger_version() takes it first), so a change with a
+higher id never becomes visible before one with a lower id: a consumer that has
+read everything up to N can ask for since=N and miss nothing. Rolled-back writes
+leave gaps in the ids, which consumers can ignore.
+"""
+from django.db import connections
+from django.db.models import Value
+from django.db.models.functions import Now
+
+from .models import LedgerChange
+
+# Transaction columns copied into a change (besides the id).
+CHANGE_FIELDS = ('api_external_id', 'description', 'amount', 'type', 'created_at')
+
+# Columns of a feed entry; deletions only carry the first three.
+FEED_COLUMNS = ('seq', 'op', 'id') + CHANGE_FIELDS
+
+# Changes per feed response, by default and at most.
+FEED_BATCH_SIZE = 500
+MAX_FEED_BATCH_SIZE = 5000
+
+
+def record_change(op, instance):
+    """
+    Records one change ('added', 'updated' or 'deleted') of a Transaction instance.
+    """
+    fields = {} if op == 'deleted' else {field: getattr(instance, field) for field in CHANGE_FIELDS}
+    LedgerChange.objects.create(op=op, transaction_id=instance.pk, **fields)
+
+
+def record_changes(op, queryset):
+    """
+    Records a change of every transaction in queryset with one INSERT ... SELECT.
+    Call it before a bulk DELETE, or after a bulk UPDATE (with a queryset that
+    still matches the updated rows).
+    """
+    fields = () if op == 'deleted' else CHANGE_FIELDS
+    # Django selects model fields before expressions, so op and recorded_at come last.
+    select = queryset.order_by('created_at', 'id').values_list('id', *fields, Value(op), Now())
+    select_sql, params = select.query.sql_with_params()
+    connection = connections[queryset.db]
+    columns = ', '.join(connection.ops.quote_name(column) for column in ('transaction_id', *fields, 'op', 'recorded_at'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(LedgerChange._meta.db_table)} ({columns}) {select_sql}',
+            params
+        )
+
+
+def _feed_entry(row):
+    seq, op, pk, api_external_id, description, amount, transaction_type, created_at = row
+    if op == 'deleted':
+        return [seq, op, pk]
+    return [seq, op, pk, api_external_id, description, str(amount), transaction_type, created_at.isoformat()]
+
+
+def change_feed(since, limit=FEED_BATCH_SIZE):
+    """
+    Returns the changes after sequence number `since`, oldest first, at most
+    `limit` of them: {'columns', 'changes' (lists in column order), 'next'
+    (the since= of the next call), 'has_more'}.
+    """
+    rows = list(
+        LedgerChange.objects.filter(id__gt=since).order_by('id')
+        .values_list('id', 'op', 'transaction_id', *CHANGE_FIELDS)[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'columns': FEED_COLUMNS,
+        'changes': [_feed_entry(row) for row in rows],
+        'next': rows[-1][0] if rows else since,
+        'has_more': has_more,
+    }
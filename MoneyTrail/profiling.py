@@ -0,0 +1,206 @@
+# MoneyTrail/profiling.py
+"""
+On-demand profiling of TransactionViewSet actions and the import command.
+
+A profile records cProfile stats, every SQL statement with its duration and the
+tracemalloc peak while the profiled code ran. It is written to
+settings.PROFILING_DIR as two files sharing a name: <name>.prof (pstats format,
+for snakeviz or `python -m pstats`) and <name>.json (a summary with the SQL and
+the slowest functions). Only the newest settings.PROFILING_MAX_PROFILES are kept.
+
+Requests are profiled when settings.PROFILING_ENABLED is on (a random
+PROFILING_SAMPLE_RATE fraction of them), or when they carry a signed
+X-MoneyTrail-Profile header from `manage.py profiling_token`. Otherwise the
+middleware only does a settings lookup and a header check per request.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Request header (as found in request.META) carrying a profiling token.
+PROFILE_HEADER = 'HTTP_X_MONEYTRAIL_PROFILE'
+
+# Salt of the signed profiling tokens, so no other signed value can be replayed as one.
+PROFILE_TOKEN_SALT = 'MoneyTrail.profiling'
+
+# Functions listed in the JSON summary, by cumulative time.
+SUMMARY_FUNCTIONS = 30
+
+# Names of the files written to the profile directory.
+PROFILE_FILE_RE = re.compile(r'^[\w.-]+\.(prof|json)$')
+
+# Characters of a label that aren't used in file names.
+UNSAFE_NAME_RE = re.compile(r'[^\w.-]+')
+
+# tracemalloc is process-wide, so only one profile runs at a time; requests
+# arriving while one runs are not profiled.
+_profile_lock = threading.Lock()
+
+
+def profiling_token():
+    """
+    Returns a token for the profiling header (valid for PROFILING_TOKEN_MAX_AGE seconds).
+    """
+    return signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).sign('profile')
+
+
+def is_valid_token(token):
+    try:
+        signing.TimestampSigner(salt=PROFILE_TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_profile(meta=None):
+    """
+    Returns True if this request (its META) or command run should be profiled.
+    """
+    token = meta.get(PROFILE_HEADER) if meta is not None else None
+    if token is not None:
+        return is_valid_token(token)
+    return settings.PROFILING_ENABLED and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def profile_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def list_profiles():
+    """
+    Returns the JSON summaries of the stored profiles, newest first.
+    """
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    summaries = []
+    for path in sorted(directory.glob('*.json'), reverse=True):
+        try:
+            summaries.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # Removed by rotation, or still being written
+    return summaries
+
+
+def profile_path(filename):
+    """
+    Returns the path of a stored profile file, or None for any other name.
+    """
+    if not PROFILE_FILE_RE.match(filename):
+        return None
+    path = profile_dir() / filename
+    return path if path.is_file() else None
+
+
+def _rotate(directory):
+    # Names start with the start time, so sorting them sorts by age.
+    names = sorted({path.stem for path in directory.glob('*.json')} | {path.stem for path in directory.glob('*.prof')})
+    for stem in names[:max(len(names) - settings.PROFILING_MAX_PROFILES, 0)]:
+        for suffix in ('.json', '.prof'):
+            (directory / f'{stem}{suffix}').unlink(missing_ok=True)
+
+
+class Profile:
+    """
+    Collects one profile while active (see profiled()); details such as the
+    request path and response status can be added to `info` before it's saved.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.name = None  # Set once saved
+        self.info = {}
+        self.queries = []
+        self.profiler = cProfile.Profile()
+
+    def _record_sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'many': many,
+            })
+
+    def save(self, started_at, duration, peak_memory):
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{started_at:%Y%m%dT%H%M%S%f}-{UNSAFE_NAME_RE.sub('_', self.label)}"
+        self.name = name
+
+        self.profiler.dump_stats(directory / f'{name}.prof')
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+        summary = {
+            'name': name,
+            'label': self.label,
+            **self.info,
+            'started_at': started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'peak_memory_bytes': peak_memory,
+            'sql_count': len(self.queries),
+            'sql_time_ms': round(sum(query['duration_ms'] for query in self.queries), 3),
+            'sql': self.queries,
+            'functions': stream.getvalue(),
+        }
+        (directory / f'{name}.json').write_text(json.dumps(summary, indent=2))
+        _rotate(directory)
+        logger.debug('Saved profile %s (%s ms, %s queries)', name, summary['duration_ms'], summary['sql_count'])
+        return name
+
+
+@contextmanager
+def profiled(label, enabled=True):
+    """
+    Profiles the enclosed code and saves the result; yields the Profile, or None
+    when not enabled or another profile is already running.
+    """
+    if not enabled or not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+    try:
+        profile = Profile(label)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        started_at = timezone.now()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile._record_sql))
+                profile.profiler.enable()
+                try:
+                    yield profile
+                finally:
+                    profile.profiler.disable()
+        finally:
+            duration = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            profile.save(started_at, duration, peak_memory)
+    finally:
+        _profile_lock.release()
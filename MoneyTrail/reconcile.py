@@ -0,0 +1,175 @@
+# MoneyTrail/reconcile.py
+"""
+Reconciliation of the imported transactions with the external API (`manage.py
+reconcile_transactions`).
+
+Both sides are summarized as a hash tree over time ranges: every imported row
+(one with an api_external_id) has a 64-bit RowDigest of its external id, type,
+amount and timestamp (engine.py), and the digest of a day, month or year is the
+count and the sum modulo 2**64 of the digests of its rows. Sums can be combined
+in any order, so a month's digest is the sum of its days'.
+
+The local day digests are stored on the balance checkpoints (checkpoints.py),
+which writes already invalidate and rebuild, so comparing them never scans the
+Transaction table. The comparison starts with the years, then looks only at the
+months of years that differ and the days of months that differ; the rows of the
+mismatching days are the only ones read and compared one by one. The work done
+locally therefore grows with the number of differences, not with the ledger.
+
+The API itself only serves the full list, so its digests are computed in memory
+from the downloaded records.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.db.models import Q, Sum
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .checkpoints import day_start, ensure_checkpoints
+from .engine import row_digest, signed_digest
+from .ledger import ledger_opening
+from .models import ArchivedTransaction, BalanceCheckpoint, Transaction
+
+# Levels of the hash tree, coarsest first. A key at each level is a (year,),
+# (year, month) or (year, month, day) tuple.
+LEVELS = ('year', 'month', 'day')
+
+_LEVEL_FIELDS = {
+    'year': {'year': ExtractYear('day')},
+    'month': {'year': ExtractYear('day'), 'month': ExtractMonth('day')},
+    'day': {'year': ExtractYear('day'), 'month': ExtractMonth('day'), 'day_of_month': ExtractDay('day')},
+}
+
+# An imported row on either side: the transaction id is None for API records.
+ReconcileRow = namedtuple('ReconcileRow', ['external_id', 'type', 'amount', 'created_at', 'pk'])
+
+ReconcileReport = namedtuple('ReconcileReport', ['missing', 'extra', 'altered', 'compared'])
+ReconcileReport.__doc__ = """
+missing: API rows with no local transaction; extra: local rows the API doesn't have;
+altered: (local, api) pairs with the same external id but different values;
+compared: the number of buckets compared per level.
+"""
+
+
+def _period_range(key):
+    # [first day, first day after) of a (year,), (year, month) or (year, month, day) key.
+    if len(key) == 1:
+        return date(key[0], 1, 1), date(key[0] + 1, 1, 1)
+    if len(key) == 2:
+        year, month = key
+        return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+    first = date(*key)
+    return first, first + timedelta(days=1)
+
+
+def _ranges_filter(field, keys, as_datetimes=False):
+    condition = Q()
+    for key in keys:
+        first, after = _period_range(key)
+        if as_datetimes:
+            first, after = day_start(first), day_start(after)
+        condition |= Q(**{f'{field}__gte': first, f'{field}__lt': after})
+    return condition
+
+
+def _local_digests(level, parents):
+    """
+    {key: (count, digest)} of the stored day digests at `level`, restricted to the
+    periods in `parents` (every period when None).
+    """
+    checkpoints = BalanceCheckpoint.objects.filter(imported_count__gt=0)
+    if parents is not None:
+        checkpoints = checkpoints.filter(_ranges_filter('day', parents))
+    fields = _LEVEL_FIELDS[level]
+    rows = (
+        checkpoints.annotate(**fields).order_by().values(*fields)
+        .annotate(count=Sum('imported_count'), digest=Sum('imported_digest'))
+    )
+    return {
+        tuple(row[field] for field in fields): (row['count'], signed_digest(int(row['digest'])))
+        for row in rows
+    }
+
+
+def _remote_digests(day_digests, level, parents):
+    depth = LEVELS.index(level) + 1
+    digests = {}
+    for key, (count, digest) in day_digests.items():
+        if parents is not None and key[:depth - 1] not in parents:
+            continue
+        total_count, total = digests.get(key[:depth], (0, 0))
+        digests[key[:depth]] = (total_count + count, total + digest)
+    return {key: (count, signed_digest(total)) for key, (count, total) in digests.items()}
+
+
+def _local_rows(days):
+    # The imported rows created on `days`, in both tables when they reach the archive.
+    opening = ledger_opening()
+    models = [Transaction]
+    if opening is not None and date(*min(days)) < opening.cutoff_day:
+        models.append(ArchivedTransaction)
+    rows = []
+    for model in models:
+        queryset = model.objects.filter(_ranges_filter('created_at', days, as_datetimes=True), api_external_id__isnull=False)
+        rows += [
+            ReconcileRow(external_id, transaction_type, amount, created_at, pk)
+            for pk, external_id, transaction_type, amount, created_at
+            in queryset.order_by('created_at', 'id').values_list('id', 'api_external_id', 'type', 'amount', 'created_at')
+        ]
+    return rows
+
+
+def _digest(row):
+    return row_digest(row.external_id, row.type, row.amount, row.created_at)
+
+
+def reconcile(records):
+    """
+    Compares the imported transactions with records, the validated API records
+    ((external_id, description, amount, type, created_at) tuples, as returned by
+    importing.validate_record). Returns a ReconcileReport.
+    """
+    ensure_checkpoints()
+
+    # local_day() per record looks the time zone up every time; this is the same day.
+    current_timezone = timezone.get_current_timezone()
+    remote_by_day = {}
+    for external_id, _, amount, transaction_type, created_at in records:
+        day = created_at.astimezone(current_timezone).date()
+        remote_by_day.setdefault((day.year, day.month, day.day), []).append(
+            ReconcileRow(external_id, transaction_type, amount, created_at, None)
+        )
+    day_digests = {
+        key: (len(rows), sum(_digest(row) for row in rows))
+        for key, rows in remote_by_day.items()
+    }
+
+    compared = {}
+    mismatched = None
+    for level in LEVELS:
+        local = _local_digests(level, mismatched)
+        remote = _remote_digests(day_digests, level, mismatched)
+        keys = set(local) | set(remote)
+        compared[level] = len(keys)
+        mismatched = {key for key in keys if local.get(key) != remote.get(key)}
+        if not mismatched:
+            return ReconcileReport([], [], [], compared)
+
+    local_by_id = {row.external_id: row for row in _local_rows(mismatched)}
+    missing, altered = [], []
+    matched = set()
+    for key in sorted(mismatched):
+        for row in remote_by_day.get(key, []):
+            local_row = local_by_id.get(row.external_id)
+            if local_row is None or row.external_id in matched:
+                missing.append(row)
+                continue
+            matched.add(row.external_id)
+            if _digest(local_row) != _digest(row):
+                altered.append((local_row, row))
+    # A record whose timestamp changed upstream is still matched: its old and
+    # new days both differ, so both were read.
+    extra = [row for external_id, row in local_by_id.items() if external_id not in matched]
+
+    return ReconcileReport(missing, extra, altered, compared)
@@ -10,14 +10,17 @@ class TransactionSerializer(serializers.ModelSerializer):
     # Custom field to display the formatted transaction code (e.g., TRN-0001)
     display_code = serializers.SerializerMethodField()
 
+    # Name of the category the rules assigned (see categories.py), or null
+    category = serializers.CharField(source='category.name', read_only=True, default=None)
+
     class Meta:
         model = Transaction
         # Include all fields for display and creation
-        fields = ['id', 'display_code', 'api_external_id', 'description', 'amount', 'type', 'created_at', 'running_balance']
+        fields = ['id', 'display_code', 'api_external_id', 'description', 'amount', 'type', 'created_at', 'category', 'running_balance']
         # 'id' is Django's internal primary key
         # 'display_code' is generated from 'id'
         # 'api_external_id' is from the external API, not user-editable
-        read_only_fields = ['id', 'display_code', 'api_external_id']
+        read_only_fields = ['id', 'display_code', 'api_external_id', 'category']
 
     def get_display_code(self, obj):
         """
@@ -0,0 +1,87 @@
+# MoneyTrail/signals.py
+"""
+Signal handlers that keep ledger-derived state in sync with the Transaction table.
+Connected in MoneytrailConfig.ready().
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .categories import bump_rules_version, current_matcher, schedule_recategorization
+from .checkpoints import invalidate_checkpoints, local_day
+from .engine import signed_cents
+from .fingerprints import fingerprint
+from .index import ledger_index
+from .ledger import bump_ledger_version
+from .models import Category, CategoryRule, Transaction
+from .outbox import record_change
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_stored_date(sender, instance, **kwargs):
+    # Instances loaded from the DB already carry their stored date (see
+    # Transaction.from_db); only fall back to a query for the rare others.
+    if instance.pk and not hasattr(instance, '_loaded_created_at'):
+        instance._loaded_created_at = (
+            Transaction.objects.filter(pk=instance.pk).values_list('created_at', flat=True).first()
+        )
+
+
+@receiver(pre_save, sender=Transaction)
+def set_fingerprint(sender, instance, **kwargs):
+    instance.fingerprint = fingerprint(instance.type, instance.amount, instance.created_at, instance.description)
+
+
+@receiver(pre_save, sender=Transaction)
+def set_category(sender, instance, **kwargs):
+    instance.category = current_matcher().categorize(instance.type, instance.amount, instance.description)
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, created, **kwargs):
+    # Bumping the version takes the ledger head lock, so writes that don't go
+    # through the viewset (admin, fetch_transactions) are serialized as well.
+    head = bump_ledger_version()
+    record_change('added' if created else 'updated', instance)
+
+    # A backdated edit only invalidates checkpoints from the earliest affected day.
+    changed_day = local_day(instance.created_at)
+    previous = getattr(instance, '_loaded_created_at', None)
+    if previous is not None:
+        changed_day = min(changed_day, local_day(previous))
+    invalidate_checkpoints(changed_day)
+
+    if created or previous is not None:
+        ledger_index.apply(
+            head,
+            removed=[] if created else [(previous, instance.pk)],
+            added=[(instance.created_at, instance.pk, signed_cents(instance))]
+        )
+    instance._loaded_created_at = instance.created_at
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, **kwargs):
+    head = bump_ledger_version()
+    record_change('deleted', instance)
+    stored_date = getattr(instance, '_loaded_created_at', None) or instance.created_at
+    invalidate_checkpoints(local_day(stored_date))
+    ledger_index.apply(head, removed=[(stored_date, instance.pk)])
+
+
+@receiver(post_save, sender=CategoryRule)
+@receiver(post_delete, sender=CategoryRule)
+def category_rule_changed(sender, instance, **kwargs):
+    bump_rules_version()
+    schedule_recategorization()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, created=False, **kwargs):
+    bump_rules_version()
+    if created:
+        return  # No rules yet
+    # A renamed category shows up in the rows clients cache by ledger version,
+    # and a deleted one has already been cleared from them.
+    ledger_index.apply(bump_ledger_version())
+    schedule_recategorization()
@@ -5,7 +5,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const addTransactionForm = document.getElementById('addTransactionForm');
     const addTransactionModal = new bootstrap.Modal(document.getElementById('addTransactionModal'));
     const addTransactionError = document.getElementById('addTransactionError');
-    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    const transactionsScroll = document.getElementById('transactionsScroll');
+    const loadingMore = document.getElementById('loadingMore');
     const emptyState = document.getElementById('emptyState');
 
     // Filter Elements
@@ -39,15 +40,55 @@ document.addEventListener('DOMContentLoaded', function() {
     const confirmDeleteBtn = document.getElementById('confirmDeleteBtn');
 
 
-    let currentPage = 1;
-    let hasMorePages = true;
     let activeFilters = {}; // Object to store current filter parameters
 
-    // Function to fetch transactions from the API (your Django backend)
-    async function fetchTransactions(page = 1, filters = {}) {
+    // Small client-side cache of GET responses keyed by URL, with the ETag and
+    // Last-Modified validators the server sent. Unchanged refreshes come back as
+    // 304 Not Modified with an empty body and are served from here.
+    const responseCache = new Map();
+    const RESPONSE_CACHE_SIZE = 20;
+
+    async function fetchWithValidators(url) {
+        const cached = responseCache.get(url);
+        const headers = {};
+        if (cached) {
+            if (cached.etag) headers['If-None-Match'] = cached.etag;
+            if (cached.lastModified) headers['If-Modified-Since'] = cached.lastModified;
+        }
+
+        // 'no-store' keeps the browser's HTTP cache out of the way so the 304 reaches us.
+        const response = await fetch(url, { headers: headers, cache: 'no-store' });
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const data = await response.json();
+
+        responseCache.delete(url);
+        responseCache.set(url, {
+            etag: response.headers.get('ETag'),
+            lastModified: response.headers.get('Last-Modified'),
+            data: data
+        });
+        if (responseCache.size > RESPONSE_CACHE_SIZE) {
+            responseCache.delete(responseCache.keys().next().value); // Drop the oldest entry
+        }
+        return data;
+    }
+
+    // Function to fetch transactions from the API (your Django backend).
+    // pageSize overrides the server's page size; history 'none' leaves out the
+    // chart series (pages after the first don't need it).
+    async function fetchTransactions(page = 1, filters = {}, pageSize = null, history = 'compact') {
         try {
             const queryParams = new URLSearchParams();
             queryParams.append('page', page);
+            if (pageSize) {
+                queryParams.append('page_size', pageSize);
+            }
+            queryParams.append('history', history); // 'compact': parallel arrays, one point per day
 
             for (const key in filters) {
                 if (filters[key]) {
@@ -55,12 +96,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             }
 
-            const response = await fetch(`/api/transactions/?${queryParams.toString()}`);
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const data = await response.json();
-            return data;
+            return await fetchWithValidators(`/api/transactions/?${queryParams.toString()}`);
         } catch (error) {
             console.error('Error fetching transactions:', error);
             showMessageBox('Error', 'Failed to load transactions. Please try again.', true);
@@ -68,62 +104,275 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
-    // Function to render transactions in the table
-    function renderTransactions(transactions, append = false) {
-        if (!append) {
-            transactionsTableBody.innerHTML = '';
+    // --- Virtualized transaction table ---
+    // Every loaded transaction is kept in loadedTransactions (newest first, as
+    // the API returns them), but the table only holds the rows in view plus
+    // ROW_OVERSCAN on each side, between two spacer rows standing in for the
+    // rest. Scrolling swaps rows at most once per animation frame, and the next
+    // page is requested while the rendered rows are still PREFETCH_ROWS from the
+    // end. Changes patch the affected rows instead of rebuilding the table.
+    const PAGE_SIZE = 100; // Rows per page loaded while scrolling (?page_size)
+    const ROW_OVERSCAN = 10;
+    const PREFETCH_ROWS = 60;
+
+    let loadedTransactions = [];
+    let hasMorePages = true;
+    let rowHeight = 45; // Pixels, measured from the rendered rows
+    let renderedStart = 0;
+    let renderedEnd = 0;
+    let renderFrame = null;
+    let pageRequest = null; // The page being fetched, if any
+    let listGeneration = 0; // Bumped when the list is replaced, so stale pages are dropped
+    const removedIds = new Set(); // Deletions already applied here (their live event echoes them)
+
+    // Replace the loaded rows (first page, new filters) and scroll back to the top.
+    // Rows are copied, so patching them leaves the cached responses untouched.
+    function setTransactions(transactions, hasMore) {
+        listGeneration++;
+        pageRequest = null;
+        loadingMore.style.display = 'none';
+        loadedTransactions = transactions.map(transaction => ({ ...transaction }));
+        hasMorePages = hasMore;
+        transactionsScroll.scrollTop = 0;
+        renderVisibleRows(true);
+    }
+
+    function spacerRow(height) {
+        const row = document.createElement('tr');
+        row.className = 'spacer-row';
+        const cell = row.insertCell();
+        cell.colSpan = 7;
+        cell.style.height = `${height}px`;
+        return row;
+    }
+
+    // Render the rows in view. Unless forced, nothing happens while the same rows are showing.
+    function renderVisibleRows(force = false) {
+        renderFrame = null;
+        const count = loadedTransactions.length;
+        emptyState.style.display = count === 0 && !hasMorePages ? 'block' : 'none';
+
+        const visible = Math.ceil(transactionsScroll.clientHeight / rowHeight) + 2 * ROW_OVERSCAN;
+        let start = Math.min(Math.floor(transactionsScroll.scrollTop / rowHeight) - ROW_OVERSCAN, count - visible);
+        start = Math.max(0, start - (start % 2)); // Even, so table-striped keeps each row's shade
+        const end = Math.min(count, start + visible);
+
+        if (force || start !== renderedStart || end !== renderedEnd) {
+            renderedStart = start;
+            renderedEnd = end;
+            const fragment = document.createDocumentFragment();
+            fragment.appendChild(spacerRow(start * rowHeight));
+            for (let i = start; i < end; i++) {
+                fragment.appendChild(buildTransactionRow(loadedTransactions[i]));
+            }
+            fragment.appendChild(spacerRow((count - end) * rowHeight));
+            transactionsTableBody.replaceChildren(fragment);
+
+            // Rows are one line high (see .transactions-scroll in style.css).
+            const measured = end > start ? transactionsTableBody.rows[1].offsetHeight : 0;
+            if (measured && Math.abs(measured - rowHeight) > 1) {
+                rowHeight = measured;
+                renderVisibleRows(true);
+                return;
+            }
         }
+        prefetchNextPage();
+    }
+
+    function scheduleRender() {
+        if (!renderFrame) {
+            renderFrame = requestAnimationFrame(() => renderVisibleRows());
+        }
+    }
 
-        if (transactions.length === 0 && !append) {
-            emptyState.style.display = 'block';
-            loadMoreBtn.style.display = 'none';
+    // Replace the rendered rows between from and to (loadedTransactions indices) with fresh ones.
+    function patchRows(from, to) {
+        for (let i = Math.max(from, renderedStart); i < Math.min(to, renderedEnd); i++) {
+            transactionsTableBody.rows[i - renderedStart + 1].replaceWith(buildTransactionRow(loadedTransactions[i]));
+        }
+    }
+
+    function prefetchNextPage() {
+        if (hasMorePages && !pageRequest && loadedTransactions.length - renderedEnd < PREFETCH_ROWS) {
+            pageRequest = loadNextPage();
+        }
+    }
+
+    async function loadNextPage() {
+        const generation = listGeneration;
+        // The PAGE_SIZE page holding the first row not loaded yet (the first
+        // page may have been smaller); rows already loaded are skipped.
+        const page = Math.floor(loadedTransactions.length / PAGE_SIZE) + 1;
+        const skip = loadedTransactions.length - (page - 1) * PAGE_SIZE;
+        loadingMore.style.display = 'block';
+        const data = await fetchTransactions(page, activeFilters, PAGE_SIZE, 'none');
+        if (generation !== listGeneration) {
+            return; // The list was replaced meanwhile
+        }
+        pageRequest = null;
+        loadingMore.style.display = 'none';
+        if (!data) {
+            hasMorePages = false; // Stop retrying on every frame; reloading the list starts over
             return;
-        } else {
-            emptyState.style.display = 'none';
-        }
-
-        transactions.forEach(transaction => {
-            const row = transactionsTableBody.insertRow();
-            row.insertCell().textContent = transaction.display_code || 'N/A';
-            row.insertCell().textContent = transaction.description || '-';
-
-            const amountValue = parseFloat(transaction.amount);
-            const amountCell = row.insertCell();
-            const displayAmount = transaction.type === 'expense' ? `-$${amountValue.toFixed(2)}` : `+$${amountValue.toFixed(2)}`;
-            amountCell.textContent = displayAmount;
-            amountCell.classList.add(transaction.type === 'expense' ? 'text-danger' : 'text-success');
-
-            row.insertCell().textContent = new Date(transaction.created_at).toLocaleDateString();
-            row.insertCell().textContent = transaction.type.charAt(0).toUpperCase() + transaction.type.slice(1);
-
-            const runningBalanceValue = parseFloat(transaction.running_balance);
-            const runningBalanceCell = row.insertCell();
-            runningBalanceCell.textContent = `$${runningBalanceValue.toFixed(2)}`;
-            runningBalanceCell.classList.add(runningBalanceValue < 0 ? 'text-danger' : 'text-success');
-
-            const actionsCell = row.insertCell();
-            actionsCell.classList.add('actions-cell');
-
-            const editBtn = document.createElement('button');
-            editBtn.className = 'btn btn-sm btn-info rounded-pill';
-            editBtn.innerHTML = '<i class="fas fa-edit"></i> Edit';
-            editBtn.dataset.transactionId = transaction.id;
-            editBtn.dataset.displayCode = transaction.display_code;
-            editBtn.dataset.description = transaction.description;
-            editBtn.dataset.amount = transaction.amount;
-            editBtn.dataset.date = new Date(transaction.created_at).toISOString().split('T')[0];
-            editBtn.dataset.type = transaction.type;
-            editBtn.addEventListener('click', openEditModal);
-            actionsCell.appendChild(editBtn);
-
-            const deleteBtn = document.createElement('button');
-            deleteBtn.className = 'btn btn-sm btn-danger rounded-pill';
-            deleteBtn.innerHTML = '<i class="fas fa-trash-alt"></i> Delete';
-            deleteBtn.dataset.transactionId = transaction.id;
-            deleteBtn.dataset.displayCode = transaction.display_code;
-            deleteBtn.addEventListener('click', openDeleteModal);
-            actionsCell.appendChild(deleteBtn);
+        }
+        const loadedIds = new Set(loadedTransactions.slice(-PAGE_SIZE).map(transaction => transaction.id));
+        data.transactions.forEach((transaction, i) => {
+            if (i >= skip && !loadedIds.has(transaction.id)) {
+                loadedTransactions.push({ ...transaction });
+            }
         });
+        hasMorePages = data.has_more;
+        renderVisibleRows(true);
+    }
+
+    transactionsScroll.addEventListener('scroll', scheduleRender, { passive: true });
+    window.addEventListener('resize', scheduleRender);
+
+    // --- Patching loaded rows ---
+    // Running balances are updated from the change itself: every row newer than
+    // it (lower index) moves by its signed amount. Applying the same change twice
+    // (the response, then its live event) changes nothing the second time.
+    function toCents(value) {
+        return Math.round(parseFloat(value) * 100);
+    }
+
+    function signedCents(transaction) {
+        const cents = toCents(transaction.amount);
+        return transaction.type === 'expense' ? -cents : cents;
+    }
+
+    function withCents(cents) {
+        return (cents / 100).toFixed(2);
+    }
+
+    function shiftRunningBalances(end, cents) {
+        if (!cents) return;
+        for (let i = 0; i < end; i++) {
+            loadedTransactions[i].running_balance = withCents(toCents(loadedTransactions[i].running_balance) + cents);
+        }
+    }
+
+    function indexOfTransaction(id) {
+        return loadedTransactions.findIndex(transaction => transaction.id === id);
+    }
+
+    // Where a transaction belongs among the loaded rows: newest first, by
+    // created_at and then id, like the API.
+    function insertionIndex(transaction) {
+        const time = Date.parse(transaction.created_at);
+        let low = 0;
+        let high = loadedTransactions.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            const other = loadedTransactions[middle];
+            const otherTime = Date.parse(other.created_at);
+            if (otherTime > time || (otherTime === time && other.id > transaction.id)) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    // Apply an added or updated transaction to the loaded rows. Returns false
+    // when that can't be done here, because it may not match the filters or it
+    // lands past the loaded rows; the list has to be reloaded then.
+    function applyTransactionChange(transaction) {
+        if (hasActiveFilters()) return false;
+        const cents = signedCents(transaction);
+        const index = indexOfTransaction(transaction.id);
+        if (index !== -1 && loadedTransactions[index].created_at === transaction.created_at) {
+            // Same place: only its own and the newer rows' running balances change.
+            const previous = loadedTransactions[index];
+            const delta = cents - signedCents(previous);
+            loadedTransactions[index] = { ...transaction, running_balance: withCents(toCents(previous.running_balance) + delta) };
+            shiftRunningBalances(index, delta);
+            patchRows(0, index + 1);
+            return true;
+        }
+        if (index !== -1) {
+            const [previous] = loadedTransactions.splice(index, 1);
+            shiftRunningBalances(index, -signedCents(previous));
+        }
+
+        const position = insertionIndex(transaction);
+        let before; // Balance just before the transaction, in cents
+        if (position < loadedTransactions.length) {
+            before = toCents(loadedTransactions[position].running_balance);
+        } else if (!hasMorePages && loadedTransactions.length) {
+            const oldest = loadedTransactions[loadedTransactions.length - 1];
+            before = toCents(oldest.running_balance) - signedCents(oldest);
+        } else {
+            return false;
+        }
+        loadedTransactions.splice(position, 0, { ...transaction, running_balance: withCents(before + cents) });
+        shiftRunningBalances(position, cents);
+        renderVisibleRows(true);
+        return true;
+    }
+
+    // Remove a deleted transaction from the loaded rows. Returns false if it
+    // isn't loaded (its amount is unknown here), so the list has to be reloaded.
+    function removeTransaction(id) {
+        const index = indexOfTransaction(id);
+        if (index === -1) {
+            return removedIds.has(id);
+        }
+        const [removed] = loadedTransactions.splice(index, 1);
+        removedIds.add(id);
+        shiftRunningBalances(index, -signedCents(removed));
+        renderVisibleRows(true);
+        return true;
+    }
+
+    // Build a table row for one transaction. Rows carry their id so live
+    // updates can find and patch them in place.
+    function buildTransactionRow(transaction) {
+        const row = document.createElement('tr');
+        row.dataset.transactionId = transaction.id;
+        row.dataset.createdAt = transaction.created_at;
+        row.insertCell().textContent = transaction.display_code || 'N/A';
+        row.insertCell().textContent = transaction.description || '-';
+
+        const amountValue = parseFloat(transaction.amount);
+        const amountCell = row.insertCell();
+        const displayAmount = transaction.type === 'expense' ? `-$${amountValue.toFixed(2)}` : `+$${amountValue.toFixed(2)}`;
+        amountCell.textContent = displayAmount;
+        amountCell.classList.add(transaction.type === 'expense' ? 'text-danger' : 'text-success');
+
+        row.insertCell().textContent = new Date(transaction.created_at).toLocaleDateString();
+        row.insertCell().textContent = transaction.type.charAt(0).toUpperCase() + transaction.type.slice(1);
+
+        const runningBalanceValue = parseFloat(transaction.running_balance);
+        const runningBalanceCell = row.insertCell();
+        runningBalanceCell.textContent = `$${runningBalanceValue.toFixed(2)}`;
+        runningBalanceCell.classList.add(runningBalanceValue < 0 ? 'text-danger' : 'text-success');
+
+        const actionsCell = row.insertCell();
+        actionsCell.classList.add('actions-cell');
+
+        const editBtn = document.createElement('button');
+        editBtn.className = 'btn btn-sm btn-info rounded-pill';
+        editBtn.innerHTML = '<i class="fas fa-edit"></i> Edit';
+        editBtn.dataset.transactionId = transaction.id;
+        editBtn.dataset.displayCode = transaction.display_code;
+        editBtn.dataset.description = transaction.description;
+        editBtn.dataset.amount = transaction.amount;
+        editBtn.dataset.date = new Date(transaction.created_at).toISOString().split('T')[0];
+        editBtn.dataset.type = transaction.type;
+        editBtn.addEventListener('click', openEditModal);
+        actionsCell.appendChild(editBtn);
+
+        const deleteBtn = document.createElement('button');
+        deleteBtn.className = 'btn btn-sm btn-danger rounded-pill';
+        deleteBtn.innerHTML = '<i class="fas fa-trash-alt"></i> Delete';
+        deleteBtn.dataset.transactionId = transaction.id;
+        deleteBtn.dataset.displayCode = transaction.display_code;
+        deleteBtn.addEventListener('click', openDeleteModal);
+        actionsCell.appendChild(deleteBtn);
+
+        return row;
     }
 
     // Function to update the total balance display
@@ -139,11 +388,29 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Decode balance_history into Chart.js labels/data.
+    // Accepts both the list-of-objects format and the compact format
+    // ({encoding: 'compact', start, day_deltas, balances}) requested with ?history=compact.
+    function decodeBalanceHistory(balanceHistory) {
+        if (Array.isArray(balanceHistory)) {
+            return {
+                labels: balanceHistory.map(item => item.date),
+                data: balanceHistory.map(item => item.balance)
+            };
+        }
+        const labels = new Array(balanceHistory.day_deltas.length);
+        let time = balanceHistory.start ? Date.parse(`${balanceHistory.start}T00:00:00Z`) : 0;
+        for (let i = 0; i < balanceHistory.day_deltas.length; i++) {
+            time += balanceHistory.day_deltas[i] * 86400000; // Days to milliseconds
+            labels[i] = new Date(time).toISOString().slice(0, 10); // YYYY-MM-DD
+        }
+        return { labels: labels, data: balanceHistory.balances };
+    }
+
     // Function to update the chart
     function updateChart(balanceHistory) {
         // Prepare data for Chart.js
-        const labels = balanceHistory.map(item => item.date);
-        const data = balanceHistory.map(item => item.balance);
+        const { labels, data } = decodeBalanceHistory(balanceHistory);
 
         if (chartInstance) {
             chartInstance.destroy(); // Destroy existing chart instance if it exists
@@ -200,39 +467,58 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Render the first page of a list response (table, total balance and chart)
+    function showFirstPage(data) {
+        setTransactions(data.transactions, data.has_more);
+        updateBalanceDisplay(data.total_balance);
+        updateChart(data.balance_history); // Update the chart with historical data
+    }
+
     // Initial load of transactions (now considers activeFilters and updates chart)
     async function loadInitialTransactions() {
-        currentPage = 1;
-        const data = await fetchTransactions(currentPage, activeFilters);
+        const data = await fetchTransactions(1, activeFilters);
+        if (data) {
+            showFirstPage(data);
+        }
+    }
+
+    // Total balance and chart only, from a one-row page; the table is left alone.
+    async function refreshSummary() {
+        const data = await fetchTransactions(1, activeFilters, 1);
         if (data) {
-            renderTransactions(data.transactions);
             updateBalanceDisplay(data.total_balance);
-            hasMorePages = data.has_more;
-            loadMoreBtn.style.display = hasMorePages ? 'block' : 'none';
-            updateChart(data.balance_history); // Update the chart with historical data
-        }
-    }
-
-    // Event listener for "Load More" button (now considers activeFilters and updates chart)
-    loadMoreBtn.addEventListener('click', async () => {
-        if (hasMorePages) {
-            loadMoreBtn.disabled = true;
-            loadMoreBtn.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Loading...';
-
-            currentPage++;
-            const data = await fetchTransactions(currentPage, activeFilters);
-            if (data) {
-                renderTransactions(data.transactions, true);
-                hasMorePages = data.has_more;
-                loadMoreBtn.style.display = hasMorePages ? 'block' : 'none';
-                // Chart is only updated on initial load, not subsequent loads,
-                // as it shows overall history. If filters are applied, chart
-                // updates on 'Apply Filters' click.
-            }
-            loadMoreBtn.disabled = false;
-            loadMoreBtn.innerHTML = 'Load More';
+            updateChart(data.balance_history);
         }
-    });
+    }
+
+    // After a write: patch the loaded rows with the changed transaction and take
+    // the total and chart from the response, or reload if it can't be patched.
+    function applyWriteResponse(transaction, data) {
+        if (!applyTransactionChange(transaction)) {
+            loadInitialTransactions();
+            return;
+        }
+        updateBalanceDisplay(data.total_balance);
+        updateChart(data.balance_history);
+    }
+
+    // The server embeds the unfiltered first page in the HTML (#initialData).
+    // Render it directly instead of requesting /api/transactions/ again, and seed
+    // the response cache so the next refresh is a conditional GET.
+    function hydrateFromInitialData() {
+        const element = document.getElementById('initialData');
+        if (!element) {
+            return false;
+        }
+        const initial = JSON.parse(element.textContent);
+        responseCache.set(initial.url, {
+            etag: initial.etag,
+            lastModified: initial.last_modified,
+            data: initial.data
+        });
+        showFirstPage(initial.data);
+        return true;
+    }
 
     // Event listener for "Load Transactions from API" button
     loadApiTransactionsBtn.addEventListener('click', async () => {
@@ -312,7 +598,7 @@ document.addEventListener('DOMContentLoaded', function() {
         };
 
         try {
-            const response = await fetch('/api/transactions/', {
+            const response = await fetch('/api/transactions/?history=compact', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -342,7 +628,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 showMessageBox('Success', 'Transaction added successfully!');
                 addTransactionModal.hide();
                 addTransactionForm.reset();
-                loadInitialTransactions(); // Reload transactions and update chart
+                applyWriteResponse(data.new_transaction, data);
             }
         } catch (error) {
             console.error('Error adding transaction:', error);
@@ -401,7 +687,7 @@ document.addEventListener('DOMContentLoaded', function() {
         };
 
         try {
-            const response = await fetch(`/api/transactions/${id}/`, {
+            const response = await fetch(`/api/transactions/${id}/?history=compact`, {
                 method: 'PUT',
                 headers: {
                     'Content-Type': 'application/json',
@@ -430,7 +716,7 @@ document.addEventListener('DOMContentLoaded', function() {
             } else {
                 showMessageBox('Success', 'Transaction updated successfully!');
                 editTransactionModal.hide();
-                loadInitialTransactions(); // Reload transactions and update chart
+                applyWriteResponse(data.updated_transaction, data);
             }
         } catch (error) {
             console.error('Error updating transaction:', error);
@@ -464,7 +750,8 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             showMessageBox('Success', 'Transaction deleted successfully!');
             deleteConfirmationModal.hide();
-            loadInitialTransactions(); // Reload transactions and update chart
+            // A 204 has no body to read the new total from.
+            if (removeTransaction(Number(id))) refreshSummary(); else loadInitialTransactions();
         } catch (error) {
             console.error('Error deleting transaction:', error);
             showMessageBox('Error', `Failed to delete transaction: ${error.message}`, true);
@@ -494,6 +781,71 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
 
+    // --- Live updates (Server-Sent Events) ---
+    // The server pushes {op, rows, total_balance} whenever the ledger changes
+    // (here, in another tab, or through an import). Changes are patched into the
+    // loaded rows; a new latest transaction extends the chart, anything else
+    // refreshes it. What can't be patched triggers one debounced (conditional) reload.
+    let reloadTimer = null;
+    let summaryTimer = null;
+
+    function scheduleReload() {
+        clearTimeout(reloadTimer);
+        reloadTimer = setTimeout(loadInitialTransactions, 300);
+    }
+
+    function scheduleSummaryRefresh() {
+        clearTimeout(summaryTimer);
+        summaryTimer = setTimeout(refreshSummary, 300);
+    }
+
+    function hasActiveFilters() {
+        return Object.values(activeFilters).some(value => value);
+    }
+
+    function applyLedgerEvent(event) {
+        if (event.op === 'resync') {
+            scheduleReload();
+            return;
+        }
+        updateBalanceDisplay(event.total_balance);
+
+        const applied = event.op === 'deleted'
+            ? event.rows.every(row => removeTransaction(row.id))
+            : event.rows.every(transaction => applyTransactionChange(transaction));
+        if (!applied) {
+            scheduleReload();
+        } else if (event.op === 'added' && event.rows.length === 1 && indexOfTransaction(event.rows[0].id) === 0) {
+            // A new latest transaction: its running balance is the new total.
+            appendChartPoint(event.rows[0].created_at, event.total_balance);
+        } else {
+            scheduleSummaryRefresh();
+        }
+    }
+
+    // Extend the chart with a new end-of-day balance without rebuilding it.
+    function appendChartPoint(createdAt, balance) {
+        if (!chartInstance) return;
+        const day = new Date(createdAt).toISOString().slice(0, 10);
+        const labels = chartInstance.data.labels;
+        const values = chartInstance.data.datasets[0].data;
+        if (labels.length && labels[labels.length - 1] === day) {
+            values[values.length - 1] = parseFloat(balance);
+        } else {
+            labels.push(day);
+            values.push(parseFloat(balance));
+        }
+        chartInstance.update('none');
+    }
+
+    function connectLedgerEvents() {
+        if (!window.EventSource) return;
+        const source = new EventSource('/api/events/');
+        source.onmessage = message => applyLedgerEvent(JSON.parse(message.data));
+        // EventSource reconnects by itself after network errors. If the server
+        // doesn't offer the stream (e.g. running under WSGI) it closes for good.
+    }
+
     // Function to get CSRF token from cookies (required for Django POST/PUT/DELETE requests)
     function getCookie(name) {
         let cookieValue = null;
@@ -511,5 +863,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     // Initialize the page
-    loadInitialTransactions();
+    if (!hydrateFromInitialData()) {
+        loadInitialTransactions();
+    }
+    connectLedgerEvents();
 });
@@ -0,0 +1,89 @@
+# MoneyTrail/stored_writes.py
+"""
+Optional single-round-trip create path, enabled with settings.LEDGER_DATABASE_WRITES.
+
+The regular create runs the ledger lock, the daily-limit count, the balance check,
+the insert and the post_save handler's version bump, outbox row and checkpoint
+invalidation as separate statements, about a dozen round trips. Here one call
+to the moneytrail_create_transaction() PL/pgSQL function (migration 0012)
+does all of it under the same ledger head lock, and returns the new id with
+its running balance and the new total. The fingerprint and the category are
+computed here first, as the pre_save handlers would, with the cached rule
+matcher: the function checks the matcher's rule set version and returns
+'stale_rules' if it changed, and the call is repeated with the new rules. The
+process-wide ledger index is then handed the change as the signal handler would.
+
+The checks are the regular path's: an expense is rejected when the lowest
+balance from the new row on would end up below zero and lower than before, as
+in goes_negative(). The balance before the new row is the last balance
+checkpoint plus the rows since; when there is no checkpoint to start from, the
+function writes nothing and returns 'no_checkpoint', and the viewset takes the
+regular path while the checkpoints are rebuilt in the background. The rows after
+a backdated one are read to check their balances; past 1,000 of them it returns
+'backdated' instead, and the regular path checks them with the ledger index.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from .categories import cached_matcher, current_matcher
+from .checkpoints import schedule_checkpoint_rebuild
+from .engine import signed_cents
+from .fingerprints import fingerprint
+from .index import ledger_index
+from .models import Transaction
+
+CREATE_FUNCTION = 'moneytrail_create_transaction'
+
+
+class WriteRejected(Exception):
+    """
+    Raised when the database function refuses a write. outcome is one of
+    'non_positive_amount', 'archived' (with archive_cutoff set), 'daily_limit',
+    'insufficient_balance', and 'no_checkpoint' or 'backdated' (nothing was
+    checked; use the regular path).
+    """
+
+    def __init__(self, outcome, archive_cutoff=None):
+        super().__init__(outcome)
+        self.outcome = outcome
+        self.archive_cutoff = archive_cutoff
+
+
+def create_transaction(description, amount, transaction_type, created_at, daily_expense_limit):
+    """
+    Creates a transaction through the database function. Returns (transaction,
+    total_balance), the transaction carrying its running_balance. Raises
+    WriteRejected with nothing written when a check fails.
+    """
+    matcher = cached_matcher()
+    while True:
+        category = matcher.categorize(transaction_type, amount, description)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT * FROM {CREATE_FUNCTION}(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                [
+                    description, amount, transaction_type, created_at,
+                    fingerprint(transaction_type, amount, created_at, description),
+                    # The day the daily limit counts, as the viewset computes it.
+                    created_at.date(), daily_expense_limit,
+                    timezone.get_current_timezone_name(),
+                    category.pk if category else None,
+                    *matcher.version,
+                ]
+            )
+            outcome, pk, running_cents, total_cents, version, updated_at, archive_cutoff = cursor.fetchone()
+        if outcome != 'stale_rules':
+            break
+        matcher = current_matcher()
+    if outcome == 'no_checkpoint':
+        schedule_checkpoint_rebuild()
+    if outcome != 'ok':
+        raise WriteRejected(outcome, archive_cutoff)
+
+    transaction = Transaction(pk=pk, description=description, amount=amount, type=transaction_type, created_at=created_at, category=category)
+    transaction.running_balance = Decimal(running_cents).scaleb(-2)
+    ledger_index.apply((version, updated_at), added=[(created_at, pk, signed_cents(transaction))])
+    schedule_checkpoint_rebuild()  # The function invalidated them
+    return transaction, Decimal(total_cents).scaleb(-2)
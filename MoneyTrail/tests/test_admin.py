@@ -0,0 +1,95 @@
+import pytz
+from decimal import Decimal
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from MoneyTrail.ledger import ledger_version
+from MoneyTrail.models import Transaction, BalanceCheckpoint
+from MoneyTrail.checkpoints import ensure_checkpoints
+
+
+class TransactionAdminTest(TestCase):
+    changelist_url = '/admin/MoneyTrail/transaction/'
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+        self.salary = Transaction.objects.create(
+            description='Salary', amount=Decimal('1000.00'), type='deposit',
+            created_at=timezone.datetime(2024, 12, 30, 10, 0, 0, tzinfo=pytz.utc)
+        )
+        self.rent = Transaction.objects.create(
+            description='Rent', amount=Decimal('400.00'), type='expense',
+            created_at=timezone.datetime(2025, 1, 2, 8, 0, 0, tzinfo=pytz.utc)
+        )
+        self.refund = Transaction.objects.create(
+            description='Shop refund', amount=Decimal('30.00'), type='deposit', api_external_id='ext-7',
+            created_at=timezone.datetime(2025, 1, 3, 9, 0, 0, tzinfo=pytz.utc)
+        )
+
+    def test_date_hierarchy_probes_match_distinct_query(self):
+        queryset = Transaction.objects.all()
+        for kind in ('year', 'month', 'day'):
+            expected = list(super(type(queryset), queryset).datetimes('created_at', kind))
+            self.assertEqual(list(queryset.datetimes('created_at', kind)), expected)
+            self.assertEqual(
+                list(queryset.datetimes('created_at', kind, order='DESC')), expected[::-1]
+            )
+        self.assertEqual(Transaction.objects.none().datetimes('created_at', 'month'), [])
+
+    def test_changelist_renders_with_filters_and_search(self):
+        response = self.client.get(self.changelist_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'TRN-')
+
+        for query, expected in (
+            ({'q': f'TRN-{self.rent.id:04d}'}, [self.rent.id]),
+            ({'q': 'refund'}, [self.refund.id]),
+            ({'q': 'ext-7'}, [self.refund.id]),
+            ({'type__exact': 'deposit'}, [self.refund.id, self.salary.id]),
+            ({'created_at__year': '2025', 'created_at__month': '1'}, [self.refund.id, self.rent.id]),
+        ):
+            response = self.client.get(self.changelist_url, query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([obj.id for obj in response.context['cl'].result_list], expected, query)
+
+    def _run_action(self, action, ids, **extra):
+        data = {'action': action, ACTION_CHECKBOX_NAME: [str(pk) for pk in ids], **extra}
+        return self.client.post(self.changelist_url, data, follow=True)
+
+    def test_mark_as_expense_refreshes_derived_state_once(self):
+        ensure_checkpoints()
+        version_before = ledger_version()[0]
+
+        response = self._run_action('mark_as_expense', [self.refund.id])
+
+        self.assertContains(response, '1 transaction(s) marked as expense.')
+        self.refund.refresh_from_db()
+        self.assertEqual(self.refund.type, 'expense')
+        self.assertEqual(ledger_version()[0], version_before + 1)
+        # Checkpoints from the changed day onwards are gone; earlier ones are kept.
+        self.assertEqual(
+            list(BalanceCheckpoint.objects.values_list('day', flat=True)),
+            [timezone.datetime(2024, 12, 30).date(), timezone.datetime(2025, 1, 2).date()]
+        )
+
+    def test_bulk_change_that_would_go_negative_is_rejected(self):
+        response = self._run_action('mark_as_expense', [self.salary.id])
+        self.assertContains(response, 'would result in a negative balance')
+        self.salary.refresh_from_db()
+        self.assertEqual(self.salary.type, 'deposit')
+
+        response = self._run_action('delete_selected', [self.salary.id], post='yes')
+        self.assertContains(response, 'would result in a negative balance')
+        self.assertTrue(Transaction.objects.filter(pk=self.salary.id).exists())
+
+    def test_delete_selected_confirms_then_deletes_in_one_statement(self):
+        response = self._run_action('delete_selected', [self.rent.id, self.refund.id])
+        self.assertContains(response, '2 transactions')
+
+        version_before = ledger_version()[0]
+        response = self._run_action('delete_selected', [self.rent.id, self.refund.id], post='yes')
+        self.assertContains(response, 'Successfully deleted 2 transaction(s).')
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)), [self.salary.id])
+        self.assertEqual(ledger_version()[0], version_before + 1)
@@ -0,0 +1,70 @@
+import io
+import pytz
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.models import Transaction
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+class AnalyticsAPITest(APITestCase):
+    def setUp(self):
+        Transaction.objects.create(description='Salary', amount=Decimal('1000.00'), type='deposit', created_at=utc(2025, 1, 1, 9))
+        for day, amount in ((1, '70.00'), (3, '35.00'), (8, '14.00'), (10, '100.00')):
+            Transaction.objects.create(description='Shop', amount=Decimal(amount), type='expense', created_at=utc(2025, 1, day, 12))
+        Transaction.objects.create(description='Refund', amount=Decimal('10.00'), type='deposit', created_at=utc(2025, 1, 10, 13))
+
+    def get(self, **params):
+        return self.client.get('/api/transactions/analytics/', {'start_date': '2025-01-07', 'end_date': '2025-01-10', 'windows': '3,7', **params})
+
+    def test_rolling_windows_burn_and_runway(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['windows'], [3, 7])
+        days = {day['date']: day for day in data['days']}
+        # Every day of the range, with or without transactions.
+        self.assertEqual(list(days), ['2025-01-07', '2025-01-08', '2025-01-09', '2025-01-10'])
+
+        # The 7-day window of Jan 7 reaches back to Jan 1; the 3-day one to Jan 5.
+        self.assertEqual(Decimal(str(days['2025-01-07']['expenses_7d'])), Decimal('105.00'))
+        self.assertEqual(Decimal(str(days['2025-01-07']['deposits_7d'])), Decimal('1000.00'))
+        self.assertEqual(Decimal(str(days['2025-01-07']['expenses_3d'])), Decimal('0.00'))
+        self.assertIsNone(days['2025-01-07']['runway_days_7d'])
+
+        latest = data['latest']
+        self.assertEqual(latest['date'], '2025-01-10')
+        self.assertEqual(Decimal(str(latest['balance'])), Decimal('791.00'))
+        # Jan 4-10: 114.00 spent, 10.00 received.
+        self.assertEqual(Decimal(str(latest['expenses_7d'])), Decimal('114.00'))
+        self.assertEqual(Decimal(str(latest['burn_rate_7d'])), Decimal('16.29'))
+        self.assertEqual(Decimal(str(latest['net_burn_7d'])), Decimal('14.86'))
+        self.assertEqual(Decimal(str(latest['runway_days_7d'])), Decimal('53.2'))
+        # Jan 8-10: the same rows over three days.
+        self.assertEqual(Decimal(str(latest['runway_days_3d'])), Decimal('22.8'))
+
+    def test_archived_rows_count_and_results_are_cached_per_ledger_version(self):
+        expected = self.get().json()
+        call_command('archive_transactions', '--before', '2025-01-05', stdout=io.StringIO())
+        self.assertEqual(self.get().json()['days'], expected['days'])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.get()
+        # The ledger head for the ETag (before and after the body) and for the cache key.
+        self.assertEqual(len(queries.captured_queries), 3)
+
+        Transaction.objects.create(description='Shop', amount=Decimal('7.00'), type='expense', created_at=utc(2025, 1, 10, 18))
+        self.assertEqual(Decimal(str(self.get().json()['latest']['expenses_3d'])), Decimal('121.00'))
+
+    def test_invalid_parameters(self):
+        for params in ({'start_date': ''}, {'end_date': '2025-01-01'}, {'windows': 'week'}, {'windows': '0'}, {'windows': '1,2,3,4,5'}):
+            response = self.get(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.assertEqual(self.get(windows='').json()['windows'], [7, 30])
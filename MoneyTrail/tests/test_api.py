@@ -1,8 +1,14 @@
+import gzip
+import json
 import pytz
 from decimal import Decimal
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
+from MoneyTrail.fingerprints import fingerprint
 from MoneyTrail.models import Transaction
 # Assuming TEST_DAILY_EXPENSE_LIMIT is defined in views.py and is 2 for tests
 from MoneyTrail.views import TEST_DAILY_EXPENSE_LIMIT, TransactionViewSet
@@ -81,6 +87,25 @@ class TransactionAPITest(APITestCase):
         self.assertEqual(data['balance_history'][2]['date'], '2025-01-03')
         self.assertEqual(data['balance_history'][2]['balance'], 1150.0)
 
+    def test_list_page_size_and_history_none(self):
+        # Later pages of a larger page size, without the chart series.
+        response = self.client.get('/api/transactions/', {'page': 2, 'page_size': 2, 'history': 'none'})
+        data = response.json()
+        self.assertEqual([row['id'] for row in data['transactions']], [self.transaction1.id])
+        self.assertEqual(Decimal(str(data['transactions'][0]['running_balance'])), Decimal('1000.00'))
+        self.assertFalse(data['has_more'])
+        self.assertIsNone(data['balance_history'])
+
+        response = self.client.get('/api/transactions/', {'page_size': 1})
+        self.assertEqual(len(response.json()['transactions']), 1)
+        self.assertTrue(response.json()['has_more'])
+
+    def test_list_rejects_bad_pages(self):
+        for params in ({'page': 'two'}, {'page_size': '1.5'}, {'page': 0}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/transactions/', params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 
     def test_create_deposit_transaction(self):
@@ -260,7 +285,7 @@ class TransactionAPITest(APITestCase):
         self.assertEqual(Decimal(str(response.json()['total_balance'])), expected_total)
 
     def test_delete_transaction(self):
-        response = self.client.delete(f'/api/transactions/{self.transaction1.id}/')
+        response = self.client.delete(f'/api/transactions/{self.transaction3.id}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Transaction.objects.count(), 2)
 
@@ -270,7 +295,169 @@ class TransactionAPITest(APITestCase):
         list_data = list_response.json()
 
         # Original: 1000 (t1) - 50 (t2) + 200 (t3) = 1150
-        # Deleted t1 (1000)
-        # New total: -50 + 200 = 150
-        self.assertEqual(Decimal(str(list_data['total_balance'])), Decimal('150.00'))
+        # Deleted t3 (200)
+        # New total: 1000 - 50 = 950
+        self.assertEqual(Decimal(str(list_data['total_balance'])), Decimal('950.00'))
+
+    def test_delete_deposit_covering_earlier_expense_fails(self):
+        # Without t1 (1000) the balance after t2 would be -50. The total (150) stays
+        # positive, but the check covers every point in time.
+        response = self.client.delete(f'/api/transactions/{self.transaction1.id}/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], 'Deleting this transaction would result in a negative balance.')
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_backdated_expense_overspending_fails(self):
+        # 1150 covers it today, but on 2025-01-02 the balance was only 950.
+        data = {
+            'description': 'Backdated Laptop',
+            'amount': '1000.00',
+            'type': 'expense',
+            'created_at': '2025-01-02T15:00:00Z'
+        }
+        response = self.client.post('/api/transactions/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], 'Not enough balance. Cannot add expense.')
+
+        # Moving the deposit that covers t2 after it fails as well.
+        response = self.client.patch(f'/api/transactions/{self.transaction1.id}/', {'created_at': '2025-01-04T10:00:00Z'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], 'Updating this deposit would result in a negative balance.')
+        self.assertEqual(Transaction.objects.count(), 3)
+
+
+    def test_list_answers_conditional_get_with_304(self):
+        response = self.client.get('/api/transactions/', {'type': 'deposit'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
 
+        # Unchanged ledger: 304 after a single version lookup, no balance computation.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/transactions/', {'type': 'deposit'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        # Different query parameters get a different validator.
+        response = self.client.get('/api/transactions/', {'type': 'expense'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Any write changes the ledger version and therefore the ETag.
+        self.client.post('/api/transactions/', {'amount': '10.00', 'type': 'deposit', 'created_at': '2025-01-04'}, format='json')
+        response = self.client.get('/api/transactions/', {'type': 'deposit'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_compact_balance_history(self):
+        Transaction.objects.create(
+            description='Same-day Expense',
+            amount=Decimal('25.00'),
+            type='expense',
+            created_at=timezone.datetime(2025, 1, 3, 18, 0, 0, tzinfo=pytz.utc)
+        )
+        response = self.client.get('/api/transactions/', {'history': 'compact'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # One entry per day holding the end-of-day balance; dates are delta-encoded.
+        self.assertEqual(response.json()['balance_history'], {
+            'encoding': 'compact',
+            'start': '2025-01-01',
+            'day_deltas': [0, 1, 1],
+            'balances': [1000.0, 950.0, 1125.0],
+        })
+
+    def test_bulk_delete_by_external_id_prefix_and_filter(self):
+        Transaction.objects.create(description='Bad import', amount=Decimal('30.00'), type='expense', api_external_id='bad-1', created_at=timezone.datetime(2025, 1, 4, 9, 0, 0, tzinfo=pytz.utc))
+        Transaction.objects.create(description='Bad import', amount=Decimal('40.00'), type='expense', api_external_id='bad-2', created_at=timezone.datetime(2025, 1, 4, 10, 0, 0, tzinfo=pytz.utc))
+
+        response = self.client.post('/api/transactions/bulk-delete/', {'api_external_id_prefix': 'bad-'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['deleted'], 2)
+        self.assertEqual(Decimal(str(response.json()['total_balance'])), self.initial_total_balance)
+        self.assertEqual(len(response.json()['balance_history']), 3)
+
+        # Deleting every deposit would leave the groceries uncovered.
+        response = self.client.post('/api/transactions/bulk-delete/', {'filter': {'type': 'deposit'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], 'Deleting these transactions would result in a negative balance.')
+        self.assertEqual(Transaction.objects.count(), 3)
+
+        response = self.client.post('/api/transactions/bulk-delete/', {'filter': {'type': 'expense', 'end_date': '2025-01-02'}}, format='json')
+        self.assertEqual(response.json()['deleted'], 1)
+        self.assertEqual(Decimal(str(response.json()['total_balance'])), Decimal('1200.00'))
+
+    def test_bulk_delete_requires_one_selector(self):
+        for data in ({}, {'ids': [self.transaction3.id], 'api_external_id_prefix': '3'}, {'filter': {'history': 'compact'}}, {'ids': 'all'}):
+            with self.subTest(data=data):
+                response = self.client.post('/api/transactions/bulk-delete/', data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_bulk_update_sets_fields_in_one_statement(self):
+        ids = [self.transaction2.id, self.transaction3.id]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/transactions/bulk-update/', {'ids': ids, 'changes': {'description': 'Reviewed', 'amount': '100.00'}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['updated'], 2)
+        # The fields, fingerprints and categories are all set by one statement.
+        self.assertEqual(len([query for query in queries.captured_queries if query['sql'].startswith('UPDATE "MoneyTrail_transaction"')]), 1)
+        self.assertEqual(
+            list(Transaction.objects.filter(pk__in=ids).order_by('pk').values_list('fingerprint', flat=True)),
+            [fingerprint(t.type, t.amount, t.created_at, t.description) for t in Transaction.objects.filter(pk__in=ids).order_by('pk')]
+        )
+        # 1000 - 100 + 100
+        self.assertEqual(Decimal(str(response.json()['total_balance'])), Decimal('1000.00'))
+        self.assertEqual(
+            list(Transaction.objects.filter(pk__in=ids).order_by('pk').values_list('description', 'amount')),
+            [('Reviewed', Decimal('100.00')), ('Reviewed', Decimal('100.00'))]
+        )
+        # The list reflects the change right away.
+        list_data = self.client.get('/api/transactions/').json()
+        self.assertEqual([Decimal(str(t['running_balance'])) for t in list_data['transactions']], [Decimal('1000.00'), Decimal('900.00'), Decimal('1000.00')])
+
+        # An expense larger than the deposit before it is rejected, as are invalid or unsupported changes.
+        response = self.client.post('/api/transactions/bulk-update/', {'ids': ids, 'changes': {'amount': '1500.00'}}, format='json')
+        self.assertEqual(response.json()['detail'], 'Changing these transactions would result in a negative balance.')
+        response = self.client.post('/api/transactions/bulk-update/', {'ids': ids, 'changes': {'amount': '-5.00'}}, format='json')
+        self.assertIn('amount', response.json())
+        response = self.client.post('/api/transactions/bulk-update/', {'ids': ids, 'changes': {'created_at': '2025-01-01'}}, format='json')
+        self.assertEqual(response.json()['detail'], 'These fields cannot be bulk updated: created_at.')
+        self.assertEqual(Transaction.objects.get(pk=self.transaction2.id).amount, Decimal('100.00'))
+
+    def test_list_facets_for_the_current_filter(self):
+        Transaction.objects.create(description='February rent', amount=Decimal('300.00'), type='expense', created_at=timezone.datetime(2025, 2, 3, 9, 0, 0, tzinfo=pytz.utc))
+
+        response = self.client.get('/api/transactions/', {'facets': '1'})
+        facets = response.json()['facets']
+        self.assertEqual(facets['type'], {'deposit': {'count': 2, 'total': 1200.0}, 'expense': {'count': 2, 'total': 350.0}})
+        self.assertEqual(facets['month'], [
+            {'month': '2025-01', 'deposit': {'count': 2, 'total': 1200.0}, 'expense': {'count': 1, 'total': 50.0}},
+            {'month': '2025-02', 'deposit': {'count': 0, 'total': 0.0}, 'expense': {'count': 1, 'total': 300.0}},
+        ])
+
+        response = self.client.get('/api/transactions/', {'facets': '1', 'type': 'expense', 'start_date': '2025-01-02'})
+        self.assertEqual(response.json()['facets']['type'], {'deposit': {'count': 0, 'total': 0.0}, 'expense': {'count': 2, 'total': 350.0}})
+        # Without the option nothing extra is computed or returned.
+        self.assertNotIn('facets', self.client.get('/api/transactions/').json())
+
+    def test_list_facets_are_shared_by_pages_until_a_write(self):
+        params = {'facets': '1', 'type': 'deposit'}
+        first = self.client.get('/api/transactions/', {**params, 'page': 1}).json()['facets']
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/transactions/', {**params, 'page': 2}).json()['facets']
+        self.assertEqual(first, second)
+        self.assertFalse([q['sql'] for q in queries if 'GROUP BY' in q['sql']])
+
+        self.client.post('/api/transactions/', {'amount': '10.00', 'type': 'deposit', 'created_at': '2025-01-04'}, format='json')
+        third = self.client.get('/api/transactions/', {**params, 'page': 2}).json()['facets']
+        self.assertEqual(third['type']['deposit'], {'count': 3, 'total': 1210.0})
+
+    @override_settings(RESPONSE_COMPRESSION_MIN_BYTES=100)
+    def test_large_responses_are_compressed(self):
+        response = self.client.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['total_balance'], 1150.0)
+
+        # Below the threshold nothing is compressed.
+        with override_settings(RESPONSE_COMPRESSION_MIN_BYTES=10 ** 6):
+            response = self.client.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
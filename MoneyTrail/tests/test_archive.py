@@ -0,0 +1,111 @@
+import io
+import pytz
+from datetime import date
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.checkpoints import balance_at, balance_history_between, ensure_checkpoints
+from MoneyTrail.engine import recalculate_per_row
+from MoneyTrail.index import LedgerIndex
+from MoneyTrail.models import ArchivedTransaction, BalanceCheckpoint, OpeningBalance, Transaction
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+class ArchiveTransactionsTest(APITestCase):
+    def setUp(self):
+        rows = [
+            ('Salary', '1000.00', 'deposit', utc(2025, 1, 1, 10)),
+            ('Rent', '400.00', 'expense', utc(2025, 1, 2, 8)),
+            ('Coffee', '3.50', 'expense', utc(2025, 1, 2, 9)),
+            ('Bonus', '200.00', 'deposit', utc(2025, 2, 1, 12)),
+            ('Groceries', '50.00', 'expense', utc(2025, 2, 3, 18)),
+        ]
+        self.transactions = [
+            Transaction.objects.create(description=description, amount=Decimal(amount), type=transaction_type, created_at=created_at)
+            for description, amount, transaction_type, created_at in rows
+        ]
+        # Running balances and history before archiving, for comparison.
+        self.expected_total, expected_rows, self.expected_history = recalculate_per_row()
+        self.expected_rows = [(t.id, t.running_balance) for t in expected_rows]
+
+    def archive(self, *args):
+        out = io.StringIO()
+        call_command('archive_transactions', *args, stdout=out)
+        return out.getvalue()
+
+    def test_archiving_moves_rows_and_carries_the_balance_forward(self):
+        # A batch size of 1 moves the rows one day at a time.
+        self.assertIn('Archived 3 transactions before 2025-02-01.', self.archive('--before', '2025-02-01', '--batch-size', '1'))
+
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(
+            sorted(ArchivedTransaction.objects.values_list('id', flat=True)),
+            [t.id for t in self.transactions[:3]]
+        )
+        opening = OpeningBalance.objects.get()
+        self.assertEqual((opening.cutoff_day, opening.balance, opening.transaction_count), (date(2025, 2, 1), Decimal('596.50'), 3))
+
+        index = LedgerIndex()
+        index.load()
+        self.assertEqual(index.total_cents(), 74650)
+        self.assertEqual(index.running_cents(utc(2025, 2, 1, 12), self.transactions[3].pk), 79650)
+
+        # Point-in-time and range queries still cover the archived days.
+        BalanceCheckpoint.objects.all().delete()
+        ensure_checkpoints()
+        self.assertEqual(balance_at(utc(2025, 1, 2, 8, 30)), Decimal('600.00'))
+        self.assertEqual(balance_at(utc(2025, 2, 2)), Decimal('796.50'))
+        self.assertEqual(balance_history_between(date(2025, 1, 2), date(2025, 2, 1))[:2], (Decimal('1000.00'), Decimal('796.50')))
+
+    def test_list_reads_the_archive_only_past_the_cutoff(self):
+        self.archive('--before', '2025-02-01')
+
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(str(response.data['total_balance'])), self.expected_total)
+        self.assertEqual(
+            [(t['id'], Decimal(str(t['running_balance']))) for t in response.data['transactions']],
+            self.expected_rows
+        )
+        self.assertEqual(response.data['transactions'][2]['display_code'], f'TRN-{self.transactions[2].id:04d}')
+        # The chart starts from the opening balance at the cutoff.
+        self.assertEqual(response.data['balance_history'], self.expected_history[3:])
+
+        response = self.client.get('/api/transactions/', {'type': 'expense', 'end_date': '2025-01-31'})
+        self.assertEqual([t['description'] for t in response.data['transactions']], ['Coffee', 'Rent'])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/transactions/', {'start_date': '2025-02-01'})
+        self.assertEqual([t['description'] for t in response.data['transactions']], ['Groceries', 'Bonus'])
+        self.assertFalse(response.data['has_more'])
+        self.assertFalse([q['sql'] for q in queries if ArchivedTransaction._meta.db_table in q['sql']])
+
+    def test_writes_before_the_cutoff_are_rejected(self):
+        self.archive('--before', '2025-02-01')
+
+        response = self.client.post('/api/transactions/', {
+            'description': 'Late receipt', 'amount': '5.00', 'type': 'deposit', 'created_at': '2025-01-15T10:00:00Z'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Transactions before the archive cutoff (2025-02-01) cannot be added or changed.')
+
+        # The opening balance counts towards the sufficient-balance check.
+        response = self.client.post('/api/transactions/', {
+            'description': 'Laptop', 'amount': '700.00', 'type': 'expense', 'created_at': '2025-02-04T10:00:00Z'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(str(response.data['total_balance'])), Decimal('46.50'))
+
+    def test_cutoff_cannot_move_back(self):
+        self.archive('--before', '2025-02-01')
+        with self.assertRaisesMessage(CommandError, 'The archive already reaches 2025-02-01; the cutoff cannot be moved back.'):
+            self.archive('--before', '2025-01-02')
+        self.assertIn('Would archive 1 transactions before 2025-02-02 (net 200.00).', self.archive('--before', '2025-02-02', '--dry-run'))
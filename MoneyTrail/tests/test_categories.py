@@ -0,0 +1,164 @@
+import io
+import pytz
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from MoneyTrail import categories
+from MoneyTrail.bulk import bulk_update_transactions
+from MoneyTrail.checkpoints import ensure_checkpoints
+from MoneyTrail.categories import CategoryMatcher, bump_rules_version, current_matcher, recategorize
+from MoneyTrail.ledger import ledger_version, serialized_write
+from MoneyTrail.models import ArchivedTransaction, Category, CategoryRule, Transaction
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+class CategoryTestCase(TestCase):
+    def setUp(self):
+        self.transport = Category.objects.create(name='Transport')
+        self.food = Category.objects.create(name='Food')
+        self.income = Category.objects.create(name='Income')
+        self.large = Category.objects.create(name='Large purchases')
+        CategoryRule.objects.create(category=self.transport, kind='keyword', pattern='uber', priority=10)
+        CategoryRule.objects.create(category=self.food, kind='regex', pattern=r'uber\s*eats|grocer(y|ies)', priority=5)
+        CategoryRule.objects.create(category=self.income, type='deposit', pattern='salary')
+        CategoryRule.objects.create(category=self.large, type='expense', min_amount=Decimal('500.00'), priority=200)
+
+
+class CategoryMatcherTest(CategoryTestCase):
+    def test_first_matching_rule_by_priority_wins(self):
+        matcher = current_matcher()
+        self.assertEqual(matcher.categorize('expense', Decimal('12.00'), 'Uber trip'), self.transport)
+        self.assertEqual(matcher.categorize('expense', Decimal('12.00'), 'UBER Eats order'), self.food)
+        self.assertEqual(matcher.categorize('expense', Decimal('80.00'), 'Weekly groceries'), self.food)
+        # Keywords match whole words only.
+        self.assertIsNone(matcher.categorize('expense', Decimal('12.00'), 'Tuberculosis test'))
+        # Type and amount range.
+        self.assertEqual(matcher.categorize('deposit', Decimal('3000.00'), 'Salary June'), self.income)
+        self.assertIsNone(matcher.categorize('expense', Decimal('30.00'), 'Salary advance fee'))
+        self.assertEqual(matcher.categorize('expense', Decimal('500.00'), 'New laptop'), self.large)
+        self.assertIsNone(matcher.categorize('expense', Decimal('499.99'), 'New laptop'))
+        self.assertIsNone(matcher.categorize('deposit', Decimal('10.00'), None))
+
+    def test_matcher_is_recompiled_when_the_rules_change(self):
+        matcher = current_matcher()
+        self.assertIs(current_matcher(), matcher)
+        CategoryRule.objects.create(category=self.food, pattern='bakery')
+        self.assertIsNot(current_matcher(), matcher)
+        self.assertEqual(current_matcher().categorize('expense', Decimal('4.00'), 'Bakery'), self.food)
+
+    def test_serialized_writes_use_the_version_read_with_the_ledger_lock(self):
+        matcher = current_matcher()
+        with patch('MoneyTrail.categories.rules_version', wraps=categories.rules_version) as version:
+            self.assertIs(serialized_write(current_matcher)(), matcher)
+            CategoryRule.objects.create(category=self.food, pattern='bakery')
+            self.assertIsNot(serialized_write(current_matcher)(), matcher)
+        self.assertEqual(version.call_count, 0)
+
+    def test_invalid_patterns_are_rejected(self):
+        for kind, pattern in (('regex', '(unclosed'), ('keyword', '!!')):
+            rule = CategoryRule(category=self.food, kind=kind, pattern=pattern)
+            with self.assertRaises(ValidationError):
+                rule.full_clean()
+        rule = CategoryRule(category=self.food, min_amount=Decimal('10.00'), max_amount=Decimal('5.00'))
+        with self.assertRaises(ValidationError):
+            rule.full_clean()
+        # Keywords of several words match them in sequence, whatever the punctuation.
+        matcher = CategoryMatcher([CategoryRule(category=self.food, pattern='fish & chips')])
+        self.assertEqual(matcher.categorize('expense', 1, 'FISH-CHIPS shop'), self.food)
+        self.assertIsNone(matcher.categorize('expense', 1, 'chips and fish'))
+
+
+class CategorizedWritesTest(CategoryTestCase):
+    def test_saves_bulk_updates_and_archiving_keep_the_category(self):
+        Transaction.objects.create(description='Salary', amount=Decimal('2000.00'), type='deposit', created_at=utc(2025, 1, 1))
+        ride = Transaction.objects.create(description='Uber', amount=Decimal('15.00'), type='expense', created_at=utc(2025, 1, 2))
+        self.assertEqual(Transaction.objects.get(pk=ride.pk).category, self.transport)
+        ride.description = 'Uber Eats'
+        ride.save()
+        self.assertEqual(Transaction.objects.get(pk=ride.pk).category, self.food)
+
+        bulk_update_transactions(Transaction.objects.filter(pk=ride.pk), {'amount': Decimal('600.00'), 'description': 'Sofa'})
+        self.assertEqual(Transaction.objects.get(pk=ride.pk).category, self.large)
+
+        call_command('archive_transactions', '--before', '2025-01-10', stdout=io.StringIO())
+        self.assertEqual(ArchivedTransaction.objects.get(pk=ride.pk).category, self.large)
+
+    @patch('requests.get')
+    def test_imports_are_categorized_with_one_rule_set_lookup(self, mock_get):
+        CategoryRule.objects.create(category=self.income, kind='regex', pattern='^deposit from api$')
+        mock_get.return_value.json.return_value = [
+            {'createdAt': f'2025-06-{day:02d}T10:00:00.000Z', 'amount': 10 + day, 'type': 'deposit', 'id': str(day)} for day in range(1, 6)
+        ]
+        with patch('MoneyTrail.categories.rules_version', wraps=categories.rules_version) as version:
+            call_command('fetch_transactions', stdout=io.StringIO())
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual(set(Transaction.objects.values_list('category__name', flat=True)), {'Income'})
+
+    def test_rule_changes_recategorize_in_chunks(self):
+        for day in range(1, 6):
+            Transaction.objects.create(description=f'Bakery {day}', amount=Decimal('4.00'), type='expense', created_at=utc(2025, 1, day))
+        Transaction.objects.create(description='Uber', amount=Decimal('9.00'), type='expense', created_at=utc(2025, 1, 6))
+        self.assertFalse(Transaction.objects.filter(description__startswith='Bakery', category__isnull=False).exists())
+
+        # The change schedules a background run once it commits.
+        with self.captureOnCommitCallbacks() as callbacks:
+            CategoryRule.objects.create(category=self.food, pattern='bakery')
+        self.assertEqual(len(callbacks), 1)
+
+        version = ledger_version()[0]
+        self.assertEqual(recategorize(chunk_size=2), (6, 5))
+        self.assertEqual(Transaction.objects.filter(category=self.food).count(), 5)
+        # One version bump per chunk that changed rows.
+        self.assertEqual(ledger_version()[0], version + 3)
+        self.assertEqual(recategorize(chunk_size=2), (6, 0))
+
+        out = io.StringIO()
+        self.food.delete()
+        call_command('recategorize_transactions', stdout=out)
+        self.assertIn('Recategorized 0 of 6 transactions', out.getvalue())
+        self.assertFalse(Transaction.objects.filter(description__startswith='Bakery', category__isnull=False).exists())
+
+
+class CategoryAPITest(APITestCase):
+    def setUp(self):
+        self.food = Category.objects.create(name='Food')
+        CategoryRule.objects.create(category=self.food, pattern='coffee')
+        Transaction.objects.create(description='Salary', amount=Decimal('100.00'), type='deposit', created_at=utc(2025, 1, 1))
+
+    def check_create_and_filter(self):
+        response = self.client.post('/api/transactions/', {'description': 'Coffee beans', 'amount': '7.00', 'type': 'expense'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['new_transaction']['category'], 'Food')
+
+        response = self.client.get('/api/transactions/', {'category': 'Food'})
+        self.assertEqual([row['description'] for row in response.json()['transactions']], ['Coffee beans'])
+        response = self.client.get('/api/transactions/', {'category': 'none'})
+        self.assertEqual([(row['description'], row['category']) for row in response.json()['transactions']], [('Salary', None)])
+
+    def test_created_transactions_are_categorized_and_filterable(self):
+        self.check_create_and_filter()
+
+    @override_settings(LEDGER_DATABASE_WRITES=True)
+    def test_database_writes_are_categorized(self):
+        self.check_create_and_filter()
+
+    @override_settings(LEDGER_DATABASE_WRITES=True)
+    def test_database_writes_are_repeated_when_the_rules_changed(self):
+        ensure_checkpoints()
+        self.assertEqual(current_matcher().categorize('expense', 1, 'Coffee beans'), self.food)
+        # Another process changes the rules: this one's matcher is now stale.
+        CategoryRule.objects.filter(category=self.food).update(pattern='tea')
+        bump_rules_version()
+        with patch('MoneyTrail.stored_writes.current_matcher', wraps=categories.current_matcher) as reload:
+            response = self.client.post('/api/transactions/', {'description': 'Coffee beans', 'amount': '7.00', 'type': 'expense'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(reload.call_count, 1)
+        self.assertIsNone(response.json()['new_transaction']['category'])
+        self.assertIsNone(Transaction.objects.get(description='Coffee beans').category)
@@ -0,0 +1,114 @@
+import pytz
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.checkpoints import balance_at, balance_history_between, ensure_checkpoints
+from MoneyTrail.models import Transaction, BalanceCheckpoint
+
+
+class BalanceCheckpointTest(APITestCase):
+    def setUp(self):
+        self.deposit = Transaction.objects.create(
+            description='Salary', amount=Decimal('1000.00'), type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 10, 0, 0, tzinfo=pytz.utc)
+        )
+        self.rent = Transaction.objects.create(
+            description='Rent', amount=Decimal('400.00'), type='expense',
+            created_at=timezone.datetime(2025, 1, 2, 8, 0, 0, tzinfo=pytz.utc)
+        )
+        self.groceries = Transaction.objects.create(
+            description='Groceries', amount=Decimal('50.00'), type='expense',
+            created_at=timezone.datetime(2025, 1, 2, 18, 0, 0, tzinfo=pytz.utc)
+        )
+        self.bonus = Transaction.objects.create(
+            description='Bonus', amount=Decimal('200.00'), type='deposit',
+            created_at=timezone.datetime(2025, 1, 5, 12, 0, 0, tzinfo=pytz.utc)
+        )
+
+    def test_checkpoints_hold_end_of_day_balances(self):
+        self.assertEqual(ensure_checkpoints(), 3)
+        checkpoints = list(BalanceCheckpoint.objects.values_list('day', 'balance', 'transaction_count'))
+        self.assertEqual(checkpoints, [
+            (timezone.datetime(2025, 1, 1).date(), Decimal('1000.00'), 1),
+            (timezone.datetime(2025, 1, 2).date(), Decimal('550.00'), 3),
+            (timezone.datetime(2025, 1, 5).date(), Decimal('750.00'), 4),
+        ])
+        # Nothing to rebuild on the second call.
+        self.assertEqual(ensure_checkpoints(), 0)
+
+    def test_balance_at_uses_checkpoint_plus_same_day_tail(self):
+        self.assertEqual(balance_at(timezone.datetime(2024, 12, 31, tzinfo=pytz.utc)), Decimal('0.00'))
+        self.assertEqual(balance_at(timezone.datetime(2025, 1, 2, 12, 0, 0, tzinfo=pytz.utc)), Decimal('600.00'))
+        self.assertEqual(balance_at(timezone.datetime(2025, 1, 4, tzinfo=pytz.utc)), Decimal('550.00'))
+        self.assertEqual(balance_at(timezone.datetime(2025, 2, 1, tzinfo=pytz.utc)), Decimal('750.00'))
+
+    def test_backdated_edit_invalidates_only_later_checkpoints(self):
+        ensure_checkpoints()
+        first_checkpoint_pk = BalanceCheckpoint.objects.get(day='2025-01-01').pk
+
+        groceries = Transaction.objects.get(pk=self.groceries.pk)
+        groceries.amount = Decimal('150.00')
+        groceries.save()
+
+        self.assertEqual(list(BalanceCheckpoint.objects.values_list('pk', flat=True)), [first_checkpoint_pk])
+        self.assertEqual(balance_at(timezone.datetime(2025, 1, 3, tzinfo=pytz.utc)), Decimal('450.00'))
+        self.assertEqual(BalanceCheckpoint.objects.get(day='2025-01-01').pk, first_checkpoint_pk)
+
+    def test_reads_fill_in_missing_checkpoints_without_locking_and_writes_schedule_a_rebuild(self):
+        ensure_checkpoints()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Transaction.objects.create(
+                description='Refund', amount=Decimal('25.00'), type='deposit',
+                created_at=timezone.datetime(2025, 1, 2, 9, 0, 0, tzinfo=pytz.utc)
+            )
+        # The rebuild is scheduled for when the write commits, next to the ledger index update.
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(BalanceCheckpoint.objects.count(), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(balance_at(timezone.datetime(2025, 1, 4, tzinfo=pytz.utc)), Decimal('575.00'))
+            self.assertEqual(balance_history_between(timezone.datetime(2025, 1, 2).date(), timezone.datetime(2025, 1, 5).date()), (
+                Decimal('1000.00'), Decimal('775.00'),
+                [{'date': '2025-01-02', 'balance': 575.0}, {'date': '2025-01-05', 'balance': 775.0}],
+            ))
+        statements = [query['sql'].split()[0] for query in queries.captured_queries]
+        self.assertEqual(set(statements), {'SELECT'})
+        self.assertFalse(any('FOR UPDATE' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(BalanceCheckpoint.objects.count(), 1)
+
+        # What the scheduled background run does.
+        self.assertEqual(ensure_checkpoints(), 2)
+
+    def test_moving_a_transaction_earlier_invalidates_from_the_old_or_new_day(self):
+        ensure_checkpoints()
+        bonus = Transaction.objects.get(pk=self.bonus.pk)
+        bonus.created_at = timezone.datetime(2025, 1, 1, 12, 0, 0, tzinfo=pytz.utc)
+        bonus.save()
+
+        self.assertFalse(BalanceCheckpoint.objects.exists())
+        self.assertEqual(balance_at(timezone.datetime(2025, 1, 1, 23, 0, 0, tzinfo=pytz.utc)), Decimal('1200.00'))
+
+    def test_balance_at_endpoint(self):
+        response = self.client.get('/api/transactions/balance-at/', {'at': '2025-01-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(str(response.json()['balance'])), Decimal('550.00'))
+
+        response = self.client.get('/api/transactions/balance-at/', {'at': '2025-01-02T09:00:00Z'})
+        self.assertEqual(Decimal(str(response.json()['balance'])), Decimal('600.00'))
+
+        response = self.client.get('/api/transactions/balance-at/', {'at': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_balance_range_endpoint(self):
+        response = self.client.get('/api/transactions/balance-range/', {'start_date': '2025-01-02', 'end_date': '2025-01-04'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(Decimal(str(data['opening_balance'])), Decimal('1000.00'))
+        self.assertEqual(Decimal(str(data['closing_balance'])), Decimal('550.00'))
+        self.assertEqual(data['balance_history'], [{'date': '2025-01-02', 'balance': 550.0}])
+
+        response = self.client.get('/api/transactions/balance-range/', {'start_date': '2025-01-05', 'end_date': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,15 @@
 import io
 import re
 import requests
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
 from unittest.mock import patch
 from django.core.management import call_command
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from MoneyTrail.bulk import bulk_update_transactions
+from MoneyTrail.fingerprints import fingerprint
+from MoneyTrail.importing import TRANSACTION_TYPE_VALUES, parse_created_at, validate_chunk, validate_record, validate_records
+from MoneyTrail.ledger import lock_ledger
 from MoneyTrail.models import Transaction
 from django.core.management.base import CommandError
 
@@ -83,3 +89,103 @@ class FetchTransactionsCommandTest(TestCase):
 
         self.assertEqual(Transaction.objects.count(), 0)
 
+
+    @patch('requests.get')
+    def test_command_reports_duplicates_without_matching_external_ids(self, mock_get):
+        # Entered by hand, then re-issued by the API under new ids.
+        manual = Transaction.objects.create(description='Deposit from API', amount=Decimal('75.80'), type='deposit', created_at=datetime(2025, 6, 26, 9, 15, tzinfo=dt_timezone.utc))
+        mock_get.return_value.json.return_value = [
+            {"createdAt": "2025-06-27T12:00:00.000Z", "amount": 20.00, "type": "expense", "id": "14"},
+            {"createdAt": "2025-06-27T18:00:00.000Z", "amount": 20.00, "type": "expense", "id": "13"},
+            {"createdAt": "2025-06-27T08:00:00.000Z", "amount": 75.80, "type": "deposit", "id": "12"},
+            {"createdAt": "2025-06-26T21:00:00.000Z", "amount": 75.80, "type": "deposit", "id": "11"},
+        ]
+
+        out = io.StringIO()
+        call_command('fetch_transactions', stdout=out)
+        captured_output = strip_ansi_codes(out.getvalue())
+        self.assertIn(f'Skipping suspected duplicate API transaction: API-11 (same as TRN-{manual.id:04d})', captured_output)
+        self.assertIn(f'Possible near-duplicate API transaction: API-12 (compare with TRN-{manual.id:04d})', captured_output)
+        # Same content, but both records have ids and they differ: two payments, reported and added.
+        self.assertIn('Possible lookalike API transaction: API-14 (compare with an earlier record of this import)', captured_output)
+        self.assertIn('Suspected duplicates (3): API-11, API-12, API-14', captured_output)
+        self.assertIn('Finished fetching and saving dummy transactions. Added: 3, Skipped: 1', captured_output)
+        self.assertEqual(set(Transaction.objects.exclude(pk=manual.pk).values_list('api_external_id', flat=True)), {'12', '13', '14'})
+
+        out = io.StringIO()
+        call_command('fetch_transactions', '--keep-duplicates', stdout=out)
+        captured_output = strip_ansi_codes(out.getvalue())
+        self.assertIn('Skipping duplicate API transaction: API-12', captured_output)
+        self.assertIn('Possible duplicate API transaction: API-11', captured_output)
+        self.assertIn('Finished fetching and saving dummy transactions. Added: 1, Skipped: 3', captured_output)
+
+    @patch('requests.get')
+    def test_command_reports_lookalikes_of_imported_transactions(self, mock_get):
+        earlier = Transaction.objects.create(api_external_id='7', description='Expense from API', amount=Decimal('20.00'), type='expense', created_at=datetime(2025, 6, 27, 9, tzinfo=dt_timezone.utc))
+        mock_get.return_value.json.return_value = [
+            {"createdAt": "2025-06-27T15:00:00.000Z", "amount": 20.00, "type": "expense", "id": "8"},
+        ]
+
+        out = io.StringIO()
+        call_command('fetch_transactions', stdout=out)
+        captured_output = strip_ansi_codes(out.getvalue())
+        self.assertIn(f'Possible lookalike API transaction: API-8 (compare with TRN-{earlier.id:04d})', captured_output)
+        self.assertTrue(Transaction.objects.filter(api_external_id='8').exists())
+
+    @patch('requests.get')
+    def test_command_writes_each_chunk_under_the_ledger_lock(self, mock_get):
+        mock_get.return_value.json.return_value = [
+            {"createdAt": f"2025-06-{day:02d}T12:00:00.000Z", "amount": 10.00, "type": "deposit", "id": str(day)} for day in range(1, 6)
+        ]
+
+        with patch('MoneyTrail.management.commands.fetch_transactions.DUPLICATE_CHECK_CHUNK_SIZE', 2), \
+                patch('MoneyTrail.management.commands.fetch_transactions.lock_ledger', wraps=lock_ledger) as lock:
+            call_command('fetch_transactions', stdout=io.StringIO())
+        self.assertEqual(lock.call_count, 3)
+        # Oldest first, so ids follow the API's order.
+        self.assertEqual(list(Transaction.objects.order_by('id').values_list('api_external_id', flat=True)), ['5', '4', '3', '2', '1'])
+
+    def test_fingerprint_follows_edits(self):
+        salary = Transaction.objects.create(description='Salary', amount=Decimal('1000.00'), type='deposit', created_at=datetime(2025, 6, 1, 9, tzinfo=dt_timezone.utc))
+        self.assertEqual(salary.fingerprint, fingerprint('deposit', Decimal('1000'), salary.created_at, ' SALARY!'))
+        bulk_update_transactions(Transaction.objects.filter(pk=salary.pk), {'description': 'June salary'})
+        salary.refresh_from_db()
+        self.assertEqual(salary.fingerprint, fingerprint('deposit', Decimal('1000.00'), salary.created_at, 'june  salary'))
+        self.assertNotEqual(salary.fingerprint, fingerprint('deposit', Decimal('1000.00'), salary.created_at, 'Salary', day_offset=1))
+        # Amounts are rounded half up to cents, as for balances, not truncated.
+        self.assertEqual(fingerprint('deposit', 19.995, salary.created_at, 'Refund'), fingerprint('deposit', Decimal('20.00'), salary.created_at, 'Refund'))
+
+
+class ImportValidationTest(SimpleTestCase):
+    def test_type_set_matches_model_choices(self):
+        self.assertEqual(TRANSACTION_TYPE_VALUES, {choice[0] for choice in Transaction.TRANSACTION_TYPES})
+
+    def test_fast_path_and_dateutil_fallback_parse_the_same_instant(self):
+        iso = parse_created_at('2025-06-27T12:52:58.669Z')
+        odd = parse_created_at('27 Jun 2025 12:52:58.669 UTC')
+        self.assertEqual(iso, odd)
+        self.assertEqual(iso, datetime(2025, 6, 27, 12, 52, 58, 669000, tzinfo=dt_timezone.utc))
+        with self.assertRaises(ValueError):
+            parse_created_at('not a date')
+
+    def test_validate_record_messages(self):
+        self.assertEqual(
+            validate_record({'id': '1', 'amount': 41.42, 'type': 'expense', 'createdAt': '2025-06-27T12:52:58.669Z'})[0][:4],
+            ('1', 'Expense from API', Decimal('41.42'), 'expense')
+        )
+        for data, warning in (
+            ({'id': '2', 'amount': 5}, "Skipping transaction due to missing data: {'id': '2', 'amount': 5}"),
+            ({'id': '3', 'amount': 'x', 'type': 'expense', 'createdAt': '2025-06-27'}, 'Skipping transaction 3 due to invalid amount format: x'),
+            ({'id': '4', 'amount': -1, 'type': 'expense', 'createdAt': '2025-06-27'}, 'Skipping transaction 4 due to non-positive amount: -1'),
+            ({'id': '5', 'amount': 1, 'type': 'transfer', 'createdAt': '2025-06-27'}, 'Skipping transaction 5 due to invalid type: transfer'),
+            ({'id': '6', 'amount': 1, 'type': 'deposit', 'createdAt': 'soon'}, 'Skipping transaction 6 due to invalid date format: soon'),
+        ):
+            self.assertEqual(validate_record(data), (None, warning))
+
+    def test_process_pool_keeps_record_order(self):
+        records = [
+            {'id': str(i), 'amount': i % 7, 'type': 'deposit', 'createdAt': f'2025-01-{i % 28 + 1:02d}T10:00:00Z'}
+            for i in range(60)
+        ]
+        with patch('MoneyTrail.importing.PARALLEL_MIN_RECORDS', 10), patch('MoneyTrail.importing.CHUNK_SIZE', 7):
+            self.assertEqual(validate_records(records, workers=2), validate_chunk(records))
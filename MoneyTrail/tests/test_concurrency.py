@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+import unittest
+import pytz
+from decimal import Decimal
+from unittest.mock import patch
+from django.db import connection, transaction as db_transaction, OperationalError
+from django.test import TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from MoneyTrail.index import ledger_index, ledger_snapshot
+from MoneyTrail.ledger import serialized_write
+from MoneyTrail.models import Transaction
+from MoneyTrail.views import TEST_DAILY_EXPENSE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+def join_background_jobs():
+    # Committed writes start the checkpoint rebuild in a background thread; let
+    # it finish before the test database is flushed under it.
+    for thread in threading.enumerate():
+        if thread.name == 'rebuild-checkpoints':
+            thread.join(10)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Row locking needs PostgreSQL')
+class ConcurrentWriteStressTest(TransactionTestCase):
+    # TransactionTestCase so every thread commits through its own DB connection,
+    # exactly like concurrent requests in production.
+
+    def tearDown(self):
+        join_background_jobs()
+
+    def _post_concurrently(self, payloads):
+        """
+        Fires one POST per payload from its own thread, all released at the same time.
+        Returns the list of status codes, and logs the throughput of the serialized writes.
+        """
+        barrier = threading.Barrier(len(payloads))
+        status_codes = [None] * len(payloads)
+
+        def worker(index, payload):
+            client = APIClient()
+            try:
+                barrier.wait()
+                response = client.post('/api/transactions/', payload, format='json')
+                status_codes[index] = response.status_code
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i, p)) for i, p in enumerate(payloads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        logger.info(
+            '%d concurrent writes (%d created) in %.3fs: %.0f writes/sec',
+            len(payloads), status_codes.count(status.HTTP_201_CREATED), elapsed, len(payloads) / elapsed
+        )
+        return status_codes
+
+    def _total_balance(self):
+        total = Decimal('0.00')
+        for trans in Transaction.objects.all():
+            total += trans.amount if trans.type == 'deposit' else -trans.amount
+        return total
+
+    def test_concurrent_expenses_never_overdraw(self):
+        Transaction.objects.create(
+            description='Initial Deposit',
+            amount=Decimal('100.00'),
+            type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 9, 0, 0, tzinfo=pytz.utc)
+        )
+        # 20 expenses of 10.00 on 20 different days: only 10 fit into the balance.
+        payloads = [
+            {'description': f'Expense {i}', 'amount': '10.00', 'type': 'expense',
+             'created_at': f'2025-02-{i + 1:02d}T12:00:00Z'}
+            for i in range(20)
+        ]
+        status_codes = self._post_concurrently(payloads)
+
+        self.assertEqual(status_codes.count(status.HTTP_201_CREATED), 10)
+        self.assertEqual(status_codes.count(status.HTTP_400_BAD_REQUEST), 10)
+        self.assertEqual(self._total_balance(), Decimal('0.00'))
+
+    def test_concurrent_expenses_respect_daily_limit(self):
+        Transaction.objects.create(
+            description='Initial Deposit',
+            amount=Decimal('10000.00'),
+            type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 9, 0, 0, tzinfo=pytz.utc)
+        )
+        # 6 expenses per day on 4 days; balance is never the limiting factor.
+        payloads = [
+            {'description': f'Expense {i}', 'amount': '10.00', 'type': 'expense',
+             'created_at': f'2025-03-{i % 4 + 1:02d}T{i // 4 + 10:02d}:00:00Z'}
+            for i in range(24)
+        ]
+        status_codes = self._post_concurrently(payloads)
+
+        self.assertEqual(status_codes.count(status.HTTP_201_CREATED), 4 * TEST_DAILY_EXPENSE_LIMIT)
+        for day in range(1, 5):
+            count = Transaction.objects.filter(
+                type='expense',
+                created_at__date=timezone.datetime(2025, 3, day).date()
+            ).count()
+            self.assertEqual(count, TEST_DAILY_EXPENSE_LIMIT)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Row locking needs PostgreSQL')
+class UncommittedWriteTest(TransactionTestCase):
+
+    def tearDown(self):
+        join_background_jobs()
+
+    def test_readers_never_see_a_write_before_it_commits(self):
+        Transaction.objects.create(
+            description='Salary', amount=Decimal('110.00'), type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 9, 0, 0, tzinfo=pytz.utc)
+        )
+        ledger_index.current()
+        written, release = threading.Event(), threading.Event()
+        created = []
+
+        def writer():
+            # The signal handler hands the expense to the process-wide index,
+            # which applies it once this transaction commits.
+            try:
+                with db_transaction.atomic():
+                    created.append(Transaction.objects.create(
+                        description='Groceries', amount=Decimal('40.00'), type='expense',
+                        created_at=timezone.datetime(2025, 1, 2, 9, 0, 0, tzinfo=pytz.utc)
+                    ))
+                    written.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        with patch.object(ledger_index, 'load', wraps=ledger_index.load) as load:
+            thread = threading.Thread(target=writer)
+            thread.start()
+            try:
+                self.assertTrue(written.wait(10))
+                snapshot = ledger_snapshot()
+                response = APIClient().get('/api/transactions/')
+            finally:
+                release.set()
+                thread.join()
+
+            self.assertEqual(snapshot.total_balance, Decimal('110.00'))
+            self.assertNotIn(created[0].pk, list(snapshot.ids))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(Decimal(str(response.json()['total_balance'])), Decimal('110.00'))
+            self.assertEqual(len(response.json()['transactions']), 1)
+            # Committed now: every reader gets it, without reloading the ledger.
+            self.assertEqual(ledger_snapshot().total_balance, Decimal('70.00'))
+            load.assert_not_called()
+
+
+class SerializedWriteRetryTest(TransactionTestCase):
+
+    def test_retries_on_serialization_failure(self):
+        class FakePgError(Exception):
+            pgcode = '40001'
+
+        calls = []
+
+        @serialized_write
+        def flaky_write():
+            calls.append(1)
+            if len(calls) == 1:
+                error = OperationalError('could not serialize access')
+                error.__cause__ = FakePgError()
+                raise error
+            return 'written'
+
+        self.assertEqual(flaky_write(), 'written')
+        self.assertEqual(len(calls), 2)
+
+    def test_does_not_retry_other_errors(self):
+        calls = []
+
+        @serialized_write
+        def broken_write():
+            calls.append(1)
+            raise OperationalError('connection lost')
+
+        with self.assertRaises(OperationalError):
+            broken_write()
+        self.assertEqual(len(calls), 1)
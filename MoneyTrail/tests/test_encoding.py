@@ -0,0 +1,26 @@
+from django.test import SimpleTestCase
+from MoneyTrail.encoding import compact_balance_history, expand_balance_history
+
+
+class CompactBalanceHistoryTest(SimpleTestCase):
+    def test_round_trip_keeps_end_of_day_balances(self):
+        history = [
+            {'date': '2024-12-30', 'balance': 100.0},
+            {'date': '2024-12-30', 'balance': 80.0},
+            {'date': '2025-01-02', 'balance': 120.5},
+            {'date': '2025-03-01', 'balance': 20.0},
+        ]
+        compact = compact_balance_history(history)
+        self.assertEqual(compact['start'], '2024-12-30')
+        self.assertEqual(compact['day_deltas'], [0, 3, 58])
+        self.assertEqual(compact['balances'], [80.0, 120.5, 20.0])
+        self.assertEqual(expand_balance_history(compact), [
+            {'date': '2024-12-30', 'balance': 80.0},
+            {'date': '2025-01-02', 'balance': 120.5},
+            {'date': '2025-03-01', 'balance': 20.0},
+        ])
+
+    def test_empty_history(self):
+        compact = compact_balance_history([])
+        self.assertEqual(compact, {'encoding': 'compact', 'start': None, 'day_deltas': [], 'balances': []})
+        self.assertEqual(expand_balance_history(compact), [])
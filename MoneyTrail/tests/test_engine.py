@@ -0,0 +1,63 @@
+import pytz
+import unittest
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from MoneyTrail import engine
+from MoneyTrail.encoding import compact_balance_history
+from MoneyTrail.engine import LedgerSnapshot, recalculate_per_row
+from MoneyTrail.models import Transaction
+
+
+class LedgerEngineTest(TestCase):
+    def setUp(self):
+        rows = [
+            ('Salary', '1000.00', 'deposit', (2025, 1, 1, 10, 0)),
+            ('Rent', '400.10', 'expense', (2025, 1, 2, 8, 0)),
+            ('Coffee', '3.33', 'expense', (2025, 1, 2, 23, 59)),
+            ('Refund', '0.01', 'deposit', (2025, 1, 5, 0, 0)),
+            ('Groceries', '596.58', 'expense', (2025, 2, 1, 12, 0)),
+        ]
+        for description, amount, transaction_type, moment in rows:
+            Transaction.objects.create(
+                description=description, amount=Decimal(amount), type=transaction_type,
+                created_at=timezone.datetime(*moment, tzinfo=pytz.utc)
+            )
+
+    def assertMatchesReference(self, filtered_queryset=None, use_numpy=None):
+        expected_total, expected_rows, expected_history = recalculate_per_row(filtered_queryset)
+        ledger = LedgerSnapshot.load(use_numpy=use_numpy)
+
+        self.assertEqual(ledger.total_balance, expected_total)
+        self.assertEqual(ledger.balance_history(), expected_history)
+        self.assertEqual(ledger.compact_balance_history(), compact_balance_history(expected_history))
+
+        rows = ledger.rows(filtered_queryset)
+        self.assertEqual(len(rows), len(expected_rows))
+        self.assertEqual(
+            [(t.id, t.running_balance) for t in rows[:]],
+            [(t.id, t.running_balance) for t in expected_rows]
+        )
+
+    def test_pure_python_matches_per_row_reference(self):
+        self.assertMatchesReference(use_numpy=False)
+        self.assertMatchesReference(Transaction.objects.filter(type='expense'), use_numpy=False)
+
+    @unittest.skipIf(engine.np is None, 'numpy is not installed')
+    def test_numpy_matches_per_row_reference(self):
+        self.assertMatchesReference(use_numpy=True)
+        self.assertMatchesReference(Transaction.objects.filter(type='expense'), use_numpy=True)
+
+    def test_empty_ledger_matches_per_row_reference(self):
+        Transaction.objects.all().delete()
+        self.assertMatchesReference(use_numpy=False)
+        if engine.np is not None:
+            self.assertMatchesReference(use_numpy=True)
+
+    def test_rows_load_only_the_requested_page(self):
+        rows = LedgerSnapshot.load().rows()
+        with self.assertNumQueries(1):
+            page = rows[1:3]
+        self.assertEqual([t.description for t in page], ['Refund', 'Coffee'])
+        self.assertEqual(page[0].running_balance, Decimal('596.58'))
+        self.assertEqual(rows[0].running_balance, Decimal('0.00'))
@@ -0,0 +1,96 @@
+import asyncio
+import io
+import json
+import pytz
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.events import broker, ledger_events_app
+from MoneyTrail.index import ledger_index
+from MoneyTrail.models import Transaction
+
+
+class LedgerChangeEventTest(APITestCase):
+    def setUp(self):
+        self.deposit = Transaction.objects.create(
+            description='Initial Deposit',
+            amount=Decimal('1000.00'),
+            type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 10, 0, 0, tzinfo=pytz.utc)
+        )
+        self.events = []
+        broker.subscribe(self._collect)
+        self.addCleanup(broker.unsubscribe, self._collect)
+        # The index takes the changes of the callbacks run below, but the test's transaction rolls back.
+        self.addCleanup(ledger_index.invalidate)
+
+    def _collect(self, message):
+        self.events.append(json.loads(message))
+
+    def test_create_update_and_delete_publish_events_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/transactions/', {'amount': '100.00', 'type': 'expense', 'created_at': '2025-01-02'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_id = response.json()['new_transaction']['id']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/transactions/{new_id}/', {'amount': '150.00'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/transactions/{new_id}/')
+
+        self.assertEqual([event['op'] for event in self.events], ['added', 'updated', 'deleted'])
+        self.assertEqual(self.events[0]['rows'][0]['id'], new_id)
+        self.assertEqual(Decimal(str(self.events[0]['total_balance'])), Decimal('900.00'))
+        self.assertEqual(self.events[1]['rows'][0]['amount'], '150.00')
+        self.assertEqual(Decimal(str(self.events[1]['total_balance'])), Decimal('850.00'))
+        self.assertEqual(self.events[2]['rows'], [{'id': new_id}])
+        self.assertEqual(Decimal(str(self.events[2]['total_balance'])), Decimal('1000.00'))
+
+    def test_rejected_write_publishes_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/transactions/', {'amount': '5000.00', 'type': 'expense', 'created_at': '2025-01-02'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.events, [])
+
+    @patch('requests.get')
+    def test_import_publishes_one_event_with_all_rows(self, mock_get):
+        mock_get.return_value.json.return_value = [
+            {"createdAt": "2025-06-27T12:52:58.669Z", "amount": 41.42, "type": "expense", "id": "1"},
+            {"createdAt": "2025-06-26T09:15:32.123Z", "amount": 75.80, "type": "deposit", "id": "2"},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('fetch_transactions', stdout=io.StringIO())
+
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0]['op'], 'added')
+        self.assertEqual(sorted(row['api_external_id'] for row in self.events[0]['rows']), ['1', '2'])
+        self.assertEqual(Decimal(str(self.events[0]['total_balance'])), Decimal('1034.38'))
+
+
+class LedgerEventStreamTest(SimpleTestCase):
+    def test_stream_sends_published_events_until_disconnect(self):
+        async def run():
+            incoming = asyncio.Queue()
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            app = asyncio.ensure_future(ledger_events_app({'type': 'http', 'path': '/api/events/'}, incoming.get, send))
+            await asyncio.sleep(0.01)
+            broker.publish('{"op":"deleted","rows":[{"id":7}],"total_balance":"10.00"}')
+            await asyncio.sleep(0.01)
+            await incoming.put({'type': 'http.disconnect'})
+            await asyncio.wait_for(app, timeout=1)
+            return sent
+
+        sent = asyncio.run(run())
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        bodies = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'data: {"op":"deleted","rows":[{"id":7}],"total_balance":"10.00"}\n\n', bodies)
+        self.assertFalse(sent[-1]['more_body'])
@@ -0,0 +1,90 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail import forecast
+from MoneyTrail.forecast import _add_months
+from MoneyTrail.models import Transaction
+
+
+def at_noon(day):
+    return timezone.make_aware(datetime.combine(day, time(12)))
+
+
+class ForecastAPITest(APITestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        # A salary on the same day of the month for three months, rent every 14
+        # days, and two coffees a day since the first rent.
+        self.salary_days = [_add_months(self.today, -months) + timedelta(days=10) for months in range(3, 0, -1)]
+        for day in self.salary_days:
+            Transaction.objects.create(description='Salary', amount=Decimal('3000.00'), type='deposit', created_at=at_noon(day))
+        for weeks in range(14, 0, -2):
+            Transaction.objects.create(description='Rent', amount=Decimal('900.00'), type='expense', created_at=at_noon(self.today - timedelta(weeks=weeks)))
+        for days in range(1, 99):
+            for _ in range(2):
+                Transaction.objects.create(description='Coffee', amount=Decimal('4.00'), type='expense', created_at=at_noon(self.today - timedelta(days=days)))
+
+    def get(self, **params):
+        return self.client.get('/api/transactions/forecast/', params)
+
+    def test_recurring_items_and_expected_balance(self):
+        response = self.get(days=30)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        recurring = {item['description']: item for item in data['recurring']}
+        self.assertEqual(set(recurring), {'Salary', 'Rent'})
+        self.assertTrue(recurring['Salary']['monthly'])
+        self.assertEqual(recurring['Salary']['next_date'], _add_months(self.salary_days[-1], 1).isoformat())
+        self.assertEqual((recurring['Rent']['every_days'], recurring['Rent']['amount']), (14, 900.0))
+        self.assertEqual(recurring['Rent']['next_date'], (self.today + timedelta(days=14)).isoformat())
+
+        expected = data['expected']
+        self.assertEqual(len(expected), 30)
+        self.assertEqual(expected[0]['date'], (self.today + timedelta(days=1)).isoformat())
+        balance = Decimal(str(data['balance']))
+        # Tomorrow: the two coffees of every past day.
+        self.assertEqual(Decimal(str(expected[0]['balance'])), balance - Decimal('8.00'))
+        self.assertEqual(Decimal(str(expected[13]['balance'])), balance + Decimal('3000.00') - Decimal('900.00') - 14 * Decimal('8.00'))
+        # Two coffees a day reach the limit of two expenses, every day.
+        self.assertEqual([(w['type'], w['days']) for w in data['warnings']], [('daily_limit', 30)])
+        self.assertIsNone(data['bands'])
+
+    def check_bands(self, data):
+        bands = data['bands']
+        self.assertEqual(list(bands), ['p5', 'p25', 'p50', 'p75', 'p95'])
+        self.assertTrue(all(len(band) == 60 for band in bands.values()))
+        for day in range(60):
+            self.assertTrue(bands['p5'][day] <= bands['p50'][day] <= bands['p95'][day])
+        # Past days never varied, so every path matches the expected balance.
+        self.assertEqual(bands['p50'][-1], data['expected'][-1]['balance'])
+
+    def test_simulated_bands_with_and_without_numpy(self):
+        response = self.get(days=60, simulations=500, seed=7)
+        self.check_bands(response.json())
+        with patch.object(forecast, 'np', None):
+            data = forecast.forecast(60, 500, 7)
+        self.check_bands(data)
+
+    def test_warns_before_the_balance_goes_below_zero(self):
+        Transaction.objects.create(description='Laptop', amount=Decimal(str(self.get().json()['balance'])) - Decimal('10.00'), type='expense', created_at=at_noon(self.today))
+        data = self.get(days=20, simulations=200).json()
+        warnings = {warning['type']: warning for warning in data['warnings']}
+        # Down 8.00 a day from 10.00, before the salary arrives.
+        self.assertEqual(warnings['balance']['date'], (self.today + timedelta(days=2)).isoformat())
+        self.assertEqual(warnings['balance_risk']['probability'], 1.0)
+
+    def test_results_are_cached_per_ledger_version_and_parameters_checked(self):
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries.captured_queries), 1)  # The ledger head
+
+        for params in ({'days': 0}, {'days': 'soon'}, {'simulations': 100000}):
+            response = self.get(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('detail', response.json())
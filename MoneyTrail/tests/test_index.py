@@ -0,0 +1,172 @@
+import pytz
+from decimal import Decimal
+from unittest.mock import patch
+from django.test import TestCase
+from django.utils import timezone
+from MoneyTrail.engine import np, recalculate_per_row
+from MoneyTrail.index import UNSAVED_PK, LedgerIndex
+from MoneyTrail.ledger import bump_ledger_version
+from MoneyTrail.models import Transaction
+from MoneyTrail.outbox import record_changes
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+class LedgerIndexTest(TestCase):
+    def setUp(self):
+        self.salary = Transaction.objects.create(description='Salary', amount=Decimal('1000.00'), type='deposit', created_at=utc(2025, 1, 1, 10))
+        self.rent = Transaction.objects.create(description='Rent', amount=Decimal('400.00'), type='expense', created_at=utc(2025, 1, 2, 8))
+        # Same timestamp as the rent: ties are ordered by id.
+        self.coffee = Transaction.objects.create(description='Coffee', amount=Decimal('3.50'), type='expense', created_at=utc(2025, 1, 2, 8))
+        self.bonus = Transaction.objects.create(description='Bonus', amount=Decimal('200.00'), type='deposit', created_at=utc(2025, 1, 5, 12))
+        self.index = LedgerIndex()
+        self.index.current()
+
+    def assertMatchesFreshLoad(self):
+        fresh = LedgerIndex()
+        fresh.load()
+        balances = lambda index: [index._cents_before(position) for position in range(len(index) + 1)]
+        self.assertEqual(
+            (list(self.index.timestamps), list(self.index.ids), list(self.index.cents), balances(self.index)),
+            (list(fresh.timestamps), list(fresh.ids), list(fresh.cents), balances(fresh))
+        )
+
+    def test_lookups(self):
+        self.assertEqual(self.index.total_cents(), 79650)
+        self.assertEqual(self.index.running_cents(self.rent.created_at, self.rent.pk), 60000)
+        self.assertEqual(self.index.running_cents(self.coffee.created_at, self.coffee.pk), 59650)
+        self.assertEqual(self.index.cents_at(utc(2025, 1, 2, 8)), 59650)
+        self.assertEqual(self.index.cents_at(utc(2025, 1, 2, 7, 59)), 100000)
+        self.assertEqual(self.index.cents_at(utc(2024, 12, 31)), 0)
+        self.assertEqual(self.index.range_cents(utc(2025, 1, 2), utc(2025, 1, 6)), -20350)
+        self.assertEqual(self.index.range_cents(utc(2025, 1, 3), utc(2025, 1, 4)), 0)
+
+    def test_committed_writes_are_applied_without_reloading(self):
+        with patch.object(self.index, 'load', wraps=self.index.load) as load, patch('MoneyTrail.signals.ledger_index', self.index):
+            with self.captureOnCommitCallbacks(execute=True):
+                Transaction.objects.create(description='Backdated', amount=Decimal('50.00'), type='deposit', created_at=utc(2024, 12, 31))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.bonus.created_at = utc(2025, 1, 1, 9)
+                self.bonus.amount = Decimal('250.00')
+                self.bonus.save()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.rent.delete()
+
+            self.index.current()
+            load.assert_not_called()
+        self.assertEqual(self.index.total_cents(), 129650)
+        self.assertMatchesFreshLoad()
+
+    def test_own_uncommitted_writes_are_laid_over_the_index(self):
+        with patch.object(self.index, 'load', wraps=self.index.load) as load, patch('MoneyTrail.signals.ledger_index', self.index):
+            Transaction.objects.create(description='Backdated', amount=Decimal('50.00'), type='deposit', created_at=utc(2024, 12, 31))
+            self.rent.delete()
+            with self.index.at_database_head() as index:
+                self.assertIs(index, self.index)
+                self.assertEqual(index.total_cents(), 124650)
+                self.assertMatchesFreshLoad()
+            load.assert_not_called()
+        # Taken back out until the writes commit.
+        self.assertEqual(self.index.total_cents(), 79650)
+
+    def test_snapshot_is_shared_until_the_next_change(self):
+        snapshot = self.index.snapshot()
+        self.assertIs(self.index.snapshot(), snapshot)
+        with patch('MoneyTrail.signals.ledger_index', self.index), self.captureOnCommitCallbacks(execute=True):
+            self.rent.delete()
+        self.assertIsNot(self.index.snapshot(), snapshot)
+        self.assertEqual(snapshot.total_balance, Decimal('796.50'))
+
+    def test_change_it_did_not_see_is_caught_up_from_the_outbox(self):
+        # E.g. a bulk statement, or a write committed by another process.
+        Transaction.objects.filter(pk=self.bonus.pk).update(amount=Decimal('300.00'))
+        record_changes('updated', Transaction.objects.filter(pk=self.bonus.pk))
+        bump_ledger_version()
+
+        with patch.object(self.index, 'load', wraps=self.index.load) as load:
+            self.index.current()
+            load.assert_not_called()
+        self.assertEqual(self.index.total_cents(), 89650)
+        self.assertMatchesFreshLoad()
+
+    def test_too_many_changes_reload_the_index(self):
+        Transaction.objects.filter(pk=self.bonus.pk).update(amount=Decimal('300.00'))
+        record_changes('updated', Transaction.objects.filter(pk=self.bonus.pk))
+        bump_ledger_version()
+
+        with patch('MoneyTrail.ledger_file.MAX_DELTA_ROWS', 0), patch.object(self.index, 'load', wraps=self.index.load) as load:
+            self.index.current()
+            load.assert_called_once()
+        self.assertEqual(self.index.total_cents(), 89650)
+
+    def test_snapshot_matches_per_row_reference_for_filtered_rows(self):
+        snapshot = self.index.current().snapshot()
+        filtered = Transaction.objects.filter(type='expense')
+        expected_total, expected_rows, expected_history = recalculate_per_row(filtered)
+
+        rows = snapshot.rows(filtered)
+        self.assertEqual(snapshot.total_balance, expected_total)
+        self.assertEqual(snapshot.balance_history(), expected_history)
+        self.assertEqual(len(rows), len(expected_rows))
+        self.assertEqual(
+            [(t.id, t.running_balance) for t in rows[0:10]],
+            [(t.id, t.running_balance) for t in expected_rows]
+        )
+
+    def test_lowest_balance_after_a_change_matches_replayed_history(self):
+        saved = [(t.created_at, t.pk, cents) for t, cents in (
+            (self.salary, 100000), (self.rent, -40000), (self.coffee, -350), (self.bonus, 20000)
+        )]
+
+        def replayed_lowest(removed, added):
+            # Reference: rebuild the ledger with the change and scan the balances from its first row on.
+            rows = sorted([row for row in saved if row[:2] not in removed] + added)
+            first = min([created_at for created_at, _ in removed] + [created_at for created_at, _, _ in added])
+            balance, lowest = 0, None
+            for created_at, _, cents in rows:
+                balance += cents
+                if created_at >= first:
+                    lowest = balance if lowest is None else min(lowest, balance)
+            return lowest
+
+        changes = [
+            ([], [(utc(2025, 1, 1, 12), UNSAVED_PK, -70000)]),  # Backdated expense
+            ([], [(utc(2025, 1, 2, 8), UNSAVED_PK, -60000)]),  # Sorts after the saved rows of that moment
+            ([(self.salary.created_at, self.salary.pk)], []),  # Deleting the deposit that covers the rent
+            ([(self.salary.created_at, self.salary.pk)], [(utc(2025, 1, 3), self.salary.pk, 100000)]),  # Moving it later
+            ([(self.rent.created_at, self.rent.pk)], [(self.rent.created_at, self.rent.pk, -120000)]),  # A larger rent
+            ([], [(utc(2025, 2, 1), UNSAVED_PK, -5000)]),  # After every saved row
+        ]
+        for use_numpy in (True, False):
+            with patch('MoneyTrail.index.np', np if use_numpy else None):
+                self.index.load()  # Builds the tree with or without numpy
+                for removed, added in changes:
+                    with self.subTest(removed=removed, added=added, use_numpy=use_numpy):
+                        self.assertEqual(self.index.lowest_cents(removed, added)[1], replayed_lowest(removed, added))
+        # Without the change, the lowest balance from 2025-01-01 12:00 on is after the coffee.
+        self.assertEqual(self.index.lowest_cents([], [(utc(2025, 1, 1, 12), UNSAVED_PK, -70000)])[0], 59650)
+
+    def test_writes_update_the_tree_in_place(self):
+        tree = self.index.tree
+        with patch('MoneyTrail.signals.ledger_index', self.index), self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, 25):
+                Transaction.objects.create(description='Backdated', amount=Decimal('10.00'), type='deposit', created_at=utc(2024, 12, day))
+            for _ in range(12):
+                Transaction.objects.create(description='Lunch', amount=Decimal('15.00'), type='expense', created_at=utc(2025, 1, 2, 8))
+            self.salary.created_at = utc(2025, 1, 3)
+            self.salary.save()
+            self.rent.delete()
+        self.assertIs(self.index.tree, tree)
+        self.assertMatchesFreshLoad()
+
+        fresh = LedgerIndex()
+        fresh.load()
+        for removed, added in (
+            ([], [(utc(2024, 12, 1), UNSAVED_PK, -30000)]),
+            ([(self.salary.created_at, self.salary.pk)], []),
+            ([(self.bonus.created_at, self.bonus.pk)], [(utc(2024, 12, 10), self.bonus.pk, -20000)]),
+        ):
+            with self.subTest(removed=removed, added=added):
+                self.assertEqual(self.index.lowest_cents(removed, added), fresh.lowest_cents(removed, added))
@@ -0,0 +1,87 @@
+import io
+from contextlib import nullcontext
+import pytz
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from MoneyTrail.index import LedgerIndex
+from MoneyTrail.ledger_file import TYPE_CODES, LedgerFile, LedgerFileError
+from MoneyTrail.models import Transaction
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+class LedgerFileTest(TestCase):
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = str(directory / 'ledger.snapshot')
+        settings_override = override_settings(LEDGER_SNAPSHOT_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.salary = Transaction.objects.create(description='Salary', amount=Decimal('1000.00'), type='deposit', created_at=utc(2025, 1, 1, 10))
+        self.rent = Transaction.objects.create(description='Rent', amount=Decimal('400.00'), type='expense', created_at=utc(2025, 1, 2, 8))
+        self.coffee = Transaction.objects.create(description='Coffee', amount=Decimal('3.50'), type='expense', created_at=utc(2025, 1, 2, 8))
+        out = io.StringIO()
+        call_command('write_ledger_snapshot', stdout=out)
+        self.assertIn('Wrote 3 transactions', out.getvalue())
+
+    def load_index(self):
+        index = LedgerIndex()
+        with patch.object(index, '_read_database', wraps=index._read_database) as read_database:
+            index.load()
+        return index, read_database.called
+
+    def assertMatchesDatabase(self, index):
+        fresh = LedgerIndex()
+        fresh._read_file = lambda: None
+        fresh.load()
+        self.assertEqual(
+            (list(index.timestamps), list(index.ids), list(index.cents), index.opening_cents),
+            (list(fresh.timestamps), list(fresh.ids), list(fresh.cents), fresh.opening_cents)
+        )
+
+    def test_columns_are_mapped_in_ledger_order(self):
+        for use_numpy in (True, False):
+            with self.subTest(use_numpy=use_numpy), patch('MoneyTrail.ledger_file.np', None) if not use_numpy else nullcontext():
+                with LedgerFile() as ledger_file:
+                    self.assertEqual(len(ledger_file), 3)
+                    self.assertEqual(list(ledger_file.ids), [self.salary.pk, self.rent.pk, self.coffee.pk])
+                    self.assertEqual(list(ledger_file.cents), [100000, -40000, -350])
+                    self.assertEqual(list(ledger_file.types), [TYPE_CODES['deposit'], TYPE_CODES['expense'], TYPE_CODES['expense']])
+                    self.assertEqual(ledger_file.timestamps[0], int(utc(2025, 1, 1, 10).timestamp()) * 1000000)
+
+    def test_index_starts_from_the_file_plus_later_changes(self):
+        Transaction.objects.create(description='Bonus', amount=Decimal('200.00'), type='deposit', created_at=utc(2025, 1, 1, 12))
+        self.rent.amount = Decimal('450.00')
+        self.rent.created_at = utc(2025, 1, 3)
+        self.rent.save()
+        self.coffee.delete()
+
+        for use_numpy in (True, False):
+            with self.subTest(use_numpy=use_numpy), patch('MoneyTrail.index.np', None) if not use_numpy else nullcontext():
+                index, read_database = self.load_index()
+                self.assertFalse(read_database)
+                self.assertEqual(index.total_cents(), 75000)
+                self.assertMatchesDatabase(index)
+
+    def test_unusable_files_fall_back_to_the_database(self):
+        # Archiving moves rows without recording changes.
+        call_command('archive_transactions', '--before', '2025-01-02', stdout=io.StringIO())
+        index, read_database = self.load_index()
+        self.assertTrue(read_database)
+        self.assertMatchesDatabase(index)
+
+        Path(self.path).write_bytes(b'MTLEDGER' + bytes(10))
+        with self.assertRaises(LedgerFileError):
+            LedgerFile()
+        index, read_database = self.load_index()
+        self.assertTrue(read_database)
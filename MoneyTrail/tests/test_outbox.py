@@ -0,0 +1,80 @@
+import io
+import pytz
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.models import LedgerChange, Transaction
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+class LedgerChangeFeedTest(APITestCase):
+    def setUp(self):
+        self.salary = Transaction.objects.create(description='Salary', amount=Decimal('1000.00'), type='deposit', created_at=utc(2025, 1, 1, 10))
+        self.rent = Transaction.objects.create(description='Rent', amount=Decimal('400.00'), type='expense', created_at=utc(2025, 1, 2, 8))
+        self.start = LedgerChange.objects.latest('id').id
+
+    def feed(self, **params):
+        response = self.client.get('/api/changes/', {'since': self.start, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def recorded(self):
+        return [entry[1:3] for entry in self.feed()['changes']]
+
+    def test_viewset_writes_are_recorded_in_order(self):
+        response = self.client.post('/api/transactions/', {'description': 'Coffee', 'amount': '3.50', 'type': 'expense', 'created_at': '2025-01-03T09:00:00Z'}, format='json')
+        coffee_id = response.json()['new_transaction']['id']
+        self.client.patch(f'/api/transactions/{self.rent.id}/', {'amount': '450.00'}, format='json')
+        self.client.delete(f'/api/transactions/{coffee_id}/')
+
+        feed = self.feed()
+        self.assertEqual(feed['columns'], ['seq', 'op', 'id', 'api_external_id', 'description', 'amount', 'type', 'created_at'])
+        self.assertEqual([entry[1:3] for entry in feed['changes']], [['added', coffee_id], ['updated', self.rent.id], ['deleted', coffee_id]])
+        self.assertEqual(feed['changes'][1][3:], [None, 'Rent', '450.00', 'expense', '2025-01-02T08:00:00+00:00'])
+        # Deletions only carry the id.
+        self.assertEqual(len(feed['changes'][2]), 3)
+        self.assertEqual(feed['next'], feed['changes'][2][0])
+        self.assertFalse(feed['has_more'])
+
+    def test_rejected_write_records_nothing(self):
+        response = self.client.delete(f'/api/transactions/{self.salary.id}/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.recorded(), [])
+
+    def test_bulk_writes_and_imports_are_recorded(self):
+        self.client.post('/api/transactions/bulk-update/', {'ids': [self.salary.id, self.rent.id], 'changes': {'description': 'Reviewed'}}, format='json')
+        with patch('requests.get') as mock_get:
+            mock_get.return_value.json.return_value = [
+                {'createdAt': '2025-01-05T12:00:00.000Z', 'amount': 20.0, 'type': 'deposit', 'id': 'api-1'},
+            ]
+            call_command('fetch_transactions', stdout=io.StringIO())
+        imported = Transaction.objects.get(api_external_id='api-1')
+        self.client.post('/api/transactions/bulk-delete/', {'api_external_id_prefix': 'api-'}, format='json')
+
+        self.assertEqual(self.recorded(), [
+            ['updated', self.salary.id], ['updated', self.rent.id], ['added', imported.id], ['deleted', imported.id]
+        ])
+        self.assertEqual(self.feed()['changes'][0][4], 'Reviewed')
+
+    def test_feed_is_read_in_batches(self):
+        for day in range(3, 8):
+            Transaction.objects.create(description='Refund', amount=Decimal('5.00'), type='deposit', created_at=utc(2025, 1, day))
+
+        seen, since = [], self.start
+        while True:
+            response = self.client.get('/api/changes/', {'since': since, 'limit': 2})
+            feed = response.json()
+            self.assertLessEqual(len(feed['changes']), 2)
+            seen += [entry[0] for entry in feed['changes']]
+            since = feed['next']
+            if not feed['has_more']:
+                break
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(self.client.get('/api/changes/', {'limit': 0}).status_code, status.HTTP_400_BAD_REQUEST)
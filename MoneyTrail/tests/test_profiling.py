@@ -0,0 +1,94 @@
+import io
+import json
+import pstats
+import pytz
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.models import Transaction
+from MoneyTrail.profiling import profiling_token
+
+
+class ProfilingTest(APITestCase):
+    def setUp(self):
+        self.profile_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings_override = override_settings(PROFILING_DIR=str(self.profile_dir), PROFILING_ENABLED=False, PROFILING_SAMPLE_RATE=1.0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Transaction.objects.create(
+            description='Salary', amount=Decimal('1000.00'), type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 10, 0, 0, tzinfo=pytz.utc)
+        )
+
+    def stored(self, suffix):
+        return sorted(path.name for path in self.profile_dir.glob(f'*.{suffix}'))
+
+    def test_nothing_is_profiled_by_default(self):
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-MoneyTrail-Profile', response)
+        # An invalid token doesn't enable it either.
+        response = self.client.get('/api/transactions/', HTTP_X_MONEYTRAIL_PROFILE='forged:token')
+        self.assertNotIn('X-MoneyTrail-Profile', response)
+        self.assertEqual(self.stored('json'), [])
+
+    def test_sampled_request_saves_stats_sql_and_memory(self):
+        with self.settings(PROFILING_ENABLED=True):
+            response = self.client.get('/api/transactions/?page=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        name = response['X-MoneyTrail-Profile']
+        self.assertEqual(self.stored('json'), [f'{name}.json'])
+
+        summary = json.loads((self.profile_dir / f'{name}.json').read_text())
+        self.assertEqual(summary['label'], 'TransactionViewSet.list')
+        self.assertEqual((summary['method'], summary['path'], summary['status']), ('GET', '/api/transactions/?page=1', 200))
+        self.assertEqual(summary['sql_count'], len(summary['sql']))
+        self.assertTrue(any('MoneyTrail_transaction' in query['sql'] for query in summary['sql']))
+        self.assertGreater(summary['peak_memory_bytes'], 0)
+        self.assertIn('_list_payload', summary['functions'])
+        # The .prof file is a regular pstats dump.
+        pstats.Stats(str(self.profile_dir / f'{name}.prof'))
+
+    def test_signed_header_profiles_a_request_and_old_profiles_rotate(self):
+        token = profiling_token()
+        with self.settings(PROFILING_MAX_PROFILES=2):
+            names = [self.client.get('/api/transactions/', HTTP_X_MONEYTRAIL_PROFILE=token)['X-MoneyTrail-Profile'] for _ in range(3)]
+        self.assertEqual(self.stored('json'), [f'{name}.json' for name in names[1:]])
+        self.assertEqual(self.stored('prof'), [f'{name}.prof' for name in names[1:]])
+
+    def test_index_lists_and_serves_profiles_with_a_token(self):
+        token = profiling_token()
+        name = self.client.get('/api/transactions/', HTTP_X_MONEYTRAIL_PROFILE=token)['X-MoneyTrail-Profile']
+
+        self.assertEqual(self.client.get('/api/profiles/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/api/profiles/', {'token': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [listed] = response.data['profiles']
+        self.assertEqual(listed['name'], name)
+        self.assertNotIn('sql', listed)
+        self.assertTrue(listed['files']['prof'].endswith(f'/api/profiles/{name}.prof'))
+
+        download = self.client.get(f'/api/profiles/{name}.json', HTTP_X_MONEYTRAIL_PROFILE=token)
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(b''.join(download.streaming_content))['name'], name)
+        self.assertEqual(self.client.get('/api/profiles/..%2Fsettings.py', {'token': token}).status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('requests.get')
+    def test_import_command_can_be_profiled(self, mock_get):
+        mock_get.return_value.json.return_value = [
+            {"createdAt": "2025-06-27T12:52:58.669Z", "amount": 41.42, "type": "deposit", "id": "1"},
+        ]
+        call_command('fetch_transactions', '--profile', stdout=io.StringIO())
+
+        [stored] = self.stored('json')
+        summary = json.loads((self.profile_dir / stored).read_text())
+        self.assertEqual(summary['label'], 'fetch_transactions')
+        self.assertTrue(any(query['sql'].startswith('INSERT') for query in summary['sql']))
@@ -0,0 +1,80 @@
+import io
+import re
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import TestCase
+from MoneyTrail.importing import validate_records
+from MoneyTrail.models import Transaction
+from MoneyTrail.reconcile import reconcile
+
+API_RECORDS = [
+    {'createdAt': '2025-06-27T12:52:58.669Z', 'amount': 41.42, 'type': 'expense', 'id': '1'},
+    {'createdAt': '2025-06-26T09:15:32.123Z', 'amount': 75.80, 'type': 'deposit', 'id': '2'},
+    {'createdAt': '2025-05-25T10:00:00.000Z', 'amount': 100.00, 'type': 'deposit', 'id': '3'},
+    {'createdAt': '2024-12-31T23:00:00.000Z', 'amount': 250.00, 'type': 'deposit', 'id': '4'},
+]
+
+
+def strip_ansi_codes(s):
+    return re.sub(r'\x1b\[[0-9;]*m', '', s)
+
+
+def validated(records):
+    return [fields for fields, warning in validate_records(records) if not warning]
+
+
+class ReconcileTest(TestCase):
+    def setUp(self):
+        with patch('requests.get') as mock_get:
+            mock_get.return_value.json.return_value = list(API_RECORDS)  # The command reverses it
+            call_command('fetch_transactions', stdout=io.StringIO())
+        # Entered by hand: never reported.
+        Transaction.objects.create(description='Cash', amount=Decimal('5.00'), type='deposit')
+
+    def test_matching_ledger_stops_at_the_top_level(self):
+        report = reconcile(validated(API_RECORDS))
+        self.assertEqual((report.missing, report.extra, report.altered), ([], [], []))
+        self.assertEqual(report.compared, {'year': 2})
+
+        # Archived rows are still compared.
+        call_command('archive_transactions', '--before', '2025-06-01', stdout=io.StringIO())
+        report = reconcile(validated(API_RECORDS))
+        self.assertEqual((report.missing, report.extra, report.altered), ([], [], []))
+
+    def test_only_mismatching_ranges_are_drilled_into(self):
+        upstream = [dict(record) for record in API_RECORDS]
+        upstream[0]['amount'] = 41.00   # Altered
+        upstream[2]['createdAt'] = '2025-05-20T10:00:00.000Z'  # Moved to another day
+        del upstream[1]                 # Extra locally
+        upstream.append({'createdAt': '2025-06-28T08:00:00.000Z', 'amount': 9.99, 'type': 'expense', 'id': '5'})  # Missing
+
+        report = reconcile(validated(upstream))
+        self.assertEqual([row.external_id for row in report.missing], ['5'])
+        self.assertEqual([row.external_id for row in report.extra], ['2'])
+        self.assertEqual([(local.external_id, remote.amount) for local, remote in report.altered], [('3', Decimal('100.0')), ('1', Decimal('41.0'))])
+        # 2024 matches, so none of its months or days were looked at.
+        self.assertEqual(report.compared, {'year': 2, 'month': 2, 'day': 5})
+
+    def test_local_edits_are_picked_up(self):
+        transaction = Transaction.objects.get(api_external_id='4')
+        transaction.amount = Decimal('260.00')
+        transaction.save()
+        report = reconcile(validated(API_RECORDS))
+        self.assertEqual([(local.amount, remote.amount) for local, remote in report.altered], [(Decimal('260.00'), Decimal('250.0'))])
+
+    @patch('requests.get')
+    def test_command_reports_differences(self, mock_get):
+        mock_get.return_value.json.return_value = API_RECORDS[1:]
+        out = io.StringIO()
+        call_command('reconcile_transactions', stdout=out)
+        captured_output = strip_ansi_codes(out.getvalue())
+        transaction = Transaction.objects.get(api_external_id='1')
+        self.assertIn('Compared 3 API records by range (years: 2, months: 2, days: 2).', captured_output)
+        self.assertIn(f'Extra transaction: TRN-{transaction.id:04d} (API-1) - 41.42 expense on 2025-06-27T12:52:58.669000+00:00', captured_output)
+        self.assertIn('Reconciliation found differences. Missing: 0, Extra: 1, Altered: 0', captured_output)
+
+        mock_get.return_value.json.return_value = API_RECORDS
+        out = io.StringIO()
+        call_command('reconcile_transactions', stdout=out)
+        self.assertIn('Imported transactions match the API. Missing: 0, Extra: 0, Altered: 0', strip_ansi_codes(out.getvalue()))
@@ -0,0 +1,153 @@
+"""
+Scaling guardrails: every endpoint is measured on increasingly large ledgers.
+
+A request must issue the same number of queries at every size (and no more than
+its budget), and its time and peak memory must grow sublinearly with the number
+of transactions. An N+1 query or a full-table load fails here even though the
+correctness tests on a handful of rows still pass.
+
+Tagged 'scaling': run only these with `python manage.py test MoneyTrail --tag scaling`,
+or skip them with `--exclude-tag scaling`.
+"""
+import io
+import time
+import tracemalloc
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
+from django.test import tag
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from MoneyTrail.index import ledger_index
+from MoneyTrail.management.commands.benchmark_ledger import seed_ledger
+from MoneyTrail.models import Transaction
+
+# Ledger sizes measured, smallest first.
+SIZES = (250, 2000, 16000)
+
+# Queries allowed per request. The count must also be the same at every size.
+QUERY_BUDGETS = {
+    'list': 5,
+    'list filtered': 6,
+    'create': 12,
+    'update': 13,
+    'destroy': 12,
+    'import': 79,
+}
+
+# Records per import run.
+IMPORT_RECORDS = 10
+
+# Time and memory may grow at most with the square root of the ledger size...
+GROWTH_EXPONENT = 0.5
+
+# ...above these floors, below which measurements are mostly noise.
+TIME_FLOOR_SECONDS = 0.005
+MEMORY_FLOOR_BYTES = 256 * 1024
+
+# Timed runs per request; the fastest one counts.
+REPEATS = 3
+
+
+@tag('scaling')
+class ScalingGuardrailTest(APITestCase):
+
+    def setUp(self):
+        self.seeded = 0
+        self.external_id = 0
+        # The index takes the changes of the callbacks run below, but the test's transaction rolls back.
+        self.addCleanup(ledger_index.invalidate)
+
+    def committed(self, request, run):
+        # Runs the on-commit callbacks (the ledger index update) as the request's commit would.
+        with self.captureOnCommitCallbacks(execute=True):
+            return request(run)
+
+    def grow_ledger(self, size):
+        self.committed(lambda run: seed_ledger(size - self.seeded, days=365, seed=size), 0)
+        self.seeded = size
+        # Rows every write endpoint can use: deposits never trip the balance or daily-limit checks.
+        self.deposits = list(Transaction.objects.filter(type='deposit').order_by('-id').values_list('id', flat=True)[:REPEATS + 4])
+
+    def api_records(self):
+        records = []
+        for _ in range(IMPORT_RECORDS):
+            self.external_id += 1
+            records.append({'createdAt': '2025-06-27T12:52:58.669Z', 'amount': 12.5 + self.external_id, 'type': 'deposit', 'id': f'scaling-{self.external_id}'})
+        return records
+
+    def endpoints(self):
+        """
+        Name -> function making one request; called with the run number, so writes
+        can pick a different row each time.
+        """
+        def run_import(run):
+            with patch('requests.get') as mock_get:
+                mock_get.return_value.json.return_value = self.api_records()
+                call_command('fetch_transactions', stdout=io.StringIO())
+
+        return {
+            'list': lambda run: self.client.get('/api/transactions/', {'page': 2, 'history': 'compact'}),
+            'list filtered': lambda run: self.client.get('/api/transactions/', {'type': 'deposit', 'history': 'compact'}),
+            'create': lambda run: self.client.post('/api/transactions/?history=compact', {'description': 'Refund', 'amount': '5.00', 'type': 'deposit'}, format='json'),
+            'update': lambda run: self.client.patch(f'/api/transactions/{self.deposits[0]}/?history=compact', {'description': f'Salary {run}'}, format='json'),
+            'destroy': lambda run: self.client.delete(f'/api/transactions/{self.deposits[run + 1]}/?history=compact'),
+            'import': run_import,
+        }
+
+    def measure(self, request):
+        """
+        Returns (queries, seconds, peak_bytes) of request(): the queries of one run,
+        the fastest of REPEATS runs and the tracemalloc peak of another.
+        """
+        response = self.committed(request, 0)  # Warm-up: loads the ledger index after seeding
+        if response is not None:
+            self.assertLess(response.status_code, 400, response.content)
+        with CaptureQueriesContext(connection) as queries:
+            self.committed(request, 1)
+        # Read now: the next request clears the connection's query log.
+        queries = [query['sql'] for query in queries.captured_queries]
+        seconds = []
+        for run in range(2, REPEATS + 2):
+            started = time.perf_counter()
+            self.committed(request, run)
+            seconds.append(time.perf_counter() - started)
+        tracemalloc.start()
+        try:
+            self.committed(request, REPEATS + 2)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return queries, min(seconds), peak
+
+    def assertQueryBudget(self, name, queries_by_size):
+        budget = QUERY_BUDGETS[name]
+        counts = {size: len(queries) for size, queries in queries_by_size.items()}
+        for size, queries in queries_by_size.items():
+            if len(queries) > budget or len(queries) != counts[SIZES[0]]:
+                listing = '\n'.join(f'  {number}. {sql}' for number, sql in enumerate(queries, 1))
+                self.fail(
+                    f'{name}: {len(queries)} queries at {size} rows (budget {budget}, counts by size {counts}):\n{listing}'
+                )
+
+    def assertSublinear(self, name, what, values_by_size, floor, unit):
+        smallest, largest = SIZES[0], SIZES[-1]
+        limit = max(values_by_size[smallest], floor) * (largest / smallest) ** GROWTH_EXPONENT
+        measured = ', '.join(f'{size} rows: {value:g}{unit}' for size, value in values_by_size.items())
+        self.assertLessEqual(
+            values_by_size[largest], limit,
+            f'{name}: {what} grows faster than the ledger size ** {GROWTH_EXPONENT} ({measured})'
+        )
+
+    def test_endpoints_scale_with_the_ledger(self):
+        results = {name: {} for name in QUERY_BUDGETS}
+        for size in SIZES:
+            self.grow_ledger(size)
+            for name, request in self.endpoints().items():
+                results[name][size] = self.measure(request)
+
+        for name, by_size in results.items():
+            with self.subTest(endpoint=name):
+                self.assertQueryBudget(name, {size: result[0] for size, result in by_size.items()})
+                self.assertSublinear(name, 'time', {size: result[1] for size, result in by_size.items()}, TIME_FLOOR_SECONDS, 's')
+                self.assertSublinear(name, 'peak memory', {size: result[2] for size, result in by_size.items()}, MEMORY_FLOOR_BYTES, 'B')
@@ -0,0 +1,139 @@
+import io
+import pytz
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from MoneyTrail.categories import rules_version
+from MoneyTrail.checkpoints import balance_before, ensure_checkpoints
+from MoneyTrail.fingerprints import fingerprint
+from MoneyTrail.index import LedgerIndex, ledger_index
+from MoneyTrail.models import BalanceCheckpoint, LedgerChange, Transaction
+from MoneyTrail.tests.test_api import TransactionAPITest
+from MoneyTrail.views import TransactionViewSet
+
+
+def utc(*args):
+    return timezone.datetime(*args, tzinfo=pytz.utc)
+
+
+@override_settings(LEDGER_DATABASE_WRITES=True)
+class DatabaseWriteAPITest(TransactionAPITest):
+    """
+    Every API test again, with creates going through the database function:
+    responses and error messages must not change.
+    """
+
+
+@override_settings(LEDGER_DATABASE_WRITES=True)
+class DatabaseWriteTest(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salary = Transaction.objects.create(description='Salary', amount=Decimal('1000.00'), type='deposit', created_at=utc(2025, 1, 1, 10))
+            self.rent = Transaction.objects.create(description='Rent', amount=Decimal('400.00'), type='expense', created_at=utc(2025, 1, 3, 8))
+        # The index took the callbacks' changes, but the test's transaction rolls back.
+        self.addCleanup(ledger_index.invalidate)
+
+    def create(self, **data):
+        return self.client.post('/api/transactions/?history=compact', {'description': 'Coffee', 'type': 'expense', **data}, format='json')
+
+    def test_backdated_create_returns_running_balance_and_keeps_derived_state(self):
+        ensure_checkpoints()
+        ledger_index.load()
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.create(amount='3.50', created_at='2025-01-02T09:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # The write (which checks the rule set version itself), the ledger head check and the first page of rows.
+        self.assertEqual(len(queries.captured_queries), 3)
+
+        data = response.json()
+        self.assertEqual(data['new_transaction']['running_balance'], '996.50')
+        self.assertEqual(Decimal(str(data['total_balance'])), Decimal('596.50'))
+        self.assertEqual([row['running_balance'] for row in data['transactions']], ['596.50', '996.50', '1000.00'])
+
+        coffee = Transaction.objects.get(pk=data['new_transaction']['id'])
+        self.assertEqual(coffee.fingerprint, fingerprint('expense', Decimal('3.50'), coffee.created_at, 'Coffee'))
+        self.assertEqual(LedgerChange.objects.latest('id').transaction_id, coffee.pk)
+        self.assertFalse(BalanceCheckpoint.objects.filter(day__gte='2025-01-02').exists())
+        self.assertEqual(balance_before(timezone.datetime(2025, 1, 4).date()), Decimal('596.50'))
+
+        # The in-memory index was updated in place on commit, to what a reload gives.
+        fresh = LedgerIndex()
+        fresh.load()
+        self.assertEqual((list(ledger_index.ids), list(ledger_index.cents), ledger_index.total_cents()), (list(fresh.ids), list(fresh.cents), fresh.total_cents()))
+
+    def test_balance_is_checked_from_the_last_checkpoint(self):
+        ensure_checkpoints()
+        # On 2025-01-02 the balance is 1000, but 600 once the rent is paid.
+        response = self.create(amount='700.00', created_at='2025-01-02T09:00:00Z')
+        self.assertEqual(response.json()['detail'], 'Not enough balance. Cannot add expense.')
+        response = self.create(amount='600.00', created_at='2025-01-02T09:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(str(response.json()['total_balance'])), Decimal('0.00'))
+        self.assertEqual(Transaction.objects.count(), 3)
+
+    def test_archive_cutoff_is_enforced(self):
+        call_command('archive_transactions', '--before', '2025-01-02', stdout=io.StringIO())
+        response = self.create(amount='1.00', created_at='2025-01-01T12:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['detail'], 'Transactions before the archive cutoff (2025-01-02) cannot be added or changed.')
+
+        # Running balances continue from the opening balance.
+        response = self.create(amount='100.00', created_at='2025-01-02T12:00:00Z')
+        self.assertEqual(response.json()['new_transaction']['running_balance'], '900.00')
+        self.assertEqual(Decimal(str(response.json()['total_balance'])), Decimal('500.00'))
+
+    def test_without_a_checkpoint_the_regular_path_is_taken(self):
+        with patch('MoneyTrail.stored_writes.schedule_checkpoint_rebuild') as rebuild, \
+                patch('MoneyTrail.views.TransactionViewSet._create_with_checks', autospec=True, side_effect=TransactionViewSet._create_with_checks) as regular:
+            response = self.create(amount='3.50', created_at='2025-01-02T09:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Decimal(str(response.json()['total_balance'])), Decimal('596.50'))
+        rebuild.assert_called_once()
+        regular.assert_called_once()
+
+        # Nothing before the new row's day: there is nothing to sum, so no checkpoint is needed.
+        with patch('MoneyTrail.views.TransactionViewSet._create_with_checks', autospec=True, side_effect=TransactionViewSet._create_with_checks) as regular:
+            response = self.create(amount='50.00', type='deposit', created_at='2024-12-31T09:00:00Z')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        regular.assert_not_called()
+
+    def test_backdating_before_too_many_rows_is_left_to_the_regular_path(self):
+        Transaction.objects.bulk_create([
+            Transaction(description='Refund', amount=Decimal('1.00'), type='deposit', created_at=utc(2025, 2, 1) + timedelta(minutes=minute))
+            for minute in range(1000)
+        ])
+        ensure_checkpoints()
+        with connection.cursor() as cursor:
+            # Before the rent and the 1,000 refunds, then after the rent.
+            for created_at, outcome in ((utc(2025, 1, 2, 9), 'backdated'), (utc(2025, 1, 3, 9), 'ok')):
+                cursor.execute(
+                    'SELECT outcome FROM moneytrail_create_transaction(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                    ['Snack', Decimal('1.00'), 'expense', created_at, '', created_at.date(), 2, 'UTC', None, *rules_version()]
+                )
+                self.assertEqual(cursor.fetchone()[0], outcome)
+
+    def test_daily_limit_counts_the_local_day(self):
+        ensure_checkpoints()
+        with timezone.override('America/New_York'):
+            # 2025-01-02 03:00 UTC is still January 1st in New York.
+            Transaction.objects.create(description='Lunch', amount=Decimal('5.00'), type='expense', created_at=utc(2025, 1, 2, 3))
+            Transaction.objects.create(description='Dinner', amount=Decimal('5.00'), type='expense', created_at=utc(2025, 1, 1, 22))
+            ensure_checkpoints()
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT outcome FROM moneytrail_create_transaction(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                    ['Snack', Decimal('1.00'), 'expense', utc(2025, 1, 1, 23), '', timezone.datetime(2025, 1, 1).date(), 2, 'America/New_York', None, *rules_version()]
+                )
+                self.assertEqual(cursor.fetchone()[0], 'daily_limit')
+                cursor.execute(
+                    'SELECT outcome FROM moneytrail_create_transaction(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                    ['Snack', Decimal('1.00'), 'expense', utc(2025, 1, 2, 12), '', timezone.datetime(2025, 1, 2).date(), 2, 'America/New_York', None, *rules_version()]
+                )
+                self.assertEqual(cursor.fetchone()[0], 'ok')
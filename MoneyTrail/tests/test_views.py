@@ -1,6 +1,12 @@
+import json
+import re
+import pytz
+from decimal import Decimal
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from MoneyTrail.models import Transaction
 
 # Test for our Django Template View
 class TransactionListViewTest(TestCase):
@@ -16,4 +22,28 @@ class TransactionListViewTest(TestCase):
         # Check if the page content contains a specific string, indicating it loaded correctly.
         self.assertContains(response, "MoneyTrail Transaction Tracker")
 
+    # Test that the first page, total balance and chart series are rendered into the page.
+    def test_transaction_list_view_embeds_first_page(self):
+        Transaction.objects.create(
+            description='Salary', amount=Decimal('1000.00'), type='deposit',
+            created_at=timezone.datetime(2025, 1, 1, 10, 0, 0, tzinfo=pytz.utc)
+        )
+        Transaction.objects.create(
+            description='Rent', amount=Decimal('400.00'), type='expense',
+            created_at=timezone.datetime(2025, 1, 2, 10, 0, 0, tzinfo=pytz.utc)
+        )
+        response = self.client.get(reverse('transaction_list'))
 
+        self.assertEqual(response.context['initial_total_balance'], Decimal('600.00'))
+        self.assertContains(response, '$600.00')
+        self.assertContains(response, '<script id="initialData" type="application/json">')
+
+        embedded = re.search(r'<script id="initialData" type="application/json">(.*?)</script>', response.content.decode(), re.S)
+        initial = json.loads(embedded.group(1))
+        self.assertEqual(initial['url'], '/api/transactions/?page=1&history=compact')
+        self.assertEqual([t['description'] for t in initial['data']['transactions']], ['Rent', 'Salary'])
+        self.assertEqual(initial['data']['balance_history']['balances'], [1000.0, 600.0])
+
+        # The embedded ETag is the one the API would send for the same URL.
+        api_response = self.client.get('/api/transactions/?page=1&history=compact', HTTP_IF_NONE_MATCH=initial['etag'])
+        self.assertEqual(api_response.status_code, status.HTTP_304_NOT_MODIFIED)
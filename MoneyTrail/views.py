@@ -2,18 +2,41 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ParseError
 from django.views.generic import TemplateView
-from django.db.models import Sum, Q, When, F, DecimalField, Value, Case, ExpressionWrapper
-from django.db import transaction as db_transaction # Avoid name conflict with model
 from django.utils import timezone
-from datetime import timedelta, date
 from decimal import Decimal
+import logging
 import pytz # pip install pytz for timezone handling
 from django.conf import settings
 from django.core.management import call_command # For fetch_external_transactions_api
-from django.db.models.functions import Coalesce
-from .models import Transaction
+from .models import ArchivedTransaction, Transaction
 from .serializers import TransactionSerializer
+from .bulk import BULK_UPDATE_FIELDS, BulkChangeRejected, bulk_delete_transactions, bulk_update_transactions
+from .ledger import serialized_write, ledger_version
+from .archive import ArchiveAwareRows, archive_cutoff_message, archive_cutoff_violation, archive_reached
+from .analytics import AnalyticsError, cached_spending_analytics, parse_windows
+from .forecast import DEFAULT_FORECAST_DAYS, ForecastError, cached_forecast
+from .checkpoints import balance_at, balance_history_between
+from .encoding import COMPACT_HISTORY_ENCODING, encode_balance_history
+from .engine import signed_cents
+from .index import UNSAVED_PK, goes_negative, ledger_snapshot
+from .events import publish_ledger_change
+from .facets import cached_facets, facets_requested
+from .outbox import FEED_BATCH_SIZE, MAX_FEED_BATCH_SIZE, change_feed
+from .stored_writes import WriteRejected, create_transaction
+from .profiling import PROFILE_HEADER, is_valid_token, list_profiles, profile_path
+from django.utils.dateparse import parse_datetime
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from django.utils.html import json_script
+from django.http import FileResponse, Http404, QueryDict
+from django.urls import reverse
+from rest_framework.utils.encoders import JSONEncoder
+from functools import wraps
+import hashlib
+
+logger = logging.getLogger(__name__)
 
 # Get the timezone from Django settings or default to UTC
 TIME_ZONE = pytz.timezone(getattr(settings, 'TIME_ZONE', 'UTC'))
@@ -24,6 +47,57 @@ TIME_ZONE = pytz.timezone(getattr(settings, 'TIME_ZONE', 'UTC'))
 TEST_DAILY_EXPENSE_LIMIT = 2
 # --- End temporary limit ---
 
+# Rows per list page, and the most a client can ask for with ?page_size
+# (script.js loads larger pages while scrolling).
+LIST_PAGE_SIZE = 10
+MAX_LIST_PAGE_SIZE = 200
+
+# Query parameters of the list filters (see TransactionViewSet._filter_queryset).
+LIST_FILTERS = ('type', 'start_date', 'end_date', 'description_search', 'code_search', 'category')
+
+
+def ledger_validators(path, params, head=None):
+    """
+    Returns (etag, last_modified) for a ledger-derived GET response: the ETag hashes
+    the ledger version with the path and sorted query string, Last-Modified is the
+    time of the last ledger change (as a Unix timestamp, or None). head is the
+    ledger head to use, read from the database if not given.
+    """
+    version, updated_at = head or ledger_version()
+    query = urlencode(sorted(params.lists()), doseq=True)
+    etag = quote_etag(hashlib.md5(f'{version}:{path}?{query}'.encode()).hexdigest())
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+    return etag, last_modified
+
+
+def conditional_on_ledger(view_method):
+    """
+    Decorator for read-only GET actions whose response depends only on the ledger
+    and the query string. ETag and Last-Modified are derived from the ledger
+    version (one primary-key lookup), so If-None-Match / If-Modified-Since are
+    answered with 304 before any balance computation happens.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        head = ledger_version()
+        etag, last_modified = ledger_validators(request.path, request.query_params, head)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = view_method(self, request, *args, **kwargs)
+        # A write committed while the body was built: it may mix both versions,
+        # so it mustn't be cached under either one's ETag.
+        if response.status_code == status.HTTP_200_OK and ledger_version() == head:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Let clients keep the body but always revalidate it.
+            response['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
 
 class TransactionViewSet(viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
@@ -33,65 +107,43 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Transaction.objects.all().order_by('-created_at')
 
-    def _recalculate_balances(self, filtered_queryset=None):
+    def _recalculate_balances(self, filtered_queryset=None, params=None):
         """
         Helper to recalculate all running balances and total balance based on a queryset.
         Also returns historical balance data for charting.
+
+        Returns (total_balance, display_transactions, balance_history). display_transactions
+        is newest first and only loads model instances for the items accessed (see engine.py and index.py).
+        balance_history follows the ?history parameter in params (the request's query parameters), like list().
         """
-        all_transactions = Transaction.objects.all().order_by('created_at')
-
-        running_balance = Decimal('0.00')
-        transactions_with_balance = []
-        balance_history = [] # To store (date, balance) for charting
-
-        # Add an initial point for the chart if there are no transactions
-        # or if the first transaction is not at the very beginning of time.
-        # This ensures the chart starts from 0 at an appropriate date.
-        if not all_transactions.exists():
-            balance_history.append({
-                'date': timezone.now().date().isoformat(), # Today's date
-                'balance': 0.0
-            })
-
-        # Calculate running balance for ALL transactions
-        for trans in all_transactions:
-            if trans.type == 'deposit':
-                running_balance += trans.amount
-            elif trans.type == 'expense':
-                running_balance -= trans.amount
-            trans.running_balance = running_balance
-            transactions_with_balance.append(trans)
-            # Store daily balance for charting (use end of day for consistency)
-            # If multiple transactions on same day, chart will show final balance for that day.
-            balance_history.append({
-                'date': trans.created_at.date().isoformat(), # YYYY-MM-DD format
-                'balance': float(running_balance) # Convert Decimal to float for JSON/Chart.js
-            })
-
-        # Now, filter this list of transactions_with_balance based on the provided filtered_queryset
-        if filtered_queryset is not None:
-            filtered_ids = set(filtered_queryset.values_list('id', flat=True))
-            display_transactions = [t for t in transactions_with_balance if t.id in filtered_ids]
-        else:
-            display_transactions = transactions_with_balance
-
-        # Reverse for newest to oldest display for the *display_transactions*
-        display_transactions.reverse()
-
-        total_balance = Decimal('0.00')
-        if transactions_with_balance: # Check the full list for the true total balance
-            total_balance = transactions_with_balance[-1].running_balance # Last item in chronological list
-
-        return total_balance, display_transactions, balance_history
+        ledger = ledger_snapshot()
+        return ledger.total_balance, ledger.rows(filtered_queryset), self._balance_history(ledger, params or {})
 
-    def list(self, request, *args, **kwargs):
-        queryset = Transaction.objects.all()
+    def _balance_history(self, ledger, params):
+        """
+        One point per transaction, or per day with ?history=compact (parallel arrays).
+        ?history=none leaves it out (null), for pages after the first.
+        """
+        if params.get('history') == 'none':
+            return None
+        if params.get('history') == COMPACT_HISTORY_ENCODING:
+            return ledger.compact_balance_history()
+        return ledger.balance_history()
 
-        filter_type = request.query_params.get('type')
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
-        description_search = request.query_params.get('description_search')
-        code_search = request.query_params.get('code_search')
+    def _filter_queryset(self, params, model=Transaction):
+        """
+        Applies the list filters (type, start_date, end_date, description_search,
+        code_search, category) from the given query parameters. Raises ParseError for bad dates.
+        model is Transaction or ArchivedTransaction (same fields).
+        """
+        queryset = model.objects.all()
+
+        filter_type = params.get('type')
+        start_date_str = params.get('start_date')
+        end_date_str = params.get('end_date')
+        description_search = params.get('description_search')
+        code_search = params.get('code_search')
+        category = params.get('category')
 
         if filter_type:
             queryset = queryset.filter(type=filter_type)
@@ -101,59 +153,133 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 start_date = timezone.datetime.strptime(start_date_str, '%Y-%m-%d').date()
                 queryset = queryset.filter(created_at__date__gte=start_date)
             except ValueError:
-                return Response({'detail': 'Invalid start_date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+                raise ParseError('Invalid start_date format. Use YYYY-MM-DD.')
 
         if end_date_str:
             try:
                 end_date = timezone.datetime.strptime(end_date_str, '%Y-%m-%d').date()
                 queryset = queryset.filter(created_at__date__lte=end_date)
             except ValueError:
-                return Response({'detail': 'Invalid end_date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+                raise ParseError('Invalid end_date format. Use YYYY-MM-DD.')
 
         if description_search:
             queryset = queryset.filter(description__icontains=description_search)
 
         if code_search:
-            parsed_id = None
-            if code_search.startswith('TRN-'):
-                try:
-                    parsed_id = int(code_search[4:])
-                except ValueError:
-                    pass
-            else:
-                try:
-                    parsed_id = int(code_search)
-                except ValueError:
-                    pass
-
+            parsed_id = Transaction.parse_display_code(code_search)
             if parsed_id is not None:
                 queryset = queryset.filter(id=parsed_id)
             else:
                 queryset = queryset.none()
 
-        total_balance, transactions_with_balance_for_display, balance_history = self._recalculate_balances(filtered_queryset=queryset)
+        if category:
+            # A category name, or "none" for uncategorized transactions.
+            if category == 'none':
+                queryset = queryset.filter(category__isnull=True)
+            else:
+                queryset = queryset.filter(category__name=category)
+
+        return queryset
+
+    def _list_payload(self, params):
+        """
+        Builds the list response body for the given query parameters.
+        Shared by list() and the server-rendered first page in TransactionListView.
+        Raises ParseError for a bad page or page_size.
+        """
+        try:
+            page_size = min(max(int(params.get('page_size', LIST_PAGE_SIZE)), 1), MAX_LIST_PAGE_SIZE)
+            page = int(params.get('page', 1))
+        except ValueError:
+            raise ParseError('Invalid page or page_size. Use whole numbers.')
+        if page < 1:
+            raise ParseError('Invalid page. Pages start at 1.')
+
+        queryset = self._filter_queryset(params)
+
+        ledger = ledger_snapshot()
+        total_balance = ledger.total_balance
+        transactions_with_balance_for_display = ledger.rows(queryset)
+
+        # Continue into archived transactions when the date range reaches past the cutoff.
+        start_date_str = params.get('start_date')
+        opening = archive_reached(timezone.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None)
+        if opening is not None:
+            transactions_with_balance_for_display = ArchiveAwareRows(
+                transactions_with_balance_for_display, self._filter_queryset(params, ArchivedTransaction), opening
+            )
 
-        page_size = 10
-        page = int(request.query_params.get('page', 1))
         offset = (page - 1) * page_size
         limit = offset + page_size
 
         paginated_transactions = transactions_with_balance_for_display[offset:limit]
 
-        serializer = self.get_serializer(paginated_transactions, many=True)
+        serializer = self.serializer_class(paginated_transactions, many=True)
 
-        return Response({
+        payload = {
             'total_balance': total_balance,
             'transactions': serializer.data,
             'has_more': len(transactions_with_balance_for_display) > limit,
-            'balance_history': balance_history # Include balance history for the chart
-        })
+            # Include balance history for the chart (?history=compact for parallel arrays)
+            'balance_history': self._balance_history(ledger, params)
+        }
+        if facets_requested(params):
+            # Counts and sums per type and month of the filtered rows (see facets.py)
+            querysets = [queryset] if opening is None else [queryset, self._filter_queryset(params, ArchivedTransaction)]
+            payload['facets'] = cached_facets({key: params[key] for key in LIST_FILTERS if params.get(key)}, querysets)
+        return payload
+
+    @conditional_on_ledger
+    def list(self, request, *args, **kwargs):
+        return Response(self._list_payload(request.query_params))
 
+    def create(self, request, *args, **kwargs):
+        if settings.LEDGER_DATABASE_WRITES:
+            return self._create_in_database(request)
+        return self._create_with_checks(request)
 
+    def _create_in_database(self, request):
+        """
+        create() in one database round trip for the write (see stored_writes.py).
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
+        created_at = serializer.validated_data.get('created_at', timezone.now())
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, timezone=TIME_ZONE)
 
-    @db_transaction.atomic
-    def create(self, request, *args, **kwargs):
+        try:
+            new_transaction, total_balance = create_transaction(
+                serializer.validated_data.get('description'), serializer.validated_data['amount'],
+                serializer.validated_data['type'], created_at, TEST_DAILY_EXPENSE_LIMIT
+            )
+        except WriteRejected as rejected:
+            logger.debug('Database write rejected: %s', rejected.outcome)
+            if rejected.outcome in ('no_checkpoint', 'backdated'):
+                return self._create_with_checks(request)
+            if rejected.outcome == 'archived':
+                detail = archive_cutoff_message(rejected.archive_cutoff)
+            else:
+                detail = {
+                    'non_positive_amount': 'Amount must be a positive number.',
+                    'daily_limit': f'Daily expense limit reached ({TEST_DAILY_EXPENSE_LIMIT} expenses per day).',
+                    'insufficient_balance': 'Not enough balance. Cannot add expense.',
+                }[rejected.outcome]
+            return Response({'detail': detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        new_transaction_data = self.get_serializer(new_transaction).data
+        ledger = ledger_snapshot()
+        publish_ledger_change('added', [new_transaction_data], total_balance)
+        return Response({
+            'total_balance': total_balance,
+            'new_transaction': new_transaction_data,
+            'transactions': self.get_serializer(ledger.rows()[:10], many=True).data,
+            'balance_history': self._balance_history(ledger, request.query_params)
+        }, status=status.HTTP_201_CREATED, headers=self.get_success_headers(new_transaction_data))
+
+    @serialized_write
+    def _create_with_checks(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
@@ -165,6 +291,10 @@ class TransactionViewSet(viewsets.ModelViewSet):
             created_at = timezone.make_aware(created_at, timezone=TIME_ZONE)
 
         # --- VALIDATIONS ---
+        archived_error = archive_cutoff_violation(created_at)
+        if archived_error:
+            return Response({'detail': archived_error}, status=status.HTTP_400_BAD_REQUEST)
+
         if transaction_type == 'expense':
             transaction_date = created_at.date()
 
@@ -174,31 +304,22 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 created_at__date=transaction_date
             ).count()
 
-            print(f"DEBUG: Checking daily expense limit for {transaction_date}. Current count: {daily_expenses_count}")
+            logger.debug('Checking daily expense limit for %s. Current count: %s', transaction_date, daily_expenses_count)
 
             if daily_expenses_count >= TEST_DAILY_EXPENSE_LIMIT:
-                print(f"DEBUG: Daily expense limit of {TEST_DAILY_EXPENSE_LIMIT} reached for {transaction_date}.")
+                logger.debug('Daily expense limit of %s reached for %s.', TEST_DAILY_EXPENSE_LIMIT, transaction_date)
                 return Response(
                     {'detail': f'Daily expense limit reached ({TEST_DAILY_EXPENSE_LIMIT} expenses per day).'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Sufficient balance check
-            current_total_balance = Transaction.objects.aggregate(
-                total=Coalesce(Sum(
-                    Case(
-                        When(type='deposit', then=F('amount')),
-                        When(type='expense', then=ExpressionWrapper(F('amount') * Decimal('-1'), output_field=DecimalField())),
-                        default=Value(0),
-                        output_field=DecimalField()
-                    )
-                ), Value(0, output_field=DecimalField()))
-            )['total'] or Decimal('0.00')
-
-            print(f"DEBUG: Checking sufficient balance. Current total balance: {current_total_balance}, Attempted expense: {amount}")
-
-            if current_total_balance < amount:
-                print(f"DEBUG: Insufficient balance. Current: {current_total_balance}, Expense: {amount}")
+            # Sufficient balance check: a backdated expense must be covered at every
+            # later point in time, not just by the current total.
+            new_cents = signed_cents(Transaction(amount=amount, type=transaction_type))
+            logger.debug('Checking sufficient balance from %s. Attempted expense: %s', created_at, amount)
+
+            if goes_negative(added=[(created_at, UNSAVED_PK, new_cents)]):
+                logger.debug('Insufficient balance. Expense: %s at %s', amount, created_at)
                 return Response(
                     {'detail': 'Not enough balance. Cannot add expense.'},
                     status=status.HTTP_400_BAD_REQUEST
@@ -208,7 +329,8 @@ class TransactionViewSet(viewsets.ModelViewSet):
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
 
-        total_balance_after_create, transactions_with_balance_after_create, balance_history_after_create = self._recalculate_balances()
+        total_balance_after_create, transactions_with_balance_after_create, balance_history_after_create = self._recalculate_balances(params=request.query_params)
+        publish_ledger_change('added', [serializer.data], total_balance_after_create)
 
         return Response({
             'total_balance': transactions_with_balance_after_create[0].running_balance if transactions_with_balance_after_create else Decimal('0.00'),
@@ -217,7 +339,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
             'balance_history': balance_history_after_create
         }, status=status.HTTP_201_CREATED, headers=headers)
 
-    @db_transaction.atomic
+    @serialized_write
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=True)
@@ -236,27 +358,20 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if transaction_type == 'expense':
-            balance_excluding_current = Transaction.objects.exclude(pk=instance.pk).aggregate(
-            total=Sum(
-                Case(
-                    When(type='deposit', then=F('amount')),
-                    When(type='expense', then=-F('amount')),
-                    output_field=DecimalField()
-                )
-            )
-        )['total'] or Decimal('0.00')
+        archived_error = archive_cutoff_violation(created_at)
+        if archived_error:
+            return Response({'detail': archived_error}, status=status.HTTP_400_BAD_REQUEST)
 
-            potential_new_balance = balance_excluding_current - amount
+        # Any edit (amount, type or date) may lower balances from the earlier of the two dates on.
+        new_cents = signed_cents(Transaction(amount=amount, type=transaction_type))
+        logger.debug('Updating %s. New amount: %s, new date: %s', transaction_type, amount, created_at)
 
-            print(f"DEBUG: Updating expense. Balance excluding current: {balance_excluding_current}, New expense amount: {amount}, Potential new balance: {potential_new_balance}")
-
-            if potential_new_balance < 0:
-                print(f"DEBUG: Update would result in negative balance. Current: {balance_excluding_current}, New Expense: {amount}")
-                return Response(
-                    {'detail': 'Updating this expense would result in a negative balance.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+        if goes_negative(removed=[(instance.created_at, instance.pk)], added=[(created_at, instance.pk, new_cents)]):
+            logger.debug('Update would result in negative balance. New %s: %s at %s', transaction_type, amount, created_at)
+            return Response(
+                {'detail': f'Updating this {transaction_type} would result in a negative balance.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         if transaction_type == 'expense' and (instance.type != 'expense' or instance.created_at.date() != created_at.date()):
             transaction_date = created_at.date()
@@ -265,20 +380,21 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 created_at__date=transaction_date
             ).exclude(pk=instance.pk).count()
 
-            print(f"DEBUG: Updating expense. Daily count for {transaction_date}: {daily_expenses_count}")
+            logger.debug('Updating expense. Daily count for %s: %s', transaction_date, daily_expenses_count)
 
             if daily_expenses_count >= TEST_DAILY_EXPENSE_LIMIT:
-                print(f"DEBUG: Daily expense limit of {TEST_DAILY_EXPENSE_LIMIT} reached for {transaction_date} during update.")
+                logger.debug('Daily expense limit of %s reached for %s during update.', TEST_DAILY_EXPENSE_LIMIT, transaction_date)
                 return Response(
                     {'detail': f'Daily expense limit reached ({TEST_DAILY_EXPENSE_LIMIT} expenses per day) for the selected date.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
         self.perform_update(serializer)
-        print(f"DEBUG: Updated transaction amount: {serializer.instance.amount}, type: {serializer.instance.type}")
+        logger.debug('Updated transaction amount: %s, type: %s', serializer.instance.amount, serializer.instance.type)
 
-        total_balance_after_update, transactions_with_balance_after_update, balance_history_after_update = self._recalculate_balances()
-        print("DEBUG: _recalculate_balances total:", total_balance_after_update)
+        total_balance_after_update, transactions_with_balance_after_update, balance_history_after_update = self._recalculate_balances(params=request.query_params)
+        logger.debug('Total balance after update: %s', total_balance_after_update)
+        publish_ledger_change('updated', [serializer.data], total_balance_after_update)
 
         return Response({
             'total_balance': total_balance_after_update,
@@ -288,12 +404,22 @@ class TransactionViewSet(viewsets.ModelViewSet):
         })
 
 
-    @db_transaction.atomic
+    @serialized_write
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        deleted_id = instance.pk
+
+        if goes_negative(removed=[(instance.created_at, instance.pk)]):
+            logger.debug('Deleting transaction %s would result in negative balance.', deleted_id)
+            return Response(
+                {'detail': 'Deleting this transaction would result in a negative balance.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         self.perform_destroy(instance)
 
-        total_balance_after_delete, transactions_with_balance_after_delete, balance_history_after_delete = self._recalculate_balances()
+        total_balance_after_delete, transactions_with_balance_after_delete, balance_history_after_delete = self._recalculate_balances(params=request.query_params)
+        publish_ledger_change('deleted', [{'id': deleted_id}], total_balance_after_delete)
 
         return Response({
             'total_balance': total_balance_after_delete,
@@ -302,12 +428,209 @@ class TransactionViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_204_NO_CONTENT)
 
 
+    def _bulk_selection(self, data):
+        """
+        Returns (queryset, error) for the rows a bulk request selects, with exactly one of:
+        "ids" (a list of ids), "api_external_id_prefix" (e.g. a bad import's prefix)
+        or "filter" (the list filters, e.g. {"type": "expense", "start_date": "2025-01-01"}).
+        """
+        selectors = [key for key in ('ids', 'api_external_id_prefix', 'filter') if data.get(key)]
+        if len(selectors) != 1:
+            return None, 'Select the transactions with exactly one of "ids", "api_external_id_prefix" or "filter".'
+        selector = selectors[0]
+        value = data[selector]
+
+        if selector == 'ids':
+            if not isinstance(value, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in value):
+                return None, '"ids" must be a list of transaction ids.'
+            return Transaction.objects.filter(pk__in=value), None
+        if selector == 'api_external_id_prefix':
+            if not isinstance(value, str):
+                return None, '"api_external_id_prefix" must be a string.'
+            return Transaction.objects.filter(api_external_id__startswith=value), None
+
+        if not isinstance(value, dict) or not any(value.get(key) for key in LIST_FILTERS):
+            return None, f'"filter" must set at least one of: {", ".join(LIST_FILTERS)}.'
+        return self._filter_queryset({key: str(value[key]) for key in LIST_FILTERS if value.get(key)}), None
+
+    def _bulk_response(self, key, count, params):
+        total_balance, transactions_with_balance, balance_history = self._recalculate_balances(params=params)
+        if count:
+            # Clients refetch rather than patch in a change of this size.
+            publish_ledger_change('resync', [], total_balance)
+        return Response({
+            key: count,
+            'total_balance': total_balance,
+            'transactions': self.get_serializer(transactions_with_balance[:10], many=True).data,
+            'balance_history': balance_history
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    @serialized_write
+    def bulk_delete(self, request):
+        """
+        Deletes the selected transactions (see _bulk_selection) with one DELETE statement,
+        validating the balance and refreshing balances once for the whole selection.
+        """
+        queryset, error = self._bulk_selection(request.data)
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            deleted = bulk_delete_transactions(queryset)
+        except BulkChangeRejected as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        logger.debug('Bulk deleted %d transactions', deleted)
+        return self._bulk_response('deleted', deleted, request.query_params)
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    @serialized_write
+    def bulk_update(self, request):
+        """
+        Sets "changes" (description, amount and/or type) on the selected transactions
+        (see _bulk_selection) with one UPDATE statement, validating the balance and the
+        daily expense limit once for the whole selection.
+        """
+        queryset, error = self._bulk_selection(request.data)
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = request.data.get('changes')
+        if not isinstance(changes, dict) or not changes:
+            return Response({'detail': '"changes" must set at least one of: ' + ', '.join(BULK_UPDATE_FIELDS) + '.'}, status=status.HTTP_400_BAD_REQUEST)
+        unsupported = sorted(set(changes) - set(BULK_UPDATE_FIELDS))
+        if unsupported:
+            return Response({'detail': f'These fields cannot be bulk updated: {", ".join(unsupported)}.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=changes, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            updated = bulk_update_transactions(queryset, serializer.validated_data, daily_expense_limit=TEST_DAILY_EXPENSE_LIMIT)
+        except BulkChangeRejected as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        logger.debug('Bulk updated %d transactions: %s', updated, serializer.validated_data)
+        return self._bulk_response('updated', updated, request.query_params)
+
+    @action(detail=False, methods=['get'], url_path='balance-at')
+    @conditional_on_ledger
+    def balance_at(self, request):
+        """
+        Returns the balance at a point in time: ?at=YYYY-MM-DD (end of that day)
+        or ?at=<ISO 8601 datetime>. Answered from the nearest balance checkpoint.
+        """
+        at_str = request.query_params.get('at')
+        if not at_str:
+            return Response({'detail': 'The "at" parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        moment = None
+        try:
+            day = timezone.datetime.strptime(at_str, '%Y-%m-%d').date()
+            moment = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.max.time()), timezone=TIME_ZONE)
+        except ValueError:
+            try:
+                moment = parse_datetime(at_str)
+            except ValueError:
+                pass
+        if moment is None:
+            return Response({'detail': 'Invalid at format. Use YYYY-MM-DD or an ISO 8601 datetime.'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, timezone=TIME_ZONE)
+
+        return Response({'at': moment.isoformat(), 'balance': balance_at(moment)})
+
+    @action(detail=False, methods=['get'], url_path='balance-range')
+    @conditional_on_ledger
+    def balance_range(self, request):
+        """
+        Returns end-of-day balances between ?start_date and ?end_date (YYYY-MM-DD, inclusive),
+        plus the opening balance before the range and the closing balance at its end.
+        """
+        try:
+            start_date = timezone.datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = timezone.datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'detail': 'start_date and end_date are required. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({'detail': 'start_date must not be after end_date.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        opening_balance, closing_balance, balance_history = balance_history_between(start_date, end_date)
+
+        return Response({
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'opening_balance': opening_balance,
+            'closing_balance': closing_balance,
+            'balance_history': encode_balance_history(balance_history, request.query_params)
+        })
+
+    @action(detail=False, methods=['get'], url_path='analytics')
+    @conditional_on_ledger
+    def analytics(self, request):
+        """
+        Rolling-window spending metrics for every day between ?start_date and ?end_date
+        (YYYY-MM-DD, inclusive) for the window sizes in ?windows (default 7,30):
+        expenses, deposits, burn rate, net burn and runway (see analytics.py).
+        """
+        try:
+            start_date = timezone.datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end_date = timezone.datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'detail': 'start_date and end_date are required. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            windows = parse_windows(request.query_params.get('windows'))
+            analytics = cached_spending_analytics(start_date, end_date, windows)
+        except AnalyticsError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'start_date': start_date.isoformat(), 'end_date': end_date.isoformat(), **analytics})
+
+    @action(detail=False, methods=['get'], url_path='forecast')
+    def forecast(self, request):
+        """
+        Projected balance for the next ?days (default 90) from recurring items and
+        past daily spending, with percentile bands of ?simulations paths (default
+        none; ?seed picks the draw) and warnings about balance and daily-limit
+        rejections ahead (see forecast.py). Unlike analytics this isn't conditional
+        on the ledger head alone: the forecast also moves on with the day.
+        """
+        try:
+            days = int(request.query_params.get('days', DEFAULT_FORECAST_DAYS))
+            simulations = int(request.query_params.get('simulations', 0))
+            seed = int(request.query_params.get('seed', 0))
+        except ValueError:
+            return Response({'detail': 'days, simulations and seed must be whole numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(cached_forecast(days, simulations, seed, TEST_DAILY_EXPENSE_LIMIT))
+        except ForecastError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
 class TransactionListView(TemplateView):
     template_name = 'MoneyTrail/transaction_list.html'
 
+    # Query string script.js uses for the first page of /api/transactions/.
+    # That response is embedded in the page so the client can skip the request.
+    initial_list_query = 'page=1&history=compact'
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['initial_total_balance'] = Decimal('0.00')
+
+        list_path = reverse('transaction-list')
+        params = QueryDict(self.initial_list_query)
+        head = ledger_version()
+        etag, last_modified = ledger_validators(list_path, params, head)
+        payload = TransactionViewSet()._list_payload(params)
+        if ledger_version() != head:
+            etag = last_modified = None  # Built across a write (see conditional_on_ledger)
+
+        context['initial_total_balance'] = payload['total_balance']
+        # Embedded as <script type="application/json">, along with the validators
+        # the API would have sent, so later refreshes can be conditional GETs.
+        context['initial_data'] = json_script({
+            'url': f'{list_path}?{params.urlencode()}',
+            'etag': etag,
+            'last_modified': http_date(last_modified) if last_modified is not None else None,
+            'data': payload,
+        }, 'initialData', encoder=JSONEncoder)
         return context
 
 @api_view(['POST'])
@@ -321,3 +644,58 @@ def fetch_external_transactions_api(request):
     except Exception as e:
         return Response({'detail': f'Error fetching external transactions: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+
+@api_view(['GET'])
+def ledger_changes(request):
+    """
+    Change feed for downstream consumers: the ledger changes after ?since=<sequence>
+    (default 0, i.e. everything), oldest first, in batches of ?limit= (see outbox.py).
+    Call again with since=<next> while has_more is true.
+    """
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', FEED_BATCH_SIZE))
+    except ValueError:
+        return Response({'detail': 'since and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    if since < 0 or not 1 <= limit <= MAX_FEED_BATCH_SIZE:
+        return Response({'detail': f'since must be at least 0 and limit between 1 and {MAX_FEED_BATCH_SIZE}.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(change_feed(since, limit))
+
+
+def _can_read_profiles(request):
+    token = request.META.get(PROFILE_HEADER) or request.query_params.get('token')
+    return request.user.is_staff or (token is not None and is_valid_token(token))
+
+
+@api_view(['GET'])
+def profile_index(request):
+    """
+    Lists the stored profiles (newest first) with download links. Needs a staff
+    session or a profiling token (header or ?token=).
+    """
+    if not _can_read_profiles(request):
+        return Response({'detail': 'A staff login or a valid profiling token is required.'}, status=status.HTTP_403_FORBIDDEN)
+
+    profiles = []
+    for summary in list_profiles():
+        summary = {key: value for key, value in summary.items() if key not in ('sql', 'functions')}
+        summary['files'] = {
+            suffix: request.build_absolute_uri(reverse('profile_download', args=[f"{summary['name']}.{suffix}"]))
+            for suffix in ('json', 'prof')
+        }
+        profiles.append(summary)
+    return Response({'profiles': profiles})
+
+
+@api_view(['GET'])
+def profile_download(request, filename):
+    """
+    Downloads one profile file (<name>.json or <name>.prof).
+    """
+    if not _can_read_profiles(request):
+        return Response({'detail': 'A staff login or a valid profiling token is required.'}, status=status.HTTP_403_FORBIDDEN)
+    path = profile_path(filename)
+    if path is None:
+        raise Http404('No such profile.')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=filename)
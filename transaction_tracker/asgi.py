@@ -9,8 +9,28 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'transaction_tracker.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+if settings.DEBUG:
+    # Serve static files in development, as runserver does.
+    django_application = ASGIStaticFilesHandler(django_application)
+
+# Imported after get_asgi_application() so Django is set up first.
+from MoneyTrail.events import ledger_events_app  # noqa: E402
+
+# Path of the Server-Sent Events stream of ledger changes.
+EVENTS_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    # Long-lived event streams are served directly instead of through Django's
+    # request/response cycle; everything else goes to Django as usual.
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        await ledger_events_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -50,6 +50,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres', # PostgreSQL indexes and full-text search
     'rest_framework', # Django Rest Framework for API endpoints
     'MoneyTrail',     # Our Custom App
 ]
@@ -58,14 +59,39 @@ INSTALLED_APPS = [
 # They perform functions like security, session management, etc.
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'MoneyTrail.middleware.CompressionMiddleware', # gzip/brotli for large responses; must come before anything that edits the body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'MoneyTrail.middleware.ProfilingMiddleware', # On-demand profiles of API actions (see PROFILING_* below)
 ]
 
+# Responses smaller than this (in bytes) are not worth compressing.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+
+# On-demand profiling of API actions and the import command (MoneyTrail/profiling.py).
+# When enabled, this fraction of requests is profiled; a request carrying a token from
+# `python manage.py profiling_token` in the X-MoneyTrail-Profile header always is.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0.01'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+# Older profiles are deleted once there are more than this many.
+PROFILING_MAX_PROFILES = int(os.getenv('PROFILING_MAX_PROFILES', '50'))
+# Seconds a profiling token stays valid.
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', '3600'))
+
+# Binary ledger snapshot written by `manage.py write_ledger_snapshot` (see
+# MoneyTrail/ledger_file.py). When set and the file exists, workers start their
+# ledger index from it plus the changes recorded since, instead of reading every row.
+LEDGER_SNAPSHOT_PATH = os.getenv('LEDGER_SNAPSHOT_PATH', '')
+
+# Create transactions with one call to a PostgreSQL function that runs the checks
+# and the insert together (see MoneyTrail/stored_writes.py).
+LEDGER_DATABASE_WRITES = os.getenv('LEDGER_DATABASE_WRITES', 'False') == 'True'
+
 # ROOT_URLCONF specifies the Python module where Django looks for the root URL patterns.
 ROOT_URLCONF = 'transaction_tracker.urls'
 
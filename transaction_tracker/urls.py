@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
-from MoneyTrail.views import TransactionViewSet, TransactionListView, fetch_external_transactions_api
+from MoneyTrail.views import TransactionViewSet, TransactionListView, fetch_external_transactions_api, ledger_changes, profile_download, profile_index
 
 # Create a router for your API views
 router = routers.DefaultRouter()
@@ -33,5 +33,10 @@ urlpatterns = [
     path('api/', include(router.urls)),
     # Endpoint for user to trigger fetching external transactions
     path('api/fetch-external-transactions/', fetch_external_transactions_api, name='fetch_external_transaction_api'),
+    # Change feed for downstream consumers (see MoneyTrail/outbox.py)
+    path('api/changes/', ledger_changes, name='ledger_changes'),
+    # Stored request/import profiles (see MoneyTrail/profiling.py)
+    path('api/profiles/', profile_index, name='profile_index'),
+    path('api/profiles/<str:filename>', profile_download, name='profile_download'),
     # You might also want to include DRF's browsable API login/logout
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),]